@@ -1,36 +1,110 @@
+import uuid
 from datetime import datetime, timedelta
 from typing import Annotated, Optional
-from fastapi import Depends
+from fastapi import Depends, Response
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer
+from starlette.concurrency import run_in_threadpool
 from common.exceptions import ForbiddenException, UnauthorizedException
 from data.models.user import User, UserResponse
-from data.database import insert_query, read_query
-from config import ACCESS_TOKEN_EXPIRE_MINUTES, ALGORITHM, SECRET_KEY
+from data.database import insert_query, read_query, update_query
+from common import hashing
+from common.hashing import pwd_context
+from common.password_migration import migrate_passwords
+from common.query_cache import invalidate
+from common.revocation import RevocationStore, create_backend
+from common.token_cache import VerifiedTokenCache
+from config import ACCESS_TOKEN_TTL_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS, ALGORITHM, SECRET_KEY, REVOCATION_BACKEND, REVOCATION_REDIS_URL, REVOCATION_SQLITE_PATH, REVOCATION_SYNC_SECONDS, VERIFIED_TOKEN_CACHE_SIZE
 from services.users_services import get_user
 
 
-pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='/api/users/login', auto_error=False)
-token_blacklist = set()
+token_blacklist = RevocationStore(
+    create_backend(REVOCATION_BACKEND, sqlite_path=REVOCATION_SQLITE_PATH, resp_url=REVOCATION_REDIS_URL),
+    default_ttl=ACCESS_TOKEN_TTL_MINUTES * 60,
+    sync_seconds=REVOCATION_SYNC_SECONDS
+)
+verified_token_cache = VerifiedTokenCache(max_size=VERIFIED_TOKEN_CACHE_SIZE)
+token_blacklist.on_revoke(verified_token_cache.discard)
+
+# Parallel requests with the same refresh token within this window get the same new pair
+REFRESH_ROTATION_GRACE_SECONDS = 10
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return hashing.verify_password(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return hashing.hash_password(password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
-    expire = datetime.now() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    expire = datetime.now() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_TTL_MINUTES))
     to_encode.update({'exp': expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
+def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None):
+    to_encode = data.copy()
+    expire = datetime.now() + (expires_delta or timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS))
+    to_encode.update({'exp': expire, 'type': 'refresh', 'jti': uuid.uuid4().hex})
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def create_token_pair(username: str, is_admin: bool, user_id: int) -> tuple[str, str]:
+    data = {'sub': username, 'is_admin': is_admin, 'id': user_id}
+    return create_access_token(data), create_refresh_token(data)
+
+
+def rotate_refresh_token(refresh_token: str) -> tuple[str, str] | None:
+    """
+    Exchanges a refresh token for a new access/refresh pair and revokes the old one.
+    No password check is involved. Returns None for invalid, expired or already used tokens.
+    """
+    if not refresh_token:
+        return None
+
+    # Parallel requests carrying the same refresh token get the pair issued to the first one,
+    # whichever worker they reach; the record is kept with the revoked tokens
+    recent = token_blacklist.rotation(refresh_token)
+    if recent:
+        return recent
+
+    if refresh_token in token_blacklist:
+        return None
+
+    try:
+        payload = jwt.decode(refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+
+    if payload.get('type') != 'refresh':
+        return None
+
+    user = get_user(payload.get('sub'))
+    if not user or user.is_deleted:
+        return None
+
+    pair = token_blacklist.claim_rotation(refresh_token, create_token_pair(user.username, user.is_admin, user.id),
+                                          REFRESH_ROTATION_GRACE_SECONDS)
+    token_blacklist.add(refresh_token)
+
+    return pair
+
+
+def set_auth_cookies(response: Response, access_token: str, refresh_token: str):
+    response.set_cookie('token', access_token)
+    response.set_cookie('refresh_token', refresh_token, max_age=REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60,
+                        httponly=True, samesite='lax')
+
+
+def delete_auth_cookies(response: Response):
+    response.delete_cookie('token')
+    response.delete_cookie('refresh_token')
+
+
 def verify_token(token: str):
     if token in token_blacklist:
         raise ForbiddenException("Token has been revoked")
@@ -38,11 +112,18 @@ def verify_token(token: str):
     if not token:
         return None
 
+    # Signature and claims are checked once per token, later calls reuse the decoded payload
+    digest = token_blacklist.digest(token)
+    payload = verified_token_cache.get(digest)
+    if payload is not None:
+        return payload
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username = payload.get('sub') if payload else None
-        if username is None:
+        if username is None or payload.get('type') == 'refresh':
             return None
+        verified_token_cache.put(digest, payload)
         return payload
     except JWTError:
             return None
@@ -52,6 +133,30 @@ def authenticate_user(username: str, password: str) -> Optional[UserResponse]:
 
     if not user_data or not verify_password(password, user_data[0][2]):
         return None
+
+    # Upgrade the stored hash when BCRYPT_ROUNDS has changed since it was created
+    if hashing.needs_rehash(user_data[0][2]):
+        update_query('UPDATE users SET password = ? WHERE user_id = ?', (get_password_hash(password), user_data[0][0]))
+        invalidate(f'users:{user_data[0][0]}')
+
+    return UserResponse.from_query_result(user_data[0])
+
+
+async def authenticate_user_async(username: str, password: str) -> Optional[UserResponse]:
+    """
+    authenticate_user for async routes: bcrypt is awaited on the hashing pool and the
+    queries run in the threadpool, so a login does not hold a worker thread while it waits.
+    """
+    user_data = await run_in_threadpool(read_query, 'SELECT * FROM users WHERE username=?', (username,))
+
+    if not user_data or not await hashing.verify_password_async(password, user_data[0][2]):
+        return None
+
+    if hashing.needs_rehash(user_data[0][2]):
+        hashed_password = await hashing.hash_password_async(password)
+        await run_in_threadpool(update_query, 'UPDATE users SET password = ? WHERE user_id = ?', (hashed_password, user_data[0][0]))
+        invalidate(f'users:{user_data[0][0]}')
+
     return UserResponse.from_query_result(user_data[0])
 
 
@@ -73,12 +178,5 @@ def get_current_admin_user(user: User = Depends(get_current_user)):
 UserAuthDep =  Annotated[User, Depends(get_current_user)]
 
 def hash_existing_user_passwords():
-    users = read_query('SELECT user_id, password FROM users')
-    
-    for user_id, plain_password in users:
-        if len(plain_password) != 60:
-            hashed_password = get_password_hash(plain_password)
-            
-            insert_query('UPDATE users SET password = ? WHERE user_id = ?', (hashed_password, user_id))
-    
-    print("All user passwords have been hashed successfully.")
\ No newline at end of file
+    # Kept for existing callers, the work is done by the resumable `python -m common.password_migration` job
+    return migrate_passwords()
@@ -0,0 +1,210 @@
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+import uuid
+from common.resp import RespClient
+
+
+logger = logging.getLogger(__name__)
+
+MAX_DATAGRAM = 65507
+# Message id, fragment index and fragment count in front of every UNIX datagram
+FRAGMENT_HEADER = struct.Struct('!16sHH')
+FRAGMENT_SIZE = MAX_DATAGRAM - FRAGMENT_HEADER.size
+FRAGMENT_TIMEOUT = 5.0
+
+
+class NullBroadcast:
+    """
+    Transport for a single process: nothing is sent anywhere.
+    """
+
+    def start(self, on_message):
+        pass
+
+    def send(self, data: bytes):
+        pass
+
+    def stop(self):
+        pass
+
+
+class UnixBroadcast:
+    """
+    Broadcast between processes on one host. Every process binds a UNIX datagram
+    socket in a shared directory and `send` writes to every other socket there.
+    Sockets left behind by dead processes are removed on the first failed send.
+    Messages larger than one datagram are split into fragments and reassembled
+    by the receiver.
+    """
+
+    def __init__(self, directory: str, send_timeout: float = 0.05):
+        self.directory = directory
+        self.send_timeout = send_timeout
+        self.path = os.path.join(directory, f'{os.getpid()}-{uuid.uuid4().hex[:8]}.sock')
+        self._sock = None
+
+    def start(self, on_message):
+        if self._sock is not None:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(self.path)
+
+        threading.Thread(target=self._receive, args=(self._sock, on_message), daemon=True,
+                         name=f'broadcast:{self.directory}').start()
+
+    def _receive(self, sock: socket.socket, on_message):
+        partial = {}
+
+        while True:
+            try:
+                datagram = sock.recv(MAX_DATAGRAM)
+            except OSError:
+                return
+
+            data = self._reassemble(partial, datagram)
+            if data is None:
+                continue
+
+            try:
+                on_message(data)
+            except Exception:
+                logger.exception('Broadcast handler failed')
+
+    @staticmethod
+    def _fragments(data: bytes) -> list[bytes]:
+        count = max(1, -(-len(data) // FRAGMENT_SIZE))
+        if count > 0xFFFF:
+            raise ValueError(f'Broadcast message of {len(data)} bytes is too large')
+
+        message_id = uuid.uuid4().bytes
+        return [FRAGMENT_HEADER.pack(message_id, index, count) + data[index * FRAGMENT_SIZE:(index + 1) * FRAGMENT_SIZE]
+                for index in range(count)]
+
+    @staticmethod
+    def _reassemble(partial: dict, datagram: bytes) -> bytes | None:
+        """
+        Returns the message once all its fragments have arrived. Fragments of messages
+        that stay incomplete for FRAGMENT_TIMEOUT, e.g. after a failed send, are dropped.
+        """
+        if len(datagram) < FRAGMENT_HEADER.size:
+            logger.warning('Dropped a malformed broadcast datagram')
+            return None
+
+        message_id, index, count = FRAGMENT_HEADER.unpack_from(datagram)
+        body = datagram[FRAGMENT_HEADER.size:]
+
+        if count == 1:
+            return body
+
+        now = time.monotonic()
+        for stale in [key for key, (started, _) in partial.items() if now - started > FRAGMENT_TIMEOUT]:
+            del partial[stale]
+
+        _, parts = partial.setdefault(message_id, (now, [None] * count))
+        if index >= len(parts):
+            return None
+
+        parts[index] = body
+        if any(part is None for part in parts):
+            return None
+
+        del partial[message_id]
+        return b''.join(parts)
+
+    def send(self, data: bytes):
+        fragments = self._fragments(data)
+
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as out:
+            out.settimeout(self.send_timeout)
+
+            for name in names:
+                path = os.path.join(self.directory, name)
+                if path == self.path or not name.endswith('.sock'):
+                    continue
+
+                try:
+                    for fragment in fragments:
+                        out.sendto(fragment, path)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    self._remove_stale(path)
+                except OSError:
+                    logger.warning('Broadcast to %s failed', path)
+
+    @staticmethod
+    def _remove_stale(path: str):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def stop(self):
+        if self._sock is None:
+            return
+
+        self._sock.close()
+        self._sock = None
+        self._remove_stale(self.path)
+
+
+class RespBroadcast:
+    """
+    Broadcast through PUBLISH/SUBSCRIBE on a Redis-protocol server, for workers on several hosts.
+    """
+
+    def __init__(self, url: str, channel: str):
+        self.client = RespClient(url)
+        self.channel = channel
+        self._running = False
+
+    def start(self, on_message):
+        if self._running:
+            return
+
+        self._running = True
+        threading.Thread(target=self._receive, args=(on_message,), daemon=True,
+                         name=f'broadcast:{self.channel}').start()
+
+    def _receive(self, on_message):
+        while self._running:
+            try:
+                for _, data in self.client.subscribe(self.channel):
+                    if not self._running:
+                        return
+                    try:
+                        on_message(data)
+                    except Exception:
+                        logger.exception('Broadcast handler failed')
+            except (OSError, ConnectionError):
+                logger.warning('Lost subscription to %s, reconnecting', self.channel)
+                time.sleep(1)
+
+    def send(self, data: bytes):
+        try:
+            self.client.execute('PUBLISH', self.channel, data)
+        except (OSError, ConnectionError):
+            logger.warning('Publish to %s failed', self.channel)
+
+    def stop(self):
+        self._running = False
+
+
+def create_broadcast(name: str, directory: str = None, url: str = None, channel: str = None):
+    if name == 'none':
+        return NullBroadcast()
+    if name == 'unix':
+        return UnixBroadcast(directory)
+    if name == 'redis':
+        return RespBroadcast(url, channel)
+
+    raise ValueError(f'Unknown broadcast transport: {name}')
@@ -0,0 +1,62 @@
+import asyncio
+import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from common.broadcast import create_broadcast
+from common.connections import ConnectionManager, manager
+from config import CHAT_BACKPLANE, CHAT_BACKPLANE_DIR, REDIS_URL
+
+
+class ChatBackplane:
+    """
+    Delivers chat payloads to users wherever their sockets are open. Sockets on this
+    worker are served directly; the event is also published on the transport and
+    every other worker delivers it to the sockets it holds for those users.
+    """
+
+    def __init__(self, connections: ConnectionManager, transport):
+        self.connections = connections
+        self.transport = transport
+        self.origin = uuid.uuid4().hex
+        self.published = 0
+        self.received = 0
+        self._loop = None
+        # One sender thread keeps publishes in order without blocking the event loop
+        self._sender = ThreadPoolExecutor(max_workers=1, thread_name_prefix='chat-backplane')
+
+    def send(self, deliveries: list[tuple[int, dict | str]]):
+        """
+        Queues each (user_id, event) on that user's sockets on every worker.
+        """
+        self._deliver(deliveries)
+
+        data = json.dumps({'origin': self.origin, 'deliveries': deliveries}).encode()
+        self.published += 1
+        self._sender.submit(self.transport.send, data)
+
+    def _deliver(self, deliveries):
+        for user_id, event in deliveries:
+            self.connections.send_to_user(user_id, event)
+
+    def _receive(self, data: bytes):
+        # Runs on the transport's thread, hand the event over to the event loop
+        message = json.loads(data)
+
+        if message.get('origin') == self.origin or self._loop is None:
+            return
+
+        self.received += 1
+        self._loop.call_soon_threadsafe(self._deliver, message['deliveries'])
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self.transport.start(self._receive)
+
+    def stop(self):
+        self._sender.shutdown(wait=True)
+        self.transport.stop()
+        self._loop = None
+
+
+backplane = ChatBackplane(manager, create_broadcast(CHAT_BACKPLANE, directory=CHAT_BACKPLANE_DIR, url=REDIS_URL,
+                                                    channel='forum:chat'))
@@ -0,0 +1,44 @@
+import hashlib
+from fastapi import Request, Response
+
+
+def make_etag(*parts) -> str:
+    """
+    Weak ETag over the parts of a resource version, e.g. the values returned by
+    `topics_services.topic_version` together with who is looking at the page.
+    """
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith('W/') else tag
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Weak comparison of an If-None-Match header against the current ETag.
+    """
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == '*':
+        return True
+
+    return _opaque(etag) in (_opaque(tag) for tag in if_none_match.split(','))
+
+
+def is_fresh(request: Request, etag: str) -> bool:
+    return etag_matches(request.headers.get('if-none-match'), etag)
+
+
+def set_etag(response: Response, etag: str) -> Response:
+    # Pages depend on the viewer, so only the browser may keep them and it must revalidate each time
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def not_modified(etag: str) -> Response:
+    return set_etag(Response(status_code=304), etag)
@@ -0,0 +1,265 @@
+import asyncio
+import logging
+import time
+import uuid
+from fastapi import WebSocket
+from common.ws_protocol import JSON, JsonCodec, MsgpackCodec
+from config import (WEBSOCKET_HEARTBEAT_SECONDS, WEBSOCKET_IDLE_SECONDS, WEBSOCKET_MAX_CONNECTIONS,
+                    WEBSOCKET_MAX_PER_USER, WEBSOCKET_OVERFLOW_POLICY, WEBSOCKET_SEND_QUEUE_SIZE)
+
+
+logger = logging.getLogger(__name__)
+
+DROP_OLDEST = 'drop_oldest'
+DISCONNECT = 'disconnect'
+
+CLOSE_GOING_AWAY = 1001
+# "Try again later": the client fell behind or the worker is full
+CLOSE_TRY_AGAIN = 1013
+# The user opened more sockets than allowed and this was the oldest one
+CLOSE_REPLACED = 4000
+
+PING = {'type': 'ping'}
+
+
+class Connection:
+    """
+    One WebSocket with its own bounded outbound queue, drained by a writer task.
+    Senders only enqueue, so a slow client never holds up anyone else. Events are
+    encoded with the codec of the subprotocol the client negotiated.
+    """
+
+    def __init__(self, websocket: WebSocket, user_id: int, queue_size: int, overflow_policy: str,
+                 codec: JsonCodec | MsgpackCodec = JSON):
+        self.id = uuid.uuid4().hex
+        self.websocket = websocket
+        self.user_id = user_id
+        self.codec = codec
+        self.overflow_policy = overflow_policy
+        self.queue: asyncio.Queue[str | bytes] = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.closed = False
+        self.connected_at = self.last_seen = time.monotonic()
+        self._writer = None
+
+    def start(self):
+        self._writer = asyncio.create_task(self._write())
+
+    async def _write(self):
+        try:
+            while True:
+                payload = await self.queue.get()
+                try:
+                    if isinstance(payload, bytes):
+                        await self.websocket.send_bytes(payload)
+                    else:
+                        await self.websocket.send_text(payload)
+                finally:
+                    self.queue.task_done()
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            # The peer went away mid-send; the receive loop will notice and clean up
+            self.closed = True
+
+    def offer(self, payload: str | bytes) -> bool:
+        """
+        Queues a payload for sending. When the queue is full the overflow policy
+        either drops the oldest queued payload or disconnects the client.
+        Returns False if the payload was not queued.
+        """
+        if self.closed:
+            return False
+
+        try:
+            self.queue.put_nowait(payload)
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        if self.overflow_policy == DISCONNECT:
+            asyncio.create_task(self.close(CLOSE_TRY_AGAIN))
+            self.closed = True
+            return False
+
+        self.queue.get_nowait()
+        self.queue.task_done()
+        self.dropped += 1
+        self.queue.put_nowait(payload)
+        return True
+
+    async def close(self, code: int):
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+    async def stop(self):
+        self.closed = True
+
+        if self._writer:
+            self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+
+
+class ConnectionManager:
+    """
+    Open WebSockets indexed by the authenticated user, so a message is delivered to
+    the sockets of its participants only. A user may have several sockets open.
+
+    Every `heartbeat_seconds` each socket is sent a ping; one that has sent nothing
+    (message or pong) for `idle_seconds` is closed, so dead peers do not linger.
+    """
+
+    def __init__(self, queue_size: int = 256, overflow_policy: str = DROP_OLDEST, max_connections: int = 10000,
+                 max_per_user: int = 5, heartbeat_seconds: float = 25, idle_seconds: float = 75) -> None:
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+        self.max_connections = max_connections
+        self.max_per_user = max_per_user
+        self.heartbeat_seconds = heartbeat_seconds
+        self.idle_seconds = idle_seconds
+        self.active_connections: dict[WebSocket, Connection] = {}
+        self.user_connections: dict[int, set[Connection]] = {}
+        self.accepting = True
+        self.reaped = 0
+        self.rejected = 0
+        self._heartbeat = None
+
+    async def connect(self, websocket: WebSocket, user_id: int, codec: JsonCodec | MsgpackCodec = JSON,
+                      subprotocol: str | None = None) -> Connection | None:
+        """
+        Accepts the socket, or refuses it and returns None when the worker is full or draining.
+        A user over their limit loses their oldest socket instead.
+        """
+        if not self.accepting or len(self.active_connections) >= self.max_connections:
+            self.rejected += 1
+            await websocket.close(code=CLOSE_TRY_AGAIN)
+            return None
+
+        await websocket.accept(subprotocol=subprotocol)
+
+        existing = self.connections_for(user_id)
+        if len(existing) >= self.max_per_user:
+            await self._drop(min(existing, key=lambda connection: connection.connected_at), CLOSE_REPLACED)
+
+        connection = Connection(websocket, user_id, self.queue_size, self.overflow_policy, codec)
+        connection.start()
+        self.active_connections[websocket] = connection
+        self.user_connections.setdefault(user_id, set()).add(connection)
+
+        return connection
+
+    def touch(self, websocket: WebSocket):
+        connection = self.active_connections.get(websocket)
+        if connection:
+            connection.last_seen = time.monotonic()
+
+    def connections_for(self, user_id: int) -> set[Connection]:
+        return self.user_connections.get(user_id, set())
+
+    def send_to_user(self, user_id: int, event: dict | str) -> int:
+        return self.fan_out(self.connections_for(user_id), event)
+
+    def send_message(self, websocket: WebSocket, event: dict | str) -> bool:
+        connection = self.active_connections.get(websocket)
+        return connection.offer(connection.codec.encode(event)) if connection else False
+
+    def fan_out(self, connections, event: dict | str) -> int:
+        """
+        Queues an event on every connection, returns how many accepted it. The event is
+        encoded once per protocol in use, not once per connection. A string is taken
+        as an already-encoded JSON event.
+        """
+        encoded = {}
+        delivered = 0
+
+        for connection in connections:
+            if connection.codec not in encoded:
+                encoded[connection.codec] = connection.codec.encode(event)
+            delivered += connection.offer(encoded[connection.codec])
+
+        return delivered
+
+    async def disconnect(self, websocket: WebSocket) -> str | None:
+        connection = self.active_connections.pop(websocket, None)
+
+        if connection is None:
+            return None
+
+        user_connections = self.user_connections.get(connection.user_id)
+        if user_connections is not None:
+            user_connections.discard(connection)
+            if not user_connections:
+                del self.user_connections[connection.user_id]
+
+        await connection.stop()
+
+        if connection.dropped:
+            logger.info('Connection %s dropped %d messages', connection.id, connection.dropped)
+
+        return connection.id
+
+    async def _drop(self, connection: Connection, code: int):
+        await self.disconnect(connection.websocket)
+        await connection.close(code)
+
+    async def check_liveness(self):
+        now = time.monotonic()
+
+        for connection in list(self.active_connections.values()):
+            if connection.closed or now - connection.last_seen > self.idle_seconds:
+                self.reaped += 1
+                await self._drop(connection, CLOSE_GOING_AWAY)
+            else:
+                connection.offer(connection.codec.encode(PING))
+
+    async def _run_heartbeat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            try:
+                await self.check_liveness()
+            except Exception:
+                logger.exception('WebSocket heartbeat failed')
+
+    def start(self):
+        self.accepting = True
+
+        if self._heartbeat is None:
+            self._heartbeat = asyncio.get_running_loop().create_task(self._run_heartbeat())
+
+    async def drain(self, timeout: float = 5.0):
+        """
+        Stops accepting sockets, gives queued messages up to `timeout` seconds to go
+        out, then closes every socket as "going away" so clients reconnect elsewhere.
+        """
+        self.accepting = False
+
+        if self._heartbeat:
+            self._heartbeat.cancel()
+            await asyncio.gather(self._heartbeat, return_exceptions=True)
+            self._heartbeat = None
+
+        connections = list(self.active_connections.values())
+
+        if connections:
+            await asyncio.wait([asyncio.create_task(connection.queue.join()) for connection in connections],
+                               timeout=timeout)
+
+        for connection in connections:
+            await self._drop(connection, CLOSE_GOING_AWAY)
+
+    def stats(self) -> dict:
+        return {
+            'connections': len(self.active_connections),
+            'users': len(self.user_connections),
+            'queued': sum(connection.queue.qsize() for connection in self.active_connections.values()),
+            'dropped': sum(connection.dropped for connection in self.active_connections.values()),
+            'reaped': self.reaped,
+            'rejected': self.rejected
+        }
+
+
+manager = ConnectionManager(queue_size=WEBSOCKET_SEND_QUEUE_SIZE, overflow_policy=WEBSOCKET_OVERFLOW_POLICY,
+                            max_connections=WEBSOCKET_MAX_CONNECTIONS, max_per_user=WEBSOCKET_MAX_PER_USER,
+                            heartbeat_seconds=WEBSOCKET_HEARTBEAT_SECONDS, idle_seconds=WEBSOCKET_IDLE_SECONDS)
@@ -18,4 +18,8 @@ class BadRequestException(HTTPException):
 
 class UnauthorizedException(HTTPException):
     def __init__(self, detail, status_code: int = 401):
-        super().__init__(status_code=status_code, detail=detail)     
\ No newline at end of file
+        super().__init__(status_code=status_code, detail=detail)
+
+class ServiceUnavailableException(HTTPException):
+    def __init__(self, detail, status_code: int = 503):
+        super().__init__(status_code=status_code, detail=detail)
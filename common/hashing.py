@@ -0,0 +1,87 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from passlib.context import CryptContext
+from common.exceptions import ServiceUnavailableException
+from config import BCRYPT_ROUNDS, PASSWORD_HASH_QUEUE_DEPTH, PASSWORD_HASH_WORKERS
+
+
+pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto', bcrypt__rounds=BCRYPT_ROUNDS)
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(PASSWORD_HASH_QUEUE_DEPTH)
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS,
+                                                mp_context=multiprocessing.get_context('spawn'))
+    return _executor
+
+
+def _submit(fn, *args) -> Future:
+    """
+    Queues bcrypt work on the hashing pool. Rejects the call instead of queueing
+    without limit once PASSWORD_HASH_QUEUE_DEPTH jobs are pending.
+    """
+    if not _slots.acquire(blocking=False):
+        raise ServiceUnavailableException('Too many login attempts in progress, please try again')
+
+    try:
+        future = _get_executor().submit(fn, *args)
+    except Exception:
+        _slots.release()
+        raise
+
+    future.add_done_callback(lambda _: _slots.release())
+    return future
+
+
+def hash_password(password: str) -> str:
+    return _submit(_hash, password).result()
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return _submit(_verify, plain_password, hashed_password).result()
+
+
+async def hash_password_async(password: str) -> str:
+    return await asyncio.wrap_future(_submit(_hash, password))
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await asyncio.wrap_future(_submit(_verify, plain_password, hashed_password))
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """
+    True for bcrypt hashes made with a cost factor other than BCRYPT_ROUNDS.
+    """
+    parts = hashed_password.split('$') if hashed_password else []
+
+    if len(parts) < 4 or not parts[1].startswith('2') or not parts[2].isdigit():
+        return False
+
+    return int(parts[2]) != BCRYPT_ROUNDS
+
+
+def shutdown():
+    global _executor
+
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
@@ -0,0 +1,71 @@
+import json
+import threading
+import uuid
+from common.broadcast import create_broadcast
+from config import INVALIDATION_BUS, INVALIDATION_BUS_DIR, REDIS_URL
+
+
+class InvalidationBus:
+    """
+    Tells the other workers which cache tags were invalidated by a write in this one.
+    Handlers subscribed here run in every worker except the publishing one.
+
+    Delivery is best-effort: a datagram can be dropped when a receiver is busy. Each
+    publisher numbers its messages, and a receiver that sees a gap in a publisher's
+    numbers runs the `on_lost` handlers, which drop everything that may be stale. A
+    lost message is only noticed when the next one from the same publisher arrives,
+    so the caches still need their own expiry as the final bound on staleness.
+    """
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.origin = uuid.uuid4().hex
+        self.handlers = []
+        self.lost_handlers = []
+        self.published = 0
+        self.received = 0
+        self.lost = 0
+        self._last_sequence: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, handler):
+        self.handlers.append(handler)
+
+    def on_lost(self, handler):
+        self.lost_handlers.append(handler)
+
+    def publish(self, tags):
+        with self._lock:
+            self.published += 1
+            sequence = self.published
+
+        self.transport.send(json.dumps({'origin': self.origin, 'sequence': sequence, 'tags': list(tags)}).encode())
+
+    def _receive(self, data: bytes):
+        message = json.loads(data)
+        origin, sequence = message.get('origin'), message.get('sequence')
+
+        if origin == self.origin:
+            return
+
+        last = self._last_sequence.get(origin)
+        self._last_sequence[origin] = sequence
+        self.received += 1
+
+        if last is not None and sequence != last + 1:
+            self.lost += max(sequence - last - 1, 1)
+            for handler in self.lost_handlers:
+                handler()
+
+        for handler in self.handlers:
+            handler(message['tags'])
+
+    def start(self):
+        self.transport.start(self._receive)
+
+    def stop(self):
+        self.transport.stop()
+
+
+bus = InvalidationBus(create_broadcast(INVALIDATION_BUS, directory=INVALIDATION_BUS_DIR, url=REDIS_URL,
+                                       channel='forum:invalidation'))
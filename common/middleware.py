@@ -0,0 +1,178 @@
+import zlib
+from fastapi import Response
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import HTTPConnection
+from common import auth
+from common.exceptions import ForbiddenException, ServiceUnavailableException
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class TokenRefreshMiddleware:
+    """
+    Renews the short-lived `token` cookie from the `refresh_token` cookie when it
+    has expired, so web pages keep the user logged in without a password check.
+    The request is rewritten to carry the new access token and the response sets
+    both new cookies.
+    """
+
+    def __init__(self, app, skip_prefixes: tuple[str, ...] = ('/static', '/api')):
+        self.app = app
+        self.skip_prefixes = skip_prefixes
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'].startswith(self.skip_prefixes):
+            return await self.app(scope, receive, send)
+
+        cookies = HTTPConnection(scope).cookies
+        refresh_token = cookies.get('refresh_token')
+
+        if not refresh_token:
+            return await self.app(scope, receive, send)
+
+        try:
+            # Verifying may query the revocation backend, keep that off the event loop
+            if await run_in_threadpool(_is_valid, cookies.get('token')):
+                tokens = None
+            else:
+                tokens = await run_in_threadpool(auth.rotate_refresh_token, refresh_token)
+        except ServiceUnavailableException:
+            # The revocation backend is down; the route's own token check answers with a 503
+            tokens = None
+
+        if not tokens:
+            return await self.app(scope, receive, send)
+
+        cookies['token'], cookies['refresh_token'] = tokens
+        cookie_header = '; '.join(f'{name}={value}' for name, value in cookies.items()).encode('latin-1')
+        scope = dict(scope, headers=[(name, value) for name, value in scope['headers'] if name != b'cookie']
+                     + [(b'cookie', cookie_header)])
+
+        cookie_response = Response()
+        auth.set_auth_cookies(cookie_response, *tokens)
+        set_cookie_headers = [header for header in cookie_response.raw_headers if header[0] == b'set-cookie']
+
+        async def send_with_cookies(message):
+            if message['type'] == 'http.response.start':
+                message = dict(message, headers=list(message.get('headers', [])) + set_cookie_headers)
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookies)
+
+
+def _is_valid(token: str) -> bool:
+    try:
+        return auth.verify_token(token) is not None
+    except ForbiddenException:
+        return False
+
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'image/svg+xml')
+
+
+def choose_encoding(accept_encoding: str, encodings: tuple[str, ...] = None) -> str | None:
+    """
+    Picks the first of `encodings`, by default brotli (when installed) then gzip, that an
+    Accept-Encoding header allows, honouring q=0.
+    """
+    accepted = {}
+
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    for encoding in encodings or (('br', 'gzip') if brotli else ('gzip',)):
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+
+    return None
+
+
+class _Compressor:
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == 'br':
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, last: bool) -> bytes:
+        # Flush every chunk of a streamed body so the client can start rendering it
+        if self._brotli:
+            return self._brotli.process(data) + (self._brotli.finish() if last else self._brotli.flush())
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    """
+    Compresses text and JSON responses with the best encoding the client accepts.
+    Complete bodies smaller than `minimum_size` go out as they are; streamed bodies
+    are compressed chunk by chunk. Static files are skipped, they are precompressed
+    at build time (see common.static_assets).
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4,
+                 skip_prefixes: tuple[str, ...] = ('/static',)):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.skip_prefixes = skip_prefixes
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'].startswith(self.skip_prefixes):
+            return await self.app(scope, receive, send)
+
+        encoding = choose_encoding(Headers(scope=scope).get('accept-encoding', ''))
+
+        if not encoding:
+            return await self.app(scope, receive, send)
+
+        start = None
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, compressor, passthrough
+
+            if message['type'] == 'http.response.start':
+                start = message
+                return
+
+            if message['type'] != 'http.response.body' or passthrough:
+                return await send(message)
+
+            body = message.get('body', b'')
+            more_body = message.get('more_body', False)
+
+            if compressor is None:
+                headers = MutableHeaders(raw=list(start.get('headers', [])))
+
+                if ('content-encoding' in headers or start['status'] in (204, 304)
+                        or not headers.get('content-type', '').startswith(COMPRESSIBLE_TYPES)
+                        or (not more_body and len(body) < self.minimum_size)):
+                    passthrough = True
+                    await send(start)
+                    return await send(message)
+
+                compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                del headers['content-length']
+                headers['content-encoding'] = encoding
+                headers.add_vary_header('Accept-Encoding')
+                await send(dict(start, headers=headers.raw))
+
+            await send({'type': 'http.response.body', 'body': compressor.compress(body, not more_body),
+                        'more_body': more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,96 @@
+"""
+Hashes legacy plain-text passwords in the users table.
+
+Usage:
+    python -m common.password_migration [--batch-size 500] [--workers N] [--checkpoint FILE] [--restart]
+
+Progress is checkpointed after every committed batch, so an interrupted run
+picks up from the last migrated user_id when started again.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from common.hashing import _hash
+from common.query_cache import invalidate
+from data.database import read_query, update_many
+
+
+BCRYPT_HASH_LENGTH = 60
+DEFAULT_CHECKPOINT = 'password_migration.checkpoint'
+
+
+def load_checkpoint(path: str) -> int:
+    if not os.path.exists(path):
+        return 0
+
+    with open(path) as file:
+        return json.load(file).get('last_user_id', 0)
+
+
+def save_checkpoint(path: str, last_user_id: int, migrated: int):
+    tmp_path = f'{path}.tmp'
+
+    with open(tmp_path, 'w') as file:
+        json.dump({'last_user_id': last_user_id, 'migrated': migrated}, file)
+
+    os.replace(tmp_path, path)
+
+
+def migrate_passwords(batch_size: int = 500, workers: int = None, checkpoint: str = DEFAULT_CHECKPOINT, restart: bool = False) -> int:
+    """
+    Hashes every password that is not already a bcrypt hash.
+    Hashing is spread over a process pool and each batch is written with a single executemany.
+    Returns the number of passwords migrated in this run.
+    """
+    last_user_id = 0 if restart else load_checkpoint(checkpoint)
+    migrated = 0
+    started = time.perf_counter()
+
+    if last_user_id:
+        print(f'Resuming after user_id {last_user_id}')
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunksize = max(1, batch_size // ((workers or os.cpu_count() or 1) * 4))
+
+        while True:
+            rows = read_query('SELECT user_id, password FROM users WHERE user_id > ? ORDER BY user_id LIMIT ?',
+                              (last_user_id, batch_size))
+            if not rows:
+                break
+
+            legacy = [(user_id, password) for user_id, password in rows if len(password) != BCRYPT_HASH_LENGTH]
+
+            if legacy:
+                hashed = executor.map(_hash, [password for _, password in legacy], chunksize=chunksize)
+                update_many('UPDATE users SET password = ? WHERE user_id = ?',
+                            [(hashed_password, user_id) for (user_id, _), hashed_password in zip(legacy, hashed)])
+                invalidate(*(f'users:{user_id}' for user_id, _ in legacy))
+
+            migrated += len(legacy)
+            last_user_id = rows[-1][0]
+            save_checkpoint(checkpoint, last_user_id, migrated)
+
+            elapsed = time.perf_counter() - started
+            print(f'Migrated {migrated} passwords up to user_id {last_user_id} ({migrated / elapsed:.1f}/s)')
+
+    elapsed = time.perf_counter() - started
+    print(f'All user passwords have been hashed successfully. {migrated} migrated in {elapsed:.1f}s.')
+
+    return migrated
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Hash legacy plain-text user passwords')
+    parser.add_argument('--batch-size', type=int, default=500, help='Users read, hashed and updated per batch')
+    parser.add_argument('--workers', type=int, default=None, help='Hashing processes, defaults to the CPU count')
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT, help='File that records progress between runs')
+    parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint and start from the first user')
+    args = parser.parse_args()
+
+    migrate_passwords(batch_size=args.batch_size, workers=args.workers, checkpoint=args.checkpoint, restart=args.restart)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from common.broadcast import create_broadcast
+from common.connections import ConnectionManager, manager
+from config import CHAT_BACKPLANE, PRESENCE_DIR, PRESENCE_PUSH_SECONDS, PRESENCE_TTL_SECONDS, REDIS_URL
+
+
+logger = logging.getLogger(__name__)
+
+# User ids per announcement, keeps a full re-announcement within one datagram
+ANNOUNCE_CHUNK = 2000
+
+
+class PresenceRegistry:
+    """
+    Which users are online on any worker, kept in memory. A user is online here while
+    one of their sockets on this worker has been heard from (a message or a pong) within
+    `ttl_seconds`, so connects, disconnects and heartbeats all show up on the next tick.
+
+    Every `interval_seconds` a worker publishes who came online and went offline on it,
+    and re-announces everyone every third of the TTL. Users another worker stops
+    announcing expire after `ttl_seconds`, so those of a crashed worker drop off too.
+    Subscribers are called once per tick at most, with the changes since the last one.
+    """
+
+    def __init__(self, connections: ConnectionManager, transport, ttl_seconds: float = 60,
+                 interval_seconds: float = 1.0):
+        self.connections = connections
+        self.transport = transport
+        self.ttl_seconds = ttl_seconds
+        self.interval_seconds = interval_seconds
+        self.origin = uuid.uuid4().hex
+        self.handlers = []
+        # Replaced, never mutated, so templates rendering in the threadpool can read it
+        self.online: frozenset[int] = frozenset()
+        self._local: set[int] = set()
+        # origin -> user_id -> when that worker's announcement of the user expires
+        self._remote: dict[str, dict[int, float]] = {}
+        self._announced_at = 0.0
+        self._loop = None
+        self._task = None
+        self._sender = ThreadPoolExecutor(max_workers=1, thread_name_prefix='presence')
+
+    def subscribe(self, handler):
+        self.handlers.append(handler)
+
+    def is_online(self, user_ids) -> set[int]:
+        """
+        Returns those of `user_ids` that are online, without touching the database.
+        """
+        online = self.online
+        return {user_id for user_id in user_ids if user_id in online}
+
+    def _local_users(self, now: float) -> set[int]:
+        return {user_id for user_id, connections in self.connections.user_connections.items()
+                if any(now - connection.last_seen <= self.ttl_seconds for connection in connections)}
+
+    def _announce(self, online, offline):
+        online, offline = list(online), list(offline)
+
+        for start in range(0, max(len(online), len(offline)), ANNOUNCE_CHUNK):
+            data = json.dumps({'origin': self.origin, 'online': online[start:start + ANNOUNCE_CHUNK],
+                               'offline': offline[start:start + ANNOUNCE_CHUNK]}).encode()
+            self._sender.submit(self.transport.send, data)
+
+    def _receive(self, data: bytes):
+        # Runs on the transport's thread, hand the announcement over to the event loop
+        message = json.loads(data)
+
+        if message.get('origin') == self.origin or self._loop is None:
+            return
+
+        self._loop.call_soon_threadsafe(self._apply, message)
+
+    def _apply(self, message: dict):
+        seen = self._remote.setdefault(message['origin'], {})
+        expires = time.monotonic() + self.ttl_seconds
+
+        for user_id in message['online']:
+            seen[user_id] = expires
+        for user_id in message['offline']:
+            seen.pop(user_id, None)
+
+    def tick(self):
+        now = time.monotonic()
+
+        local = self._local_users(now)
+        came_online, went_offline = local - self._local, self._local - local
+        self._local = local
+
+        if now - self._announced_at >= self.ttl_seconds / 3:
+            self._announce(local, went_offline)
+            self._announced_at = now
+        elif came_online or went_offline:
+            self._announce(came_online, went_offline)
+
+        for origin, seen in list(self._remote.items()):
+            for user_id in [user_id for user_id, expires in seen.items() if expires < now]:
+                del seen[user_id]
+            if not seen:
+                del self._remote[origin]
+
+        online = frozenset(local.union(*self._remote.values()))
+        added, removed = online - self.online, self.online - online
+        self.online = online
+
+        if not added and not removed:
+            return
+
+        for handler in self.handlers:
+            try:
+                handler(added, removed)
+            except Exception:
+                logger.exception('Presence subscriber failed')
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                self.tick()
+            except Exception:
+                logger.exception('Presence update failed')
+
+    def start(self):
+        if self._task:
+            return
+
+        self._loop = asyncio.get_running_loop()
+        self.transport.start(self._receive)
+        self._task = self._loop.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+        # Let the other workers drop this worker's users now rather than after the TTL
+        self._announce([], self._local)
+        self._local = set()
+        self._sender.shutdown(wait=True)
+        self.transport.stop()
+        self._loop = None
+
+
+presence = PresenceRegistry(manager, create_broadcast(CHAT_BACKPLANE, directory=PRESENCE_DIR, url=REDIS_URL,
+                                                      channel='forum:presence'),
+                            ttl_seconds=PRESENCE_TTL_SECONDS, interval_seconds=PRESENCE_PUSH_SECONDS)
@@ -0,0 +1,233 @@
+import functools
+import inspect
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from common.invalidation_bus import bus
+from config import QUERY_CACHE_MAX_BYTES, QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_TTL_SECONDS
+
+
+class QueryCache:
+    """
+    LRU cache for service query results, bounded by entry count and approximate size.
+
+    Every entry carries tags naming what it was read from: a table ('users') or a
+    row ('users:5'). Invalidating a row drops entries tagged with that row and
+    entries tagged with its whole table; invalidating a table drops everything
+    tagged with the table or any of its rows.
+
+    Entries also expire `ttl_seconds` after they were stored, so a worker that
+    missed an invalidation from another one serves stale data for at most that long.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: float = 30):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.entries: OrderedDict[tuple, tuple[object, int, tuple[str, ...], float]] = OrderedDict()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        # table -> row (None for the table tag itself) -> cache keys
+        self._tag_index: dict[str, dict[str | None, set]] = {}
+        # bumped on every invalidation, lets a read that raced a write skip storing stale data
+        self._generations: dict[str, int] = {}
+        # bumped by clear, for reads that raced it
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _split(tag: str) -> tuple[str, str | None]:
+        table, _, row = tag.partition(':')
+        return table, row or None
+
+    def generation(self, tags: tuple[str, ...]) -> tuple[int, ...]:
+        return (self._epoch,) + tuple(self._generations.get(self._split(tag)[0], 0) for tag in tags)
+
+    def get(self, key) -> tuple[bool, object]:
+        with self._lock:
+            entry = self.entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return False, None
+
+            if entry[3] <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return False, None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+
+    def put(self, key, value, tags: tuple[str, ...], generation: tuple[int, ...]):
+        try:
+            size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return
+
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if self.generation(tags) != generation:
+                return
+
+            self._remove(key)
+            expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds > 0 else float('inf')
+            self.entries[key] = (value, size, tags, expires_at)
+            self.size_bytes += size
+
+            for tag in tags:
+                table, row = self._split(tag)
+                self._tag_index.setdefault(table, {}).setdefault(row, set()).add(key)
+
+            while self.entries and (len(self.entries) > self.max_entries or self.size_bytes > self.max_bytes):
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+
+        if entry is None:
+            return
+
+        _, size, tags, _ = entry
+        self.size_bytes -= size
+
+        for tag in tags:
+            table, row = self._split(tag)
+            rows = self._tag_index.get(table)
+            if rows and row in rows:
+                rows[row].discard(key)
+                if not rows[row]:
+                    del rows[row]
+
+    def invalidate(self, *tags: str):
+        with self._lock:
+            for tag in tags:
+                table, row = self._split(tag)
+                self._generations[table] = self._generations.get(table, 0) + 1
+                rows = self._tag_index.get(table, {})
+
+                if row is None:
+                    keys = set().union(*rows.values()) if rows else set()
+                else:
+                    keys = rows.get(row, set()) | rows.get(None, set())
+
+                for key in list(keys):
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self.entries.clear()
+            self._tag_index.clear()
+            self.size_bytes = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'size_bytes': self.size_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations
+        }
+
+
+query_cache = QueryCache(max_entries=QUERY_CACHE_MAX_ENTRIES, max_bytes=QUERY_CACHE_MAX_BYTES,
+                         ttl_seconds=QUERY_CACHE_TTL_SECONDS)
+_listeners = []
+
+
+def on_invalidate(listener):
+    """
+    Registers a callback that receives the tags of every invalidation, local or from another worker.
+    The tags are None when an invalidation from another worker was lost and everything may be stale.
+    """
+    _listeners.append(listener)
+
+
+def _invalidate_local(tags):
+    query_cache.invalidate(*tags)
+
+    for listener in _listeners:
+        listener(tags)
+
+
+def _flush_local():
+    query_cache.clear()
+
+    for listener in _listeners:
+        listener(None)
+
+
+bus.subscribe(_invalidate_local)
+bus.on_lost(_flush_local)
+
+
+def invalidate(*tags: str):
+    """
+    Drops the tags from this worker's cache and tells the other workers to do the same.
+    """
+    _invalidate_local(tags)
+    bus.publish(tags)
+
+
+def cached(*tag_templates: str):
+    """
+    Read-through cache for a service function. Tag templates are formatted with
+    the call's arguments, e.g. @cached('replies:{reply_id}').
+    Results are shared between callers and must be treated as read-only.
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+        name = f'{fn.__module__}.{fn.__qualname__}'
+
+        def prepare(args, kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (name, tuple(bound.arguments.items()))
+            tags = tuple(template.format(**bound.arguments) for template in tag_templates)
+            return key, tags
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key, tags = prepare(args, kwargs)
+            found, value = query_cache.get(key)
+            if found:
+                return value
+
+            generation = query_cache.generation(tags)
+            value = fn(*args, **kwargs)
+            query_cache.put(key, value, tags, generation)
+            return value
+
+        if hasattr(fn, 'async_call'):
+            async def async_call(*args, **kwargs):
+                key, tags = prepare(args, kwargs)
+                found, value = query_cache.get(key)
+                if found:
+                    return value
+
+                generation = query_cache.generation(tags)
+                value = await fn.async_call(*args, **kwargs)
+                query_cache.put(key, value, tags, generation)
+                return value
+
+            wrapper.async_call = async_call
+
+        return wrapper
+
+    return decorator
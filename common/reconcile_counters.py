@@ -0,0 +1,97 @@
+"""
+Recomputes the reply and activity counters of topics and the topic and reply
+counters of categories from the replies and topics themselves.
+
+Usage:
+    python -m common.reconcile_counters [--batch-size 1000]
+
+The services keep the counters in step as they write, so this only repairs
+drift, e.g. after rows were changed by hand. Topics are recounted a batch of
+topic ids per transaction, so the job does not hold long locks on a busy forum
+and can be run at any time.
+"""
+import argparse
+import time
+from data.database import read_query, transaction
+from common.query_cache import invalidate
+
+
+def reconcile_topics(batch_size: int = 1000) -> int:
+    """
+    Recounts reply_count and last_reply_id of every topic and sets last_activity_at to its
+    newest reply. Topics without replies keep their last_activity_at, there is no creation
+    time to fall back to. Returns the number of topics corrected.
+    """
+    corrected = 0
+    last_topic_id = 0
+
+    while True:
+        rows = read_query('SELECT topic_id FROM topics WHERE topic_id > ? ORDER BY topic_id LIMIT ?',
+                          (last_topic_id, batch_size))
+        if not rows:
+            break
+
+        first_topic_id, last_topic_id = rows[0][0], rows[-1][0]
+
+        with transaction() as cursor:
+            cursor.execute('''UPDATE topics t
+                              LEFT JOIN (SELECT topic_id, COUNT(*) AS reply_count, MAX(reply_id) AS last_reply_id,
+                                                MAX(created) AS last_reply_at
+                                         FROM replies
+                                         WHERE topic_id BETWEEN ? AND ?
+                                         GROUP BY topic_id) r ON r.topic_id = t.topic_id
+                              SET t.reply_count = COALESCE(r.reply_count, 0),
+                                  t.last_reply_id = r.last_reply_id,
+                                  t.last_activity_at = COALESCE(r.last_reply_at, t.last_activity_at)
+                              WHERE t.topic_id BETWEEN ? AND ?
+                              AND (t.reply_count <> COALESCE(r.reply_count, 0)
+                                   OR NOT (t.last_reply_id <=> r.last_reply_id)
+                                   OR t.last_activity_at <> r.last_reply_at)''',
+                           (first_topic_id, last_topic_id, first_topic_id, last_topic_id))
+            corrected += cursor.rowcount
+
+    return corrected
+
+
+def reconcile_categories() -> int:
+    """
+    Recounts topic_count and reply_count of every category from its topics' counters,
+    so run it after reconcile_topics. Returns the number of categories corrected.
+    """
+    with transaction() as cursor:
+        cursor.execute('''UPDATE categories c
+                          LEFT JOIN (SELECT category_id, COUNT(*) AS topic_count, SUM(reply_count) AS reply_count
+                                     FROM topics
+                                     GROUP BY category_id) t ON t.category_id = c.category_id
+                          SET c.topic_count = COALESCE(t.topic_count, 0),
+                              c.reply_count = COALESCE(t.reply_count, 0)
+                          WHERE c.topic_count <> COALESCE(t.topic_count, 0)
+                          OR c.reply_count <> COALESCE(t.reply_count, 0)''')
+        return cursor.rowcount
+
+
+def reconcile(batch_size: int = 1000) -> tuple[int, int]:
+    started = time.perf_counter()
+
+    topics = reconcile_topics(batch_size)
+    categories = reconcile_categories()
+
+    if topics or categories:
+        invalidate('topics', 'categories')
+
+    elapsed = time.perf_counter() - started
+    print(f'Corrected the counters of {topics} topics and {categories} categories in {elapsed:.1f}s.')
+
+    return topics, categories
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recompute the reply and topic counters of topics and categories')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Topics recounted per transaction')
+    args = parser.parse_args()
+
+    reconcile(batch_size=args.batch_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+import socket
+import threading
+from urllib.parse import urlparse
+
+
+class RespError(Exception):
+    pass
+
+
+class RespClient:
+    """
+    Minimal client for servers speaking the Redis protocol (RESP2).
+    Used as the shared backend for cross-worker state when a Redis-compatible
+    server is available locally. One socket per client, guarded by a lock.
+    """
+
+    def __init__(self, url: str = 'redis://127.0.0.1:6379/0', timeout: float = 1.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or '127.0.0.1'
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.strip('/') or 0)
+        self.timeout = timeout
+        self._sock = None
+        self._file = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._file = self._sock.makefile('rb')
+
+        if self.password:
+            self._call('AUTH', self.password)
+        if self.db:
+            self._call('SELECT', self.db)
+
+    def close(self):
+        if self._sock:
+            self._sock.close()
+        self._sock = None
+        self._file = None
+
+    def execute(self, *args):
+        with self._lock:
+            try:
+                if not self._sock:
+                    self._connect()
+                return self._call(*args)
+            except (OSError, ConnectionError):
+                # Retry once on a fresh socket, the server may have dropped an idle connection
+                self.close()
+                self._connect()
+                return self._call(*args)
+
+    def subscribe(self, *channels):
+        """
+        Yields (channel, data) for messages published to the channels. Uses its own
+        blocking connection, so it is meant to run on a dedicated thread.
+        """
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.settimeout(None)
+        file = sock.makefile('rb')
+
+        try:
+            if self.password:
+                sock.sendall(encode_command('AUTH', self.password))
+                read_reply(file)
+
+            sock.sendall(encode_command('SUBSCRIBE', *channels))
+
+            while True:
+                reply = read_reply(file)
+                if isinstance(reply, list) and reply and reply[0] == b'message':
+                    yield reply[1].decode(), reply[2]
+        finally:
+            sock.close()
+
+    def pipeline(self, commands: list[tuple]) -> list:
+        with self._lock:
+            if not self._sock:
+                self._connect()
+            self._sock.sendall(b''.join(encode_command(*command) for command in commands))
+            return [self._read_reply() for _ in commands]
+
+    def _call(self, *args):
+        self._sock.sendall(encode_command(*args))
+        return self._read_reply()
+
+    def _read_reply(self):
+        return read_reply(self._file)
+
+
+def encode_command(*args) -> bytes:
+    parts = [b'*%d\r\n' % len(args)]
+
+    for arg in args:
+        if isinstance(arg, bytes):
+            data = arg
+        else:
+            data = str(arg).encode()
+        parts.append(b'$%d\r\n%s\r\n' % (len(data), data))
+
+    return b''.join(parts)
+
+
+def read_reply(file):
+    line = file.readline()
+    if not line:
+        raise ConnectionError('Connection closed by server')
+
+    prefix, payload = line[:1], line[1:-2]
+
+    if prefix == b'+':
+        return payload.decode()
+    if prefix == b'-':
+        raise RespError(payload.decode())
+    if prefix == b':':
+        return int(payload)
+    if prefix == b'$':
+        length = int(payload)
+        if length == -1:
+            return None
+        data = file.read(length + 2)
+        return data[:-2]
+    if prefix == b'*':
+        length = int(payload)
+        if length == -1:
+            return None
+        return [read_reply(file) for _ in range(length)]
+
+    raise RespError(f'Unknown reply prefix: {prefix!r}')
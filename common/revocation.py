@@ -0,0 +1,340 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from jose import JWTError, jwt
+from common.exceptions import ServiceUnavailableException
+from common.resp import RespClient, RespError
+
+
+logger = logging.getLogger(__name__)
+
+BACKEND_ERRORS = (OSError, RespError, sqlite3.Error)
+
+
+class BloomFilter:
+    """
+    Fixed-size bloom filter over token digests. Answers "definitely not revoked"
+    without touching the shared backend.
+    """
+
+    def __init__(self, size_bits: int = 1 << 20, hash_count: int = 7):
+        self.size_bits = size_bits
+        self.hash_count = hash_count
+        self.bits = bytearray(size_bits // 8)
+
+    def _positions(self, digest: bytes):
+        # Double hashing (Kirsch-Mitzenmacher) over the already uniform sha256 digest
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:16], 'big') | 1
+        return ((h1 + i * h2) % self.size_bits for i in range(self.hash_count))
+
+    def add(self, digest: bytes):
+        for pos in self._positions(digest):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, digest: bytes) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(digest))
+
+
+class MemoryRevocationBackend:
+    """
+    Process-local backend. Only suitable for a single worker.
+    """
+
+    def __init__(self):
+        self.entries: dict[bytes, float] = {}
+        self.rotations: dict[bytes, tuple[float, str]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, digest: bytes, expires_at: float):
+        with self._lock:
+            self.entries[digest] = expires_at
+
+    def contains(self, digest: bytes, now: float) -> bool:
+        expires_at = self.entries.get(digest)
+        return expires_at is not None and expires_at > now
+
+    def live_digests(self, now: float) -> list[bytes]:
+        with self._lock:
+            return [digest for digest, expires_at in self.entries.items() if expires_at > now]
+
+    def claim_rotation(self, digest: bytes, value: str, expires_at: float, now: float) -> str:
+        with self._lock:
+            current = self.rotations.get(digest)
+            if current is None or current[0] <= now:
+                current = self.rotations[digest] = (expires_at, value)
+            return current[1]
+
+    def rotation(self, digest: bytes, now: float) -> str | None:
+        current = self.rotations.get(digest)
+        return current[1] if current and current[0] > now else None
+
+    def purge(self, now: float):
+        with self._lock:
+            self.entries = {digest: expires_at for digest, expires_at in self.entries.items() if expires_at > now}
+            self.rotations = {digest: current for digest, current in self.rotations.items() if current[0] > now}
+
+
+class SqliteRevocationBackend:
+    """
+    Backend stored in a SQLite file, shared by every worker on the same host.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''CREATE TABLE IF NOT EXISTS revoked_tokens (
+                            digest BLOB PRIMARY KEY,
+                            expires_at REAL NOT NULL)''')
+            conn.execute('''CREATE INDEX IF NOT EXISTS revoked_tokens_expires_at ON revoked_tokens (expires_at)''')
+            conn.execute('''CREATE TABLE IF NOT EXISTS refresh_rotations (
+                            digest BLOB PRIMARY KEY,
+                            tokens TEXT NOT NULL,
+                            expires_at REAL NOT NULL)''')
+            self._local.conn = conn
+
+        return conn
+
+    def add(self, digest: bytes, expires_at: float):
+        self._connection().execute('''INSERT OR REPLACE INTO revoked_tokens (digest, expires_at) VALUES (?, ?)''',
+                                   (digest, expires_at))
+
+    def contains(self, digest: bytes, now: float) -> bool:
+        row = self._connection().execute('''SELECT 1 FROM revoked_tokens WHERE digest = ? AND expires_at > ? LIMIT 1''',
+                                         (digest, now)).fetchone()
+        return row is not None
+
+    def live_digests(self, now: float) -> list[bytes]:
+        rows = self._connection().execute('''SELECT digest FROM revoked_tokens WHERE expires_at > ?''', (now,))
+        return [row[0] for row in rows]
+
+    def claim_rotation(self, digest: bytes, value: str, expires_at: float, now: float) -> str:
+        conn = self._connection()
+        # Only an expired record is replaced, so every worker reads back the first one
+        conn.execute('''INSERT INTO refresh_rotations (digest, tokens, expires_at) VALUES (?, ?, ?)
+                        ON CONFLICT (digest) DO UPDATE SET tokens = excluded.tokens, expires_at = excluded.expires_at
+                        WHERE refresh_rotations.expires_at <= ?''', (digest, value, expires_at, now))
+        return conn.execute('''SELECT tokens FROM refresh_rotations WHERE digest = ?''', (digest,)).fetchone()[0]
+
+    def rotation(self, digest: bytes, now: float) -> str | None:
+        row = self._connection().execute('''SELECT tokens FROM refresh_rotations WHERE digest = ? AND expires_at > ?''',
+                                         (digest, now)).fetchone()
+        return row[0] if row else None
+
+    def purge(self, now: float):
+        self._connection().execute('''DELETE FROM revoked_tokens WHERE expires_at <= ?''', (now,))
+        self._connection().execute('''DELETE FROM refresh_rotations WHERE expires_at <= ?''', (now,))
+
+
+class RespRevocationBackend:
+    """
+    Backend kept in a sorted set on a Redis-protocol server, scored by expiry time.
+    """
+
+    def __init__(self, url: str, key: str = 'forum:revoked_tokens'):
+        self.client = RespClient(url)
+        self.key = key
+
+    def add(self, digest: bytes, expires_at: float):
+        self.client.execute('ZADD', self.key, expires_at, digest)
+
+    def contains(self, digest: bytes, now: float) -> bool:
+        score = self.client.execute('ZSCORE', self.key, digest)
+        return score is not None and float(score) > now
+
+    def live_digests(self, now: float) -> list[bytes]:
+        return self.client.execute('ZRANGEBYSCORE', self.key, f'({now}', '+inf') or []
+
+    def _rotation_key(self, digest: bytes) -> str:
+        return f'forum:refresh_rotation:{digest.hex()}'
+
+    def claim_rotation(self, digest: bytes, value: str, expires_at: float, now: float) -> str:
+        key = self._rotation_key(digest)
+        # NX keeps the first record, the key expires with the grace window
+        self.client.execute('SET', key, value, 'NX', 'PX', max(1, int((expires_at - now) * 1000)))
+        stored = self.client.execute('GET', key)
+        return stored.decode() if isinstance(stored, bytes) else (stored or value)
+
+    def rotation(self, digest: bytes, now: float) -> str | None:
+        stored = self.client.execute('GET', self._rotation_key(digest))
+        return stored.decode() if isinstance(stored, bytes) else stored
+
+    def purge(self, now: float):
+        self.client.execute('ZREMRANGEBYSCORE', self.key, '-inf', now)
+
+
+class RevocationStore:
+    """
+    Set of revoked tokens that forgets each token once its own `exp` has passed.
+
+    Lookups go through a local bloom filter first: a miss means the token is not
+    revoked and no backend call is made. Once `start` has been called, a
+    background thread rebuilds the bloom filter from the backend every
+    `sync_seconds`, which is how revocations made by other workers (and expiries)
+    become visible locally. Before that, lookups rebuild it themselves.
+
+    A lookup that cannot reach the backend fails closed with a 503.
+
+    The backend also keeps, for a short grace window, the tokens issued when a
+    refresh token was rotated, so parallel requests carrying the same refresh
+    token get the same new pair on any worker.
+    """
+
+    def __init__(self, backend, default_ttl: float, sync_seconds: float = 1.0):
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self.sync_seconds = sync_seconds
+        self.bloom = BloomFilter()
+        self._synced_at = 0.0
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._running = False
+        self._wakeup = threading.Event()
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def on_revoke(self, listener):
+        """
+        Registers a callback that receives the digest of every token revoked in this process.
+        """
+        self._listeners.append(listener)
+
+    @staticmethod
+    @contextmanager
+    def _fail_closed():
+        # A token that cannot be checked is not accepted, and the caller gets a 503 rather than a 500
+        try:
+            yield
+        except BACKEND_ERRORS as exc:
+            logger.warning('Revocation backend unavailable: %s', exc)
+            raise ServiceUnavailableException('Cannot check the token right now, please try again') from exc
+
+    def _expires_at(self, token: str) -> float:
+        try:
+            exp = jwt.get_unverified_claims(token).get('exp')
+        except JWTError:
+            exp = None
+
+        return float(exp) if exp else time.time() + self.default_ttl
+
+    def sync(self):
+        """
+        Drops expired entries from the backend and rebuilds the bloom filter from the rest.
+        """
+        now = time.time()
+
+        # add() waits for the swap, so a revocation made meanwhile is not lost
+        with self._lock:
+            self.backend.purge(now)
+            bloom = BloomFilter(self.bloom.size_bits, self.bloom.hash_count)
+            for digest in self.backend.live_digests(now):
+                bloom.add(digest)
+
+            self.bloom = bloom
+            self._synced_at = now
+
+    def _sync_inline(self, now: float):
+        if now - self._synced_at < self.sync_seconds:
+            return
+
+        with self._lock:
+            if now - self._synced_at < self.sync_seconds:
+                return
+            self._synced_at = now
+
+        self.sync()
+
+    def _run(self):
+        while self._running:
+            try:
+                self.sync()
+            except BACKEND_ERRORS:
+                logger.warning('Revocation store sync failed, keeping the previous bloom filter')
+
+            self._wakeup.wait(self.sync_seconds)
+            self._wakeup.clear()
+
+    def start(self):
+        if self._running:
+            return
+
+        self._running = True
+        threading.Thread(target=self._run, daemon=True, name='revocation-sync').start()
+
+    def stop(self):
+        self._running = False
+        self._wakeup.set()
+
+    def add(self, token: str, expires_at: float = None):
+        if not token:
+            return
+
+        digest = self.digest(token)
+        with self._fail_closed():
+            self.backend.add(digest, expires_at or self._expires_at(token))
+
+        with self._lock:
+            self.bloom.add(digest)
+
+        for listener in self._listeners:
+            listener(digest)
+
+    def claim_rotation(self, token: str, tokens: tuple[str, str], grace_seconds: float) -> tuple[str, str]:
+        """
+        Records `tokens` as issued for the rotated `token` unless another worker got there
+        first. Returns the recorded tokens, the caller's own if it was first.
+        """
+        now = time.time()
+        with self._fail_closed():
+            stored = self.backend.claim_rotation(self.digest(token), json.dumps(tokens), now + grace_seconds, now)
+        return tuple(json.loads(stored))
+
+    def rotation(self, token: str) -> tuple[str, str] | None:
+        """
+        The tokens issued when `token` was rotated, if that was within the grace window.
+        """
+        with self._fail_closed():
+            stored = self.backend.rotation(self.digest(token), time.time())
+        return tuple(json.loads(stored)) if stored else None
+
+    def __contains__(self, token: str) -> bool:
+        if not token:
+            return False
+
+        now = time.time()
+        digest = self.digest(token)
+
+        with self._fail_closed():
+            if not self._running:
+                self._sync_inline(now)
+
+            if digest not in self.bloom:
+                return False
+
+            return self.backend.contains(digest, now)
+
+
+def create_backend(name: str, sqlite_path: str = None, resp_url: str = None):
+    if name == 'memory':
+        return MemoryRevocationBackend()
+    if name == 'sqlite':
+        return SqliteRevocationBackend(sqlite_path)
+    if name == 'redis':
+        return RespRevocationBackend(resp_url)
+
+    raise ValueError(f'Unknown revocation backend: {name}')
@@ -0,0 +1,267 @@
+import bisect
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import NamedTuple
+from common.query_cache import on_invalidate
+from config import SHARED_DIRECTORY_PATH
+from data.database import read_query
+
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'FDIR'
+VERSION = 1
+
+# magic, version, built_at (ns), user count, category count, heap offset
+HEADER = struct.Struct('<4sIQIII')
+# user_id, username offset, username length, display name offset, display name length
+USER = struct.Struct('<IIHIH')
+# position of a USER record, these are sorted by username for name lookups
+USERNAME = struct.Struct('<I')
+# category_id, name offset, name length, flags
+CATEGORY = struct.Struct('<IIHB')
+
+CATEGORY_LOCKED = 1
+CATEGORY_PRIVATE = 2
+
+
+class UserDisplay(NamedTuple):
+    id: int
+    username: str
+    display_name: str
+
+
+class CategoryInfo(NamedTuple):
+    id: int
+    name: str
+    is_locked: bool
+    is_private: bool
+
+
+def encode(users: list[tuple], categories: list[tuple]) -> bytes:
+    """
+    Packs (user_id, username, display_name) and (category_id, name, is_locked, is_private)
+    rows into one buffer of fixed-size records sorted for binary search, plus a string heap.
+    """
+    users = sorted(users, key=lambda user: user[0])
+    categories = sorted(categories, key=lambda category: category[0])
+
+    heap = bytearray()
+
+    def intern(text: str) -> tuple[int, int]:
+        data = (text or '').encode()[:0xFFFF]
+        offset = len(heap)
+        heap.extend(data)
+        return offset, len(data)
+
+    user_records = bytearray()
+    for user_id, username, display_name in users:
+        user_records += USER.pack(user_id, *intern(username), *intern(display_name))
+
+    by_name = sorted(range(len(users)), key=lambda position: users[position][1].encode())
+    username_records = b''.join(USERNAME.pack(position) for position in by_name)
+
+    category_records = bytearray()
+    for category_id, name, is_locked, is_private in categories:
+        flags = (CATEGORY_LOCKED if is_locked else 0) | (CATEGORY_PRIVATE if is_private else 0)
+        category_records += CATEGORY.pack(category_id, *intern(name), flags)
+
+    heap_offset = HEADER.size + len(user_records) + len(username_records) + len(category_records)
+    header = HEADER.pack(MAGIC, VERSION, time.time_ns(), len(users), len(categories), heap_offset)
+
+    return header + bytes(user_records) + username_records + bytes(category_records) + bytes(heap)
+
+
+class DirectoryView:
+    """
+    Read-only view over an encoded directory buffer (normally a mmap). Lookups
+    binary-search the fixed-size records in place; only the returned strings are copied.
+    """
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        magic, version, self.built_at, self.user_count, self.category_count, self.heap_offset = HEADER.unpack_from(buffer, 0)
+
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('Not a shared directory file')
+
+        self.users_offset = HEADER.size
+        self.usernames_offset = self.users_offset + self.user_count * USER.size
+        self.categories_offset = self.usernames_offset + self.user_count * USERNAME.size
+
+    def _text(self, offset: int, length: int) -> str:
+        start = self.heap_offset + offset
+        return bytes(self.buffer[start:start + length]).decode()
+
+    def _user_at(self, position: int) -> tuple:
+        return USER.unpack_from(self.buffer, self.users_offset + position * USER.size)
+
+    def _search(self, count: int, key, key_at) -> int | None:
+        position = bisect.bisect_left(range(count), key, key=key_at)
+        return position if position < count and key_at(position) == key else None
+
+    def user(self, user_id: int) -> UserDisplay | None:
+        position = self._search(self.user_count, user_id, lambda i: self._user_at(i)[0])
+        if position is None:
+            return None
+
+        _, name_offset, name_length, display_offset, display_length = self._user_at(position)
+        return UserDisplay(user_id, self._text(name_offset, name_length), self._text(display_offset, display_length))
+
+    def user_id(self, username: str) -> int | None:
+        def username_at(i):
+            user_position, = USERNAME.unpack_from(self.buffer, self.usernames_offset + i * USERNAME.size)
+            _, offset, length, _, _ = self._user_at(user_position)
+            start = self.heap_offset + offset
+            return bytes(self.buffer[start:start + length])
+
+        position = self._search(self.user_count, username.encode(), username_at)
+        if position is None:
+            return None
+
+        user_position, = USERNAME.unpack_from(self.buffer, self.usernames_offset + position * USERNAME.size)
+        return self._user_at(user_position)[0]
+
+    def category(self, category_id: int) -> CategoryInfo | None:
+        def category_at(i):
+            return CATEGORY.unpack_from(self.buffer, self.categories_offset + i * CATEGORY.size)
+
+        position = self._search(self.category_count, category_id, lambda i: category_at(i)[0])
+        if position is None:
+            return None
+
+        _, offset, length, flags = category_at(position)
+        return CategoryInfo(category_id, self._text(offset, length), bool(flags & CATEGORY_LOCKED), bool(flags & CATEGORY_PRIVATE))
+
+
+class SharedDirectory:
+    """
+    Category catalog and user names shared by every worker on the host through one
+    memory-mapped file. Whichever worker holds the lock file rebuilds the file from
+    the database when users or categories change; the others only map it.
+    """
+
+    def __init__(self, path: str, check_seconds: float = 0.5, rebuild_seconds: float = 300):
+        self.path = path
+        self.lock_path = f'{path}.lock'
+        self.check_seconds = check_seconds
+        self.rebuild_seconds = rebuild_seconds
+        self.is_writer = False
+        self._view = None
+        self._inode = None
+        self._checked_at = 0.0
+        self._lock_file = None
+        self._dirty = threading.Event()
+        self._running = False
+
+    def _current(self) -> DirectoryView | None:
+        now = time.monotonic()
+
+        if now - self._checked_at >= self.check_seconds:
+            self._checked_at = now
+            try:
+                inode = os.stat(self.path).st_ino
+            except FileNotFoundError:
+                return self._view
+
+            if inode != self._inode:
+                try:
+                    with open(self.path, 'rb') as file:
+                        # Readers never close old maps, requests still holding a view keep it alive
+                        self._view = DirectoryView(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+                    self._inode = inode
+                except (OSError, ValueError, struct.error):
+                    logger.warning('Could not map shared directory %s', self.path)
+
+        return self._view
+
+    def user(self, user_id: int) -> UserDisplay | None:
+        view = self._current()
+        return view.user(user_id) if view else None
+
+    def user_id(self, username: str) -> int | None:
+        view = self._current()
+        return view.user_id(username) if view else None
+
+    def category(self, category_id: int) -> CategoryInfo | None:
+        view = self._current()
+        return view.category(category_id) if view else None
+
+    def mark_dirty(self, tags=None):
+        if tags is None or any(tag.split(':')[0] in ('users', 'categories') for tag in tags):
+            self._dirty.set()
+
+    def rebuild(self):
+        users = read_query('SELECT user_id, username, first_name, last_name FROM users')
+        categories = read_query('SELECT category_id, name, is_locked, is_private FROM categories')
+
+        data = encode(
+            [(user_id, username, ' '.join(part for part in (first_name, last_name) if part) or username)
+             for user_id, username, first_name, last_name in users],
+            categories
+        )
+
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            file.write(data)
+        os.replace(tmp_path, self.path)
+        self._checked_at = 0.0
+
+    def _try_become_writer(self) -> bool:
+        if self.is_writer:
+            return True
+
+        lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+
+        self._lock_file = lock_file
+        self.is_writer = True
+        self._dirty.set()
+        return True
+
+    def _run(self):
+        while self._running:
+            if not self._try_become_writer():
+                # Another worker is writing; take over if it goes away
+                time.sleep(5)
+                continue
+
+            # Rebuild on every change, and periodically in case a notification was missed
+            self._dirty.wait(timeout=self.rebuild_seconds)
+            self._dirty.clear()
+            try:
+                self.rebuild()
+            except Exception:
+                logger.exception('Shared directory rebuild failed')
+            # Coalesce bursts of writes into one rebuild per second
+            time.sleep(1)
+
+    def start(self):
+        if self._running:
+            return
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._running = True
+        threading.Thread(target=self._run, daemon=True, name='shared-directory').start()
+
+    def stop(self):
+        self._running = False
+        self._dirty.set()
+
+        if self._lock_file:
+            self._lock_file.close()
+            self._lock_file = None
+            self.is_writer = False
+
+
+directory = SharedDirectory(SHARED_DIRECTORY_PATH)
+on_invalidate(directory.mark_dirty)
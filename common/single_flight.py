@@ -0,0 +1,94 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import Future
+from starlette.concurrency import run_in_threadpool
+
+
+class SingleFlight:
+    """
+    Collapses identical concurrent calls into one execution.
+
+    While a call for a key is in flight, further calls for the same key wait for
+    its result instead of running the function again. Works for threads (sync
+    routes run in the threadpool) and coroutines alike. Callers share the
+    returned object, so results must be treated as read-only.
+    """
+
+    def __init__(self):
+        self.in_flight: dict[tuple, Future] = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+
+    def _join(self, key) -> tuple[Future, bool]:
+        with self._lock:
+            self.calls += 1
+            future = self.in_flight.get(key)
+
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+
+            future = Future()
+            self.in_flight[key] = future
+            self.executions += 1
+            return future, True
+
+    def _finish(self, key, future: Future, fn, *args, **kwargs):
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as exc:
+            future.set_exception(exc)
+        finally:
+            with self._lock:
+                self.in_flight.pop(key, None)
+
+    def do(self, key, fn, *args, **kwargs):
+        future, is_leader = self._join(key)
+
+        if is_leader:
+            self._finish(key, future, fn, *args, **kwargs)
+
+        return future.result()
+
+    async def do_async(self, key, fn, *args, **kwargs):
+        future, is_leader = self._join(key)
+
+        if is_leader:
+            await run_in_threadpool(self._finish, key, future, fn, *args, **kwargs)
+
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        return {
+            'calls': self.calls,
+            'executions': self.executions,
+            'coalesced': self.coalesced,
+            'in_flight': len(self.in_flight)
+        }
+
+
+group = SingleFlight()
+
+
+def coalesce(fn):
+    """
+    Decorates a read-only service function so identical in-flight calls share one DB execution.
+    Async callers use `await fn.async_call(...)`.
+    """
+    name = f'{fn.__module__}.{fn.__qualname__}'
+
+    def make_key(args, kwargs):
+        return (name, args, tuple(sorted(kwargs.items())))
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return group.do(make_key(args, kwargs), fn, *args, **kwargs)
+
+    async def async_call(*args, **kwargs):
+        return await group.do_async(make_key(args, kwargs), fn, *args, **kwargs)
+
+    wrapper.async_call = async_call
+    return wrapper
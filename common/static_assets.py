@@ -0,0 +1,172 @@
+"""
+Builds fingerprinted, minified and precompressed copies of the stylesheets and
+scripts, and serves them with long-lived cache headers.
+
+Usage:
+    python -m common.static_assets [--static-dir static]
+
+Output goes to static/dist/ together with manifest.json, which maps each source
+path (e.g. 'css/styles.css') to its fingerprinted copy. Templates link assets
+through `static_url`, which falls back to the source file when no build exists.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+from starlette.datastructures import Headers
+from starlette.staticfiles import StaticFiles
+from common.middleware import choose_encoding
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+STATIC_DIR = 'static'
+DIST_DIR = 'dist'
+MANIFEST = 'manifest.json'
+SOURCE_DIRS = ('css', 'script')
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'public, max-age=3600'
+
+
+def minify_css(source: str) -> str:
+    source = re.sub(r'/\*.*?\*/', '', source, flags=re.S)
+    source = re.sub(r'\s+', ' ', source)
+    source = re.sub(r'\s*([{};,>])\s*', r'\1', source)
+    # Only inside declaration blocks, in a selector 'a :hover' and 'a:hover' differ
+    source = re.sub(r'[^{}]*}', lambda block: re.sub(r'\s*:\s*', ':', block.group()), source)
+    return source.replace(';}', '}').strip()
+
+
+def minify_js(source: str) -> str:
+    """
+    Conservative whitespace-only minification: drops indentation, blank lines and
+    whole-line // comments, leaving lines inside multi-line template literals intact.
+    """
+    lines = []
+    in_template = False
+
+    for line in source.splitlines():
+        if in_template:
+            lines.append(line)
+        else:
+            stripped = line.strip()
+            if stripped and not stripped.startswith('//'):
+                lines.append(stripped)
+
+        if line.count('`') % 2:
+            in_template = not in_template
+
+    return '\n'.join(lines) + '\n'
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+def build(static_dir: str = STATIC_DIR) -> dict[str, str]:
+    dist_dir = os.path.join(static_dir, DIST_DIR)
+    shutil.rmtree(dist_dir, ignore_errors=True)
+    manifest = {}
+
+    for source_dir in SOURCE_DIRS:
+        for name in sorted(os.listdir(os.path.join(static_dir, source_dir))):
+            base, extension = os.path.splitext(name)
+            if extension not in MINIFIERS:
+                continue
+
+            with open(os.path.join(static_dir, source_dir, name), encoding='utf-8') as file:
+                data = MINIFIERS[extension](file.read()).encode()
+
+            fingerprint = hashlib.sha256(data).hexdigest()[:12]
+            target = f'{DIST_DIR}/{source_dir}/{base}.{fingerprint}{extension}'
+            path = os.path.join(static_dir, target)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            with open(path, 'wb') as file:
+                file.write(data)
+            with open(f'{path}.gz', 'wb') as file:
+                file.write(gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli:
+                with open(f'{path}.br', 'wb') as file:
+                    file.write(brotli.compress(data, quality=11))
+
+            manifest[f'{source_dir}/{name}'] = target
+
+    with open(os.path.join(dist_dir, MANIFEST), 'w') as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+
+    return manifest
+
+
+_manifest = None
+
+
+def static_url(path: str) -> str:
+    """
+    URL of a static asset, pointing at its fingerprinted build when there is one.
+    """
+    global _manifest
+
+    if _manifest is None:
+        try:
+            with open(os.path.join(STATIC_DIR, DIST_DIR, MANIFEST)) as file:
+                _manifest = json.load(file)
+        except (FileNotFoundError, ValueError):
+            _manifest = {}
+
+    return f'/static/{_manifest.get(path, path)}'
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles that serves the .br/.gz copy of a built asset when the client accepts
+    it, and marks fingerprinted assets as immutable.
+    """
+
+    async def get_response(self, path: str, scope):
+        is_built = path.startswith(f'{DIST_DIR}/') or path.startswith(f'{DIST_DIR}{os.sep}')
+        response = None
+
+        if is_built and scope['method'] in ('GET', 'HEAD'):
+            accepted = Headers(scope=scope).get('accept-encoding', '')
+            for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+                if choose_encoding(accepted, (encoding,)) is None:
+                    continue
+
+                full_path, stat_result = self.lookup_path(path + suffix)
+                if stat_result is None:
+                    continue
+
+                response = self.file_response(full_path, stat_result, scope)
+                response.headers['Content-Type'] = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+                response.headers['Content-Encoding'] = encoding
+                response.headers['Vary'] = 'Accept-Encoding'
+                break
+
+        if response is None:
+            response = await super().get_response(path, scope)
+
+        if response.status_code in (200, 304):
+            response.headers['Cache-Control'] = IMMUTABLE if is_built else REVALIDATE
+
+        return response
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build fingerprinted and precompressed static assets')
+    parser.add_argument('--static-dir', default=STATIC_DIR, help='Directory served under /static')
+    args = parser.parse_args()
+
+    manifest = build(args.static_dir)
+    print(f'Built {len(manifest)} assets{"" if brotli else " (brotli not installed, gzip only)"}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,53 @@
+from fastapi.responses import StreamingResponse
 from fastapi.templating import Jinja2Templates
 from common.auth import get_current_user
+from common.presence import presence
+from common.static_assets import static_url
 from services import categories_services, replies_services, users_services, votes_services
 
 class CustomJinja2Templates(Jinja2Templates):
     def __init__(self, directory: str):
         super().__init__(directory=directory)
         self.env.globals['get_user'] = self.get_user_from_request
-        self.env.globals['get_user_by_id'] = users_services.get_user_by_id
+        self.env.globals['get_user_by_id'] = users_services.get_user_display
         self.env.globals['check_access'] = users_services.check_user_access_level
         self.env.globals['get_category_by_id'] = categories_services.get_by_id
+        self.env.globals['get_category'] = categories_services.get_info
         self.env.globals['get_reply_by_id'] = replies_services.get_reply_by_id
         self.env.globals['is_list'] = self.is_list
         self.env.globals['get_votes'] = votes_services.get_votes
         self.env.globals['has_voted'] = users_services.has_voted
+        self.env.globals['static_url'] = static_url
+        self.env.globals['is_online'] = presence.is_online
+
+    def StreamingTemplateResponse(self, request, name: str, context: dict = None, status_code: int = 200,
+                                  headers: dict = None, chunk_size: int = 16 * 1024):
+        """
+        Like TemplateResponse, but sends the page while it renders, so the top of a long
+        thread reaches the browser before the last replies are rendered. Only about
+        `chunk_size` bytes of output are held at a time.
+        """
+        context = dict(context or {}, request=request)
+        template = self.get_template(name)
+
+        return StreamingResponse(self._chunks(template.generate(context), chunk_size), status_code=status_code,
+                                 headers=headers, media_type='text/html')
+
+    @staticmethod
+    def _chunks(parts, chunk_size: int):
+        # The template globals query the database, so rendering stays a sync generator
+        # that StreamingResponse advances in the threadpool, one chunk per step
+        buffer, size = [], 0
+
+        for part in parts:
+            buffer.append(part)
+            size += len(part)
+            if size >= chunk_size:
+                yield ''.join(buffer)
+                buffer, size = [], 0
+
+        if buffer:
+            yield ''.join(buffer)
 
         
     def get_user_from_request(self, request):
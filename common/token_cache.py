@@ -0,0 +1,64 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU cache from token digest to its already verified JWT payload.
+    Entries are dropped once the payload's `exp` has passed.
+    """
+
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self.entries: OrderedDict[bytes, dict] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, digest: bytes) -> dict | None:
+        with self._lock:
+            payload = self.entries.get(digest)
+
+            if payload is None:
+                self.misses += 1
+                return None
+
+            exp = payload.get('exp')
+            if exp is not None and exp <= time.time():
+                del self.entries[digest]
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(digest)
+            self.hits += 1
+            return payload
+
+    def put(self, digest: bytes, payload: dict):
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self.entries[digest] = payload
+            self.entries.move_to_end(digest)
+
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def discard(self, digest: bytes):
+        with self._lock:
+            self.entries.pop(digest, None)
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0
+        }
@@ -0,0 +1,220 @@
+import asyncio
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from common.broadcast import create_broadcast
+from config import (CHAT_BACKPLANE, REDIS_URL, TOPIC_EVENTS_BUFFER, TOPIC_EVENTS_DIR, TOPIC_EVENTS_KEEPALIVE_SECONDS,
+                    TOPIC_EVENTS_MAX_TOPICS)
+
+
+# Tells a client it missed events that are no longer buffered and should reload the page
+RESET = {'id': None, 'type': 'reset', 'data': {}}
+
+
+def format_event(event: dict) -> str:
+    lines = [f"id: {event['id']}"] if event['id'] is not None else []
+    lines.append(f"event: {event['type']}")
+    lines.append(f"data: {json.dumps(event['data'])}")
+
+    return '\n'.join(lines) + '\n\n'
+
+
+class Subscription:
+    """
+    One Server-Sent Events stream. Events are queued on the event loop; a client too slow
+    to keep up gets a reset instead of an ever growing queue.
+    """
+
+    def __init__(self, topic_id: int, queue_size: int):
+        self.topic_id = topic_id
+        self.queue: asyncio.Queue[dict] = asyncio.Queue(maxsize=queue_size)
+
+    def put(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESET)
+
+
+class _TopicLog:
+
+    def __init__(self, since: int, size: int):
+        # Events with ids up to `since` are not in the buffer any more
+        self.since = since
+        self.events: deque[dict] = deque(maxlen=size)
+        self.subscribers: set[Subscription] = set()
+
+    def append(self, event: dict):
+        if len(self.events) == self.events.maxlen:
+            self.since = self.events[0]['id']
+        self.events.append(event)
+
+    def after(self, last_event_id: int) -> list[dict] | None:
+        """
+        The buffered events newer than `last_event_id`, None if some may have been missed.
+        """
+        if last_event_id < self.since:
+            return None
+
+        return [event for event in self.events if event['id'] > last_event_id]
+
+
+class TopicEvents:
+    """
+    Live changes to topic pages: new, edited and deleted replies and vote scores.
+    Services publish from whichever thread they run in; each topic keeps its last
+    `buffer_size` events so a reconnecting client gets only what it missed
+    (`Last-Event-ID`). Events are shared with the other workers over the transport.
+
+    Event ids are microsecond timestamps, kept increasing per worker, so a client can
+    resume on any worker. Only the `max_topics` most recently used topics are buffered.
+    """
+
+    def __init__(self, transport, buffer_size: int = 100, max_topics: int = 1000, queue_size: int = 100,
+                 keepalive_seconds: float = 15):
+        self.transport = transport
+        self.buffer_size = buffer_size
+        self.max_topics = max_topics
+        self.queue_size = queue_size
+        self.keepalive_seconds = keepalive_seconds
+        self.origin = uuid.uuid4().hex
+        self.published = 0
+        self.received = 0
+        self._topics: OrderedDict[int, _TopicLog] = OrderedDict()
+        self._last_id = 0
+        self._lock = threading.Lock()
+        self._loop = None
+        # One sender thread keeps publishes in order without blocking the caller
+        self._sender = ThreadPoolExecutor(max_workers=1, thread_name_prefix='topic-events')
+
+    def _next_id(self) -> int:
+        self._last_id = max(self._last_id + 1, time.time_ns() // 1000)
+        return self._last_id
+
+    def _log(self, topic_id: int) -> _TopicLog:
+        log = self._topics.get(topic_id)
+
+        if log is None:
+            log = self._topics[topic_id] = _TopicLog(max(self._last_id, time.time_ns() // 1000), self.buffer_size)
+
+            for stale_id in [stale_id for stale_id, stale in self._topics.items() if not stale.subscribers]:
+                if len(self._topics) <= self.max_topics:
+                    break
+                del self._topics[stale_id]
+
+        self._topics.move_to_end(topic_id)
+        return log
+
+    def cursor(self, topic_id: int) -> int:
+        """
+        The id a page rendered now should resume from.
+        """
+        with self._lock:
+            log = self._log(topic_id)
+            return max((event['id'] for event in log.events), default=log.since)
+
+    def publish(self, topic_id: int, type: str, data: dict):
+        with self._lock:
+            event = {'id': self._next_id(), 'topic_id': topic_id, 'type': type, 'data': data}
+            subscribers = self._append(event)
+
+        self.published += 1
+        self._deliver(subscribers, event)
+        self._sender.submit(self.transport.send, json.dumps({'origin': self.origin, 'event': event}).encode())
+
+    def _append(self, event: dict) -> list[Subscription]:
+        log = self._log(event['topic_id'])
+        log.append(event)
+        return list(log.subscribers)
+
+    def _deliver(self, subscribers: list[Subscription], event: dict):
+        if self._loop is None:
+            return
+
+        for subscription in subscribers:
+            self._loop.call_soon_threadsafe(subscription.put, event)
+
+    def _receive(self, data: bytes):
+        message = json.loads(data)
+
+        if message.get('origin') == self.origin:
+            return
+
+        event = message['event']
+
+        with self._lock:
+            self._last_id = max(self._last_id, event['id'])
+            subscribers = self._append(event)
+
+        self.received += 1
+        self._deliver(subscribers, event)
+
+    def subscribe(self, topic_id: int, last_event_id: int | None = None) -> tuple[Subscription, list[dict] | None]:
+        """
+        Starts a stream for the topic. Returns the subscription and the buffered events
+        after `last_event_id`, or None instead of the events if some may have been missed.
+        """
+        subscription = Subscription(topic_id, self.queue_size)
+
+        with self._lock:
+            log = self._log(topic_id)
+            log.subscribers.add(subscription)
+            missed = log.after(last_event_id) if last_event_id is not None else []
+
+        return subscription, missed
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            log = self._topics.get(subscription.topic_id)
+            if log:
+                log.subscribers.discard(subscription)
+
+    async def stream(self, subscription: Subscription, missed: list[dict] | None):
+        """
+        Yields the stream in text/event-stream format until the client goes away. Missed
+        events are sent first; when they are unknown (None) the client is told to reset.
+        """
+        try:
+            yield 'retry: 3000\n\n'
+
+            if missed is None:
+                yield format_event(RESET)
+                return
+
+            for event in missed:
+                yield format_event(event)
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=self.keepalive_seconds)
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing a quiet stream
+                    yield ': keepalive\n\n'
+                    continue
+
+                yield format_event(event)
+
+                if event is RESET:
+                    return
+        finally:
+            self.unsubscribe(subscription)
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self.transport.start(self._receive)
+
+    def stop(self):
+        self._sender.shutdown(wait=True)
+        self.transport.stop()
+        self._loop = None
+
+
+topic_events = TopicEvents(create_broadcast(CHAT_BACKPLANE, directory=TOPIC_EVENTS_DIR, url=REDIS_URL,
+                                            channel='forum:topic-events'),
+                           buffer_size=TOPIC_EVENTS_BUFFER, max_topics=TOPIC_EVENTS_MAX_TOPICS,
+                           keepalive_seconds=TOPIC_EVENTS_KEEPALIVE_SECONDS)
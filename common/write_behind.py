@@ -0,0 +1,223 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import uuid
+from starlette.concurrency import run_in_threadpool
+
+
+logger = logging.getLogger(__name__)
+
+
+# Rows that could not be written on their own, one JSON object per line
+DEAD_LETTER_FILE = 'dead-letters.jsonl'
+
+
+class _Segment:
+
+    def __init__(self, path: str, file, rows: int = 0):
+        self.path = path
+        self.file = file
+        self.rows = rows
+
+    def remove(self):
+        os.unlink(self.path)
+        self.file.close()
+
+
+class WriteBehindQueue:
+    """
+    Accepts rows on the event loop and writes them in batches from the threadpool,
+    every `flush_seconds` or as soon as `batch_size` rows are waiting.
+
+    A row counts as queued once it is appended to this worker's journal file, so a
+    crashed worker loses nothing: journals left behind are replayed by whichever
+    worker starts next. Rows may be written twice if a worker dies between a write
+    and the removal of its journal, never lost.
+
+    When a batch fails its rows are retried one at a time. A row that fails while a
+    later one goes through cannot be written at all, e.g. it breaks a constraint, and
+    is moved to the dead-letter file so it does not hold up the rows behind it. Rows
+    failing after the last one written are kept, as the database may just be down,
+    until they have failed `max_attempts` times; then they are dead-lettered as well.
+    """
+
+    def __init__(self, write, journal_dir: str, batch_size: int = 200, flush_seconds: float = 0.05,
+                 retry_seconds: float = 1.0, max_attempts: int = 20):
+        self.write = write
+        self.journal_dir = journal_dir
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.retry_seconds = retry_seconds
+        self.max_attempts = max_attempts
+        self.written = 0
+        self.batches = 0
+        self.failures = 0
+        self.dead_letters = 0
+        self._pending: list[tuple] = []
+        # Failed writes of each kept row, keyed by its journal line
+        self._attempts: dict[str, int] = {}
+        # Journal files whose rows are all in _pending, removed after the next successful write
+        self._segments: list[_Segment] = []
+        self._journal: _Segment | None = None
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def _open_journal(self) -> _Segment:
+        path = os.path.join(self.journal_dir, f'{os.getpid()}-{uuid.uuid4().hex[:8]}.journal')
+        file = open(path, 'a', encoding='utf-8')
+        fcntl.flock(file, fcntl.LOCK_EX)
+        return _Segment(path, file)
+
+    def _recover(self):
+        """
+        Takes over journals of workers that are gone. A live worker holds a lock on its files.
+        """
+        for name in sorted(os.listdir(self.journal_dir)):
+            if not name.endswith('.journal'):
+                continue
+
+            path = os.path.join(self.journal_dir, name)
+            file = open(path, 'r+', encoding='utf-8')
+            try:
+                fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                file.close()
+                continue
+
+            rows = [tuple(json.loads(line)) for line in file if line.endswith('\n')]
+            self._pending.extend(rows)
+            self._segments.append(_Segment(path, file, len(rows)))
+
+            if rows:
+                logger.info('Recovered %d unwritten rows from %s', len(rows), path)
+
+    def put(self, row: tuple):
+        if self._journal is None:
+            raise RuntimeError('Write-behind queue is not running')
+
+        self._journal.file.write(json.dumps(row) + '\n')
+        self._journal.file.flush()
+        self._journal.rows += 1
+        self._pending.append(row)
+
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    def _dead_letter(self, row: tuple, error: Exception):
+        logger.error('Moving a queued row that cannot be written to the dead letters: %r', error)
+        self.dead_letters += 1
+
+        with open(os.path.join(self.journal_dir, DEAD_LETTER_FILE), 'a', encoding='utf-8') as file:
+            file.write(json.dumps({'row': row, 'error': repr(error)}) + '\n')
+
+    def _write_each(self, rows: list[tuple]) -> list[tuple]:
+        """
+        Writes the rows one at a time. Returns the rows to try again later.
+        """
+        failed: list[tuple[int, tuple, Exception]] = []
+        last_written = -1
+
+        for index, row in enumerate(rows):
+            try:
+                self.write([row])
+            except Exception as exc:
+                failed.append((index, row, exc))
+            else:
+                self.written += 1
+                last_written = index
+
+        kept = []
+        for index, row, exc in failed:
+            key = json.dumps(row)
+            attempts = self._attempts.pop(key, 0) + 1
+
+            if index < last_written or attempts >= self.max_attempts:
+                self._dead_letter(row, exc)
+            else:
+                self._attempts[key] = attempts
+                kept.append(row)
+
+        return kept
+
+    async def _flush(self) -> bool:
+        if not self._pending:
+            return True
+
+        rows, self._pending = self._pending, []
+
+        # Rows put from now on go to a new segment, so the ones being written can be removed with theirs
+        if self._journal.rows:
+            self._segments.append(self._journal)
+            self._journal = self._open_journal()
+
+        try:
+            await run_in_threadpool(self.write, rows)
+        except Exception:
+            logger.exception('Writing %d queued rows failed, retrying them one at a time', len(rows))
+            self.failures += 1
+
+            kept = await run_in_threadpool(self._write_each, rows)
+
+            if kept:
+                self._pending = kept + self._pending
+                return False
+
+            self._attempts.clear()
+        else:
+            self.written += len(rows)
+            self.batches += 1
+
+        segments, self._segments = self._segments, []
+        for segment in segments:
+            segment.remove()
+
+        return True
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+            self._wakeup.clear()
+
+            if not await self._flush():
+                await asyncio.sleep(self.retry_seconds)
+
+    def start(self):
+        if self._task:
+            return
+
+        os.makedirs(self.journal_dir, exist_ok=True)
+        self._journal = self._open_journal()
+        self._recover()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if not self._task:
+            return
+
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+        # Whatever cannot be written now stays in the journal for the next start
+        await self._flush()
+        self._journal.remove()
+        self._journal = None
+
+        for segment in self._segments:
+            segment.file.close()
+        self._segments = []
+
+    def stats(self) -> dict:
+        return {
+            'pending': len(self._pending),
+            'written': self.written,
+            'batches': self.batches,
+            'failures': self.failures,
+            'dead_letters': self.dead_letters
+        }
@@ -0,0 +1,95 @@
+import json
+from datetime import datetime
+from fastapi import WebSocket, WebSocketDisconnect
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+JSON_PROTOCOL = 'forum.json'
+MSGPACK_PROTOCOL = 'forum.msgpack'
+
+
+def _clock(at: int) -> str:
+    return datetime.fromtimestamp(at).strftime('%H:%M:%S')
+
+
+class JsonCodec:
+    """
+    The protocol of the bundled script.js client, and the one used when a client
+    asks for no subprotocol. Chat events keep their original shape, with the
+    sender's username and a formatted time.
+    """
+    name = JSON_PROTOCOL
+
+    def encode(self, event: dict | str) -> str:
+        # Strings are already encoded JSON
+        if isinstance(event, str):
+            return event
+
+        if event.get('type') == 'message':
+            return json.dumps({"isMe": event['isMe'], "data": event['data'], "username": event['username'],
+                               "time": _clock(event['at'])})
+
+        if event.get('type') == 'joined':
+            return json.dumps({"isMe": True, "data": "Have joined!!", "username": "You", "time": _clock(event['at'])})
+
+        return json.dumps(event)
+
+    def decode(self, data: str | bytes) -> dict:
+        return json.loads(data)
+
+
+class MsgpackCodec:
+    """
+    MessagePack in binary frames. Chat events carry the sender's user id and a unix
+    timestamp instead of the username, formatted time and `isMe`; clients learn their
+    own id from the `joined` event and resolve names themselves.
+    """
+    name = MSGPACK_PROTOCOL
+
+    def encode(self, event: dict | str) -> bytes:
+        if isinstance(event, str):
+            event = json.loads(event)
+
+        if event.get('type') == 'message':
+            event = {'type': 'message', 'from': event['from'], 'data': event['data'], 'at': event['at']}
+
+        return msgpack.packb(event)
+
+    def decode(self, data: str | bytes) -> dict:
+        if not isinstance(data, bytes):
+            raise ValueError('The msgpack protocol only accepts binary frames')
+
+        return msgpack.unpackb(data)
+
+
+JSON = JsonCodec()
+CODECS = {JSON_PROTOCOL: JSON}
+
+if msgpack is not None:
+    CODECS[MSGPACK_PROTOCOL] = MsgpackCodec()
+
+
+def negotiate(offered: list[str]) -> tuple[JsonCodec | MsgpackCodec, str | None]:
+    """
+    Picks the first subprotocol the client offers that this server supports. Returns the
+    codec and the subprotocol to accept, None when the client offered none we know.
+    """
+    for name in offered:
+        if name in CODECS:
+            return CODECS[name], name
+
+    return JSON, None
+
+
+async def receive(websocket: WebSocket, codec: JsonCodec | MsgpackCodec) -> dict:
+    message = await websocket.receive()
+
+    if message['type'] == 'websocket.disconnect':
+        raise WebSocketDisconnect(message.get('code', 1000))
+
+    data = message.get('bytes')
+    return codec.decode(data if data is not None else message.get('text'))
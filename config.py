@@ -12,4 +12,88 @@ DB_NAME = os.getenv("DB_NAME")
 # JWT
 SECRET_KEY = os.getenv('SECRET_KEY')
 ALGORITHM = os.getenv('ALGORITHM')
-ACCESS_TOKEN_EXPIRE_MINUTES= int(os.getenv('ACCESS_TOKEN_EXPIRE_MINUTES'))
\ No newline at end of file
+ACCESS_TOKEN_EXPIRE_MINUTES= int(os.getenv('ACCESS_TOKEN_EXPIRE_MINUTES'))
+# Access tokens are renewed from the refresh token when they expire, so they are kept short-lived
+ACCESS_TOKEN_TTL_MINUTES = int(os.getenv('ACCESS_TOKEN_TTL_MINUTES', str(min(15, ACCESS_TOKEN_EXPIRE_MINUTES))))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv('REFRESH_TOKEN_EXPIRE_DAYS', '14'))
+
+# Password hashing
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '2'))
+PASSWORD_HASH_QUEUE_DEPTH = int(os.getenv('PASSWORD_HASH_QUEUE_DEPTH', '64'))
+
+# Redis-protocol server used by the optional shared backends
+REDIS_URL = os.getenv('REDIS_URL', 'redis://127.0.0.1:6379/0')
+
+# Local state kept by the workers (revocation list, ...); point it at persistent storage in production
+DATA_DIR = os.getenv('DATA_DIR', '/tmp/forum-data')
+
+# Token revocation
+# 'memory' only works with a single worker, 'sqlite' is shared by workers on one host,
+# 'redis' uses any Redis-protocol server
+REVOCATION_BACKEND = os.getenv('REVOCATION_BACKEND', 'sqlite')
+REVOCATION_SQLITE_PATH = os.getenv('REVOCATION_SQLITE_PATH', os.path.join(DATA_DIR, 'revoked_tokens.sqlite3'))
+REVOCATION_REDIS_URL = os.getenv('REVOCATION_REDIS_URL', REDIS_URL)
+REVOCATION_SYNC_SECONDS = float(os.getenv('REVOCATION_SYNC_SECONDS', '1'))
+VERIFIED_TOKEN_CACHE_SIZE = int(os.getenv('VERIFIED_TOKEN_CACHE_SIZE', '4096'))
+
+# Query result cache
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv('QUERY_CACHE_MAX_ENTRIES', '10000'))
+QUERY_CACHE_MAX_BYTES = int(os.getenv('QUERY_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+# Upper bound on staleness when an invalidation from another worker is lost, 0 disables expiry
+QUERY_CACHE_TTL_SECONDS = float(os.getenv('QUERY_CACHE_TTL_SECONDS', '30'))
+
+# Memory-mapped user/category directory shared by the workers on one host
+SHARED_DIRECTORY_PATH = os.getenv('SHARED_DIRECTORY_PATH', os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else '/tmp', 'forum-directory.bin'))
+
+# Cross-worker cache invalidation: 'unix' (workers on one host), 'redis' or 'none'
+INVALIDATION_BUS = os.getenv('INVALIDATION_BUS', 'unix')
+INVALIDATION_BUS_DIR = os.getenv('INVALIDATION_BUS_DIR', '/tmp/forum-invalidation')
+
+# Response compression, bodies below the minimum size are sent as they are
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', '4'))
+
+# WebSocket delivery: outbound messages queued per connection, and what to do with
+# a client whose queue is full ('drop_oldest' or 'disconnect')
+WEBSOCKET_SEND_QUEUE_SIZE = int(os.getenv('WEBSOCKET_SEND_QUEUE_SIZE', '256'))
+WEBSOCKET_OVERFLOW_POLICY = os.getenv('WEBSOCKET_OVERFLOW_POLICY', 'drop_oldest')
+
+# Chat delivery between workers: 'none' (single worker, in-process only), 'unix'
+# (workers on one host) or 'redis'
+CHAT_BACKPLANE = os.getenv('CHAT_BACKPLANE', 'unix')
+CHAT_BACKPLANE_DIR = os.getenv('CHAT_BACKPLANE_DIR', '/tmp/forum-chat')
+
+# Chat messages are journaled here and inserted in batches of up to MESSAGE_BATCH_SIZE
+# rows, at least every MESSAGE_FLUSH_MS milliseconds; a message that failed to insert
+# MESSAGE_MAX_ATTEMPTS times is moved to the dead letters
+MESSAGE_JOURNAL_DIR = os.getenv('MESSAGE_JOURNAL_DIR', 'message_journal')
+MESSAGE_BATCH_SIZE = int(os.getenv('MESSAGE_BATCH_SIZE', '200'))
+MESSAGE_FLUSH_MS = int(os.getenv('MESSAGE_FLUSH_MS', '50'))
+MESSAGE_MAX_ATTEMPTS = int(os.getenv('MESSAGE_MAX_ATTEMPTS', '20'))
+
+# WebSocket lifecycle: sockets are pinged every heartbeat and closed after going quiet
+# for the idle timeout; connections are capped per worker and per user
+WEBSOCKET_MAX_CONNECTIONS = int(os.getenv('WEBSOCKET_MAX_CONNECTIONS', '10000'))
+WEBSOCKET_MAX_PER_USER = int(os.getenv('WEBSOCKET_MAX_PER_USER', '5'))
+WEBSOCKET_HEARTBEAT_SECONDS = float(os.getenv('WEBSOCKET_HEARTBEAT_SECONDS', '25'))
+WEBSOCKET_IDLE_SECONDS = float(os.getenv('WEBSOCKET_IDLE_SECONDS', '75'))
+WEBSOCKET_DRAIN_SECONDS = float(os.getenv('WEBSOCKET_DRAIN_SECONDS', '5'))
+
+# WebSocket frames are compressed with permessage-deflate when the client supports it
+WEBSOCKET_PER_MESSAGE_DEFLATE = os.getenv('WEBSOCKET_PER_MESSAGE_DEFLATE', 'true').lower() == 'true'
+
+# Online presence: a user is online while one of their sockets was heard from within the
+# TTL; changes are pushed to subscribers at most once per PRESENCE_PUSH_SECONDS. Workers
+# share it over the CHAT_BACKPLANE transport
+PRESENCE_TTL_SECONDS = float(os.getenv('PRESENCE_TTL_SECONDS', '60'))
+PRESENCE_PUSH_SECONDS = float(os.getenv('PRESENCE_PUSH_SECONDS', '1'))
+PRESENCE_DIR = os.getenv('PRESENCE_DIR', '/tmp/forum-presence')
+
+# Live topic updates (Server-Sent Events): events kept per topic for clients resuming
+# with Last-Event-ID, for up to TOPIC_EVENTS_MAX_TOPICS recently used topics
+TOPIC_EVENTS_BUFFER = int(os.getenv('TOPIC_EVENTS_BUFFER', '100'))
+TOPIC_EVENTS_MAX_TOPICS = int(os.getenv('TOPIC_EVENTS_MAX_TOPICS', '1000'))
+TOPIC_EVENTS_KEEPALIVE_SECONDS = float(os.getenv('TOPIC_EVENTS_KEEPALIVE_SECONDS', '15'))
+TOPIC_EVENTS_DIR = os.getenv('TOPIC_EVENTS_DIR', '/tmp/forum-topic-events')
@@ -1,3 +1,4 @@
+from contextlib import contextmanager
 from mariadb import connect
 from mariadb.connections import Connection
 from config import DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_NAME
@@ -45,3 +46,40 @@ def query_count(sql: str, sql_params=()):
         cursor.execute(sql, sql_params)
 
         return cursor.fetchone()[0]
+
+
+def update_many(sql: str, sql_params_list: list) -> int:
+    with _get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(sql, sql_params_list)
+        conn.commit()
+
+        return cursor.rowcount
+
+
+def update_many_in_transaction(statements: list[tuple[str, list]]):
+    """
+    Runs executemany for each (sql, sql_params_list) on one connection and commits them together.
+    """
+    with _get_connection() as conn:
+        cursor = conn.cursor()
+        for sql, sql_params_list in statements:
+            if sql_params_list:
+                cursor.executemany(sql, sql_params_list)
+        conn.commit()
+
+
+@contextmanager
+def transaction():
+    """
+    Yields a cursor whose statements are committed together when the block ends,
+    or rolled back if it raises.
+    """
+    with _get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            yield cursor
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
@@ -17,6 +17,8 @@ CREATE TABLE IF NOT EXISTS `forum`.`categories` (
   `name` VARCHAR(45) NOT NULL,
   `is_locked` TINYINT(2) NOT NULL DEFAULT 0,
   `is_private` TINYINT(2) NOT NULL DEFAULT 0,
+  `topic_count` INT(11) NOT NULL DEFAULT 0,
+  `reply_count` INT(11) NOT NULL DEFAULT 0,
   PRIMARY KEY (`category_id`),
   UNIQUE INDEX `name_UNIQUE` (`name` ASC) VISIBLE)
 ENGINE = InnoDB
@@ -49,7 +51,9 @@ CREATE TABLE IF NOT EXISTS `forum`.`messages` (
   `text` MEDIUMTEXT NOT NULL,
   `sender_id` INT(11) NOT NULL,
   `receiver_id` INT(11) NOT NULL,
+  `conversation_key` BIGINT GENERATED ALWAYS AS (LEAST(`sender_id`, `receiver_id`) * 4294967296 + GREATEST(`sender_id`, `receiver_id`)) STORED,
   PRIMARY KEY (`message_id`),
+  INDEX `conversation_history_idx` (`conversation_key` ASC, `message_id` ASC) VISIBLE,
   INDEX `fk_messages_users1_idx` (`sender_id` ASC) VISIBLE,
   INDEX `fk_messages_users2_idx` (`receiver_id` ASC) VISIBLE,
   CONSTRAINT `fk_messages_users1`
@@ -66,6 +70,34 @@ ENGINE = InnoDB
 DEFAULT CHARACTER SET = latin1;
 
 
+-- -----------------------------------------------------
+-- Table `forum`.`conversations`
+-- One row per participant of each conversation, maintained with every message
+-- -----------------------------------------------------
+CREATE TABLE IF NOT EXISTS `forum`.`conversations` (
+  `user_id` INT(11) NOT NULL,
+  `other_user_id` INT(11) NOT NULL,
+  `last_message_id` INT(11) NOT NULL,
+  `last_sender_id` INT(11) NOT NULL,
+  `last_message_preview` VARCHAR(100) NOT NULL,
+  `last_activity` DATETIME NOT NULL,
+  `unread_count` INT(11) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`user_id`, `other_user_id`),
+  INDEX `inbox_idx` (`user_id` ASC, `last_activity` DESC, `last_message_id` DESC) VISIBLE,
+  CONSTRAINT `fk_conversations_users1`
+    FOREIGN KEY (`user_id`)
+    REFERENCES `forum`.`users` (`user_id`)
+    ON DELETE NO ACTION
+    ON UPDATE NO ACTION,
+  CONSTRAINT `fk_conversations_users2`
+    FOREIGN KEY (`other_user_id`)
+    REFERENCES `forum`.`users` (`user_id`)
+    ON DELETE NO ACTION
+    ON UPDATE NO ACTION)
+ENGINE = InnoDB
+DEFAULT CHARACTER SET = latin1;
+
+
 -- -----------------------------------------------------
 -- Table `forum`.`topics`
 -- -----------------------------------------------------
@@ -76,10 +108,16 @@ CREATE TABLE IF NOT EXISTS `forum`.`topics` (
   `is_locked` TINYINT(2) NOT NULL DEFAULT 0,
   `best_reply_id` INT(11) NULL DEFAULT NULL,
   `category_id` INT(11) NOT NULL,
+  `reply_count` INT(11) NOT NULL DEFAULT 0,
+  `last_reply_id` INT(11) NULL DEFAULT NULL,
+  `last_activity_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `version` INT(11) NOT NULL DEFAULT 0,
   PRIMARY KEY (`topic_id`),
   INDEX `fk_topics_users1_idx` (`user_id` ASC) VISIBLE,
   INDEX `fk_topics_replies1_idx` (`best_reply_id` ASC) VISIBLE,
-  INDEX `fk_topics_categories1_idx` (`category_id` ASC) VISIBLE,
+  INDEX `category_topics_idx` (`category_id` ASC, `topic_id` ASC) VISIBLE,
+  INDEX `category_activity_idx` (`category_id` ASC, `last_activity_at` ASC, `topic_id` ASC) VISIBLE,
+  INDEX `category_replies_idx` (`category_id` ASC, `reply_count` ASC, `topic_id` ASC) VISIBLE,
   CONSTRAINT `fk_topics_categories1`
     FOREIGN KEY (`category_id`)
     REFERENCES `forum`.`categories` (`category_id`)
@@ -107,10 +145,11 @@ CREATE TABLE IF NOT EXISTS `forum`.`replies` (
   `text` TEXT NOT NULL,
   `user_id` INT(11) NOT NULL,
   `topic_id` INT(11) NOT NULL,
+  `created` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
   `edited` TINYINT(2) NOT NULL DEFAULT 0,
   PRIMARY KEY (`reply_id`),
   INDEX `fk_replies_users1_idx` (`user_id` ASC) VISIBLE,
-  INDEX `fk_replies_topics1_idx` (`topic_id` ASC) VISIBLE,
+  INDEX `topic_replies_idx` (`topic_id` ASC, `created` ASC, `reply_id` ASC) VISIBLE,
   CONSTRAINT `fk_replies_topics1`
     FOREIGN KEY (`topic_id`)
     REFERENCES `forum`.`topics` (`topic_id`)
@@ -178,6 +217,8 @@ BEGIN
   IF NEW.is_deleted = 1 THEN
     DELETE FROM messages
     WHERE sender_id = OLD.user_id OR receiver_id = OLD.user_id;
+    DELETE FROM conversations
+    WHERE user_id = OLD.user_id OR other_user_id = OLD.user_id;
     DELETE FROM users_categories_permissions
     WHERE user_id = OLD.user_id;
   END IF;
@@ -0,0 +1,6 @@
+-- Canonical key for the two participants of a message, so a conversation's history
+-- is one range of the (conversation_key, message_id) index instead of an OR over two indexes.
+-- Must match messages_services.conversation_key.
+ALTER TABLE `forum`.`messages`
+  ADD COLUMN `conversation_key` BIGINT GENERATED ALWAYS AS (LEAST(`sender_id`, `receiver_id`) * 4294967296 + GREATEST(`sender_id`, `receiver_id`)) STORED,
+  ADD INDEX `conversation_history_idx` (`conversation_key` ASC, `message_id` ASC);
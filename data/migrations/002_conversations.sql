@@ -0,0 +1,44 @@
+-- Inbox rows, one per participant of each conversation, so the inbox is a single
+-- range scan of inbox_idx. Requires 001_messages_conversation_key.sql.
+CREATE TABLE IF NOT EXISTS `forum`.`conversations` (
+  `user_id` INT(11) NOT NULL,
+  `other_user_id` INT(11) NOT NULL,
+  `last_message_id` INT(11) NOT NULL,
+  `last_sender_id` INT(11) NOT NULL,
+  `last_message_preview` VARCHAR(100) NOT NULL,
+  `last_activity` DATETIME NOT NULL,
+  `unread_count` INT(11) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`user_id`, `other_user_id`),
+  INDEX `inbox_idx` (`user_id` ASC, `last_activity` DESC, `last_message_id` DESC),
+  CONSTRAINT `fk_conversations_users1` FOREIGN KEY (`user_id`) REFERENCES `forum`.`users` (`user_id`),
+  CONSTRAINT `fk_conversations_users2` FOREIGN KEY (`other_user_id`) REFERENCES `forum`.`users` (`user_id`))
+ENGINE = InnoDB
+DEFAULT CHARACTER SET = latin1;
+
+-- Existing messages have no timestamps, so backfilled rows all get the migration time
+-- and fall back to last_message_id for ordering
+INSERT INTO `forum`.`conversations`
+  (user_id, other_user_id, last_message_id, last_sender_id, last_message_preview, last_activity, unread_count)
+SELECT p.user_id, p.other_user_id, m.message_id, m.sender_id, LEFT(m.text, 100), NOW(), 0
+FROM (SELECT sender_id AS user_id, receiver_id AS other_user_id, conversation_key FROM `forum`.`messages`
+      UNION
+      SELECT receiver_id, sender_id, conversation_key FROM `forum`.`messages`) p
+JOIN `forum`.`messages` m
+  ON m.message_id = (SELECT MAX(message_id) FROM `forum`.`messages` WHERE conversation_key = p.conversation_key);
+
+DROP TRIGGER IF EXISTS `forum`.`after_user_deleted_delete_his_messages_and_permissions`;
+DELIMITER $$
+CREATE TRIGGER `forum`.`after_user_deleted_delete_his_messages_and_permissions`
+AFTER UPDATE ON `forum`.`users`
+FOR EACH ROW
+BEGIN
+  IF NEW.is_deleted = 1 THEN
+    DELETE FROM messages
+    WHERE sender_id = OLD.user_id OR receiver_id = OLD.user_id;
+    DELETE FROM conversations
+    WHERE user_id = OLD.user_id OR other_user_id = OLD.user_id;
+    DELETE FROM users_categories_permissions
+    WHERE user_id = OLD.user_id;
+  END IF;
+END$$
+DELIMITER ;
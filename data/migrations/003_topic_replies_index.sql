@@ -0,0 +1,9 @@
+-- Replies are paged in (created, reply_id) order, so a page of a topic is one range of
+-- this index however long the thread is. It also backs the topic foreign key, which
+-- makes the old single-column index redundant.
+ALTER TABLE `forum`.`replies`
+  ADD COLUMN IF NOT EXISTS `created` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP AFTER `topic_id`,
+  ADD INDEX `topic_replies_idx` (`topic_id` ASC, `created` ASC, `reply_id` ASC);
+
+ALTER TABLE `forum`.`replies`
+  DROP INDEX `fk_replies_topics1_idx`;
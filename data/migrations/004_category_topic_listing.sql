@@ -0,0 +1,24 @@
+-- Category pages sort topics by newest, last activity or most replies. Each order has an
+-- index led by category_id that covers the page lookup, so any page of any category is
+-- one short index range. Must match categories_services.TOPIC_SORTS.
+ALTER TABLE `forum`.`topics`
+  ADD COLUMN `reply_count` INT(11) NOT NULL DEFAULT 0,
+  ADD COLUMN `last_reply_id` INT(11) NULL DEFAULT NULL,
+  ADD COLUMN `last_activity_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+UPDATE `forum`.`topics` t
+  LEFT JOIN (SELECT topic_id, COUNT(*) AS reply_count, MAX(reply_id) AS last_reply_id,
+                    MAX(created) AS last_activity_at
+             FROM `forum`.`replies`
+             GROUP BY topic_id) r ON r.topic_id = t.topic_id
+  SET t.reply_count = COALESCE(r.reply_count, 0),
+      t.last_reply_id = r.last_reply_id,
+      t.last_activity_at = COALESCE(r.last_activity_at, t.last_activity_at);
+
+ALTER TABLE `forum`.`topics`
+  ADD INDEX `category_topics_idx` (`category_id` ASC, `topic_id` ASC),
+  ADD INDEX `category_activity_idx` (`category_id` ASC, `last_activity_at` ASC, `topic_id` ASC),
+  ADD INDEX `category_replies_idx` (`category_id` ASC, `reply_count` ASC, `topic_id` ASC);
+
+ALTER TABLE `forum`.`topics`
+  DROP INDEX `fk_topics_categories1_idx`;
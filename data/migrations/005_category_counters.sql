@@ -0,0 +1,13 @@
+-- Topic and reply counts per category, kept by the services that create and delete
+-- topics and replies. python -m common.reconcile_counters recomputes them, together
+-- with the topic counters of 004, should they ever drift.
+ALTER TABLE `forum`.`categories`
+  ADD COLUMN `topic_count` INT(11) NOT NULL DEFAULT 0,
+  ADD COLUMN `reply_count` INT(11) NOT NULL DEFAULT 0;
+
+UPDATE `forum`.`categories` c
+  LEFT JOIN (SELECT category_id, COUNT(*) AS topic_count, SUM(reply_count) AS reply_count
+             FROM `forum`.`topics`
+             GROUP BY category_id) t ON t.category_id = c.category_id
+  SET c.topic_count = COALESCE(t.topic_count, 0),
+      c.reply_count = COALESCE(t.reply_count, 0);
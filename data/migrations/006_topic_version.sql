@@ -0,0 +1,4 @@
+-- Incremented by every write to a topic, its replies or their votes, so the topic
+-- page's ETag is a primary key lookup instead of a scan of the thread.
+ALTER TABLE `forum`.`topics`
+  ADD COLUMN `version` INT(11) NOT NULL DEFAULT 0;
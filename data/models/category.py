@@ -16,10 +16,12 @@ class CategoryResponse(BaseModel):
     
     id: Optional[int] = None
     name: Optional[str] = None
+    topic_count: int = 0
+    reply_count: int = 0
 
     @classmethod
-    def from_query_result(cls, id, name):
-        return cls(id=id, name=name)
+    def from_query_result(cls, id, name, topic_count=0, reply_count=0):
+        return cls(id=id, name=name, topic_count=topic_count, reply_count=reply_count)
     
 class CategoryResponseAdmin(BaseModel):
         
@@ -27,10 +29,13 @@ class CategoryResponseAdmin(BaseModel):
         name: Optional[str] = None
         is_locked: Optional[bool] = None
         is_private: Optional[bool] = None
+        topic_count: int = 0
+        reply_count: int = 0
     
         @classmethod
-        def from_query_result(cls, id, name, is_locked, is_private):
-            return cls(id=id, name=name, is_locked=is_locked, is_private=is_private)
+        def from_query_result(cls, id, name, is_locked, is_private, topic_count=0, reply_count=0):
+            return cls(id=id, name=name, is_locked=is_locked, is_private=is_private, topic_count=topic_count,
+                       reply_count=reply_count)
     
 class CategoryCreate(BaseModel):
     
@@ -1,4 +1,5 @@
 
+from datetime import datetime
 from pydantic import BaseModel, Field
 from data.models.topic import PositiveInt
 
@@ -37,4 +38,36 @@ class MessageText(BaseModel):
 class MessageCreate(BaseModel):
     text: str
     sender_id: int
-    receiver_id: int
\ No newline at end of file
+    receiver_id: int
+
+class ConversationSummary(BaseModel):
+    """
+    Inbox entry of a conversation as seen by one participant
+    Parameters:
+    user_id: PositiveInt - The other participant
+    username: str - The other participant's username
+    last_message_id: PositiveInt - The latest message in the conversation
+    last_sender_id: PositiveInt - Who sent the latest message
+    last_message_preview: str - The start of the latest message
+    last_activity: datetime - When the latest message was sent
+    unread_count: int - Messages received since the participant last opened the conversation
+    """
+    user_id: PositiveInt
+    username: str
+    last_message_id: PositiveInt
+    last_sender_id: PositiveInt
+    last_message_preview: str
+    last_activity: datetime
+    unread_count: int
+
+    @classmethod
+    def from_query(cls, user_id, username, last_message_id, last_sender_id, last_message_preview, last_activity, unread_count):
+        return cls(
+            user_id=user_id,
+            username=username,
+            last_message_id=last_message_id,
+            last_sender_id=last_sender_id,
+            last_message_preview=last_message_preview,
+            last_activity=last_activity,
+            unread_count=unread_count
+            )
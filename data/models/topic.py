@@ -1,3 +1,4 @@
+from datetime import datetime
 from pydantic import BaseModel, Field, field_validator
 from typing import Annotated
 
@@ -45,6 +46,9 @@ class TopicResponse(BaseModel):
     - best_reply_id: int - the id of the best reply to the topic (if any)
     - category_id: int - the id of the category the topic belongs
     - category_name: str - the name of the category the topic belongs
+    - reply_count: int - the number of replies to the topic
+    - last_reply_id: int - the id of the newest reply (if any)
+    - last_activity_at: datetime - when the topic was created or last replied to
     """
     topic_id: PositiveInt
     title: ValidTitle
@@ -54,9 +58,13 @@ class TopicResponse(BaseModel):
     best_reply_id: PositiveInt | None = None
     category_id: PositiveInt
     category_name: ValidTitle
+    reply_count: int = 0
+    last_reply_id: int | None = None
+    last_activity_at: datetime | None = None
 
     @classmethod
-    def from_query(cls, topic_id, title, user_id, author,is_locked, best_reply_id, category_id, category_name):
+    def from_query(cls, topic_id, title, user_id, author,is_locked, best_reply_id, category_id, category_name,
+                   reply_count=0, last_reply_id=None, last_activity_at=None):
         return cls(
             topic_id=topic_id,
             title=title,
@@ -65,7 +73,10 @@ class TopicResponse(BaseModel):
             is_locked=bool(is_locked),
             best_reply_id=best_reply_id,
             category_id=category_id,
-            category_name=category_name
+            category_name=category_name,
+            reply_count=reply_count,
+            last_reply_id=last_reply_id,
+            last_activity_at=last_activity_at
         )
 
 
@@ -128,6 +139,9 @@ class TopicCategoryResponseAdmin(BaseModel):
     - is_locked: bool - the status of the topic (open or closed)
     - best_reply_id: int - the id of the best reply to the topic (if any)
     - category_id: int - the id of the category the topic belongs
+    - reply_count: int - the number of replies to the topic
+    - last_reply_id: int - the id of the newest reply (if any)
+    - last_activity_at: datetime - when the topic was created or last replied to
     """
     topic_id: int
     title: str
@@ -135,9 +149,13 @@ class TopicCategoryResponseAdmin(BaseModel):
     is_locked: bool
     best_reply_id: int | None = None
     category_id: int
+    reply_count: int = 0
+    last_reply_id: int | None = None
+    last_activity_at: datetime | None = None
 
     @classmethod
-    def from_query(cls, topic_id, title, user_id, is_locked, best_reply_id, category_id):
+    def from_query(cls, topic_id, title, user_id, is_locked, best_reply_id, category_id, reply_count=0,
+                   last_activity_at=None, last_reply_id=None):
         return cls(
             topic_id=topic_id,
             title=title,
@@ -145,4 +163,7 @@ class TopicCategoryResponseAdmin(BaseModel):
             is_locked=is_locked,
             best_reply_id=best_reply_id,
             category_id=category_id,
+            reply_count=reply_count,
+            last_reply_id=last_reply_id,
+            last_activity_at=last_activity_at,
         )
\ No newline at end of file
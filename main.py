@@ -1,6 +1,5 @@
 from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
-from fastapi.staticfiles import StaticFiles
 # from routers.admin import router as admin_router
 from routers.api.users import users_router
 from routers.api.categories import router as categories_router
@@ -15,6 +14,19 @@ from routers.web.home import router as home_router
 from routers.web.topics import router as web_topics_router
 from routers.web.users import router as web_users_router
 from common.template_config import CustomJinja2Templates
+from common import hashing
+from common.auth import token_blacklist
+from common.invalidation_bus import bus as invalidation_bus
+from common.chat_backplane import backplane as chat_backplane
+from common.connections import manager as connection_manager
+from common.presence import presence
+from common.topic_events import topic_events
+from services.messages_services import message_queue
+from common.shared_directory import directory as shared_directory
+from common.middleware import CompressionMiddleware, TokenRefreshMiddleware
+from common.static_assets import PrecompressedStaticFiles
+from config import (BROTLI_QUALITY, COMPRESSION_MIN_SIZE, GZIP_LEVEL, WEBSOCKET_DRAIN_SECONDS,
+                    WEBSOCKET_PER_MESSAGE_DEFLATE)
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from starlette.middleware.sessions import SessionMiddleware
 
@@ -23,6 +35,9 @@ import uvicorn
 app = FastAPI()
 templates = CustomJinja2Templates(directory="templates")
 app.add_middleware(SessionMiddleware, secret_key="secret")
+app.add_middleware(TokenRefreshMiddleware)
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_SIZE, gzip_level=GZIP_LEVEL,
+                   brotli_quality=BROTLI_QUALITY)
 
 # app.include_router(admin_router)
 app.include_router(users_router)
@@ -37,7 +52,34 @@ app.include_router(web_messages_router)
 app.include_router(web_replies_router)
 app.include_router(web_topics_router)
 app.include_router(web_users_router)
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", PrecompressedStaticFiles(directory="static"), name="static")
+
+@app.on_event("startup")
+def start_background_services():
+    token_blacklist.start()
+    invalidation_bus.start()
+    shared_directory.start()
+    chat_backplane.start()
+    message_queue.start()
+    connection_manager.start()
+    presence.start()
+    topic_events.start()
+
+@app.on_event("shutdown")
+async def drain_websockets():
+    # Close sockets first so nothing is queued after the final message flush
+    await connection_manager.drain(timeout=WEBSOCKET_DRAIN_SECONDS)
+    await message_queue.stop()
+
+@app.on_event("shutdown")
+def shutdown_background_services():
+    presence.stop()
+    topic_events.stop()
+    chat_backplane.stop()
+    invalidation_bus.stop()
+    shared_directory.stop()
+    token_blacklist.stop()
+    hashing.shutdown()
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -56,4 +98,4 @@ async def http_exception_handler(request: Request, exc: StarletteHTTPException):
     )
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="127.0.0.1", port=8000)   
+    uvicorn.run(app, host="127.0.0.1", port=8000, ws_per_message_deflate=WEBSOCKET_PER_MESSAGE_DEFLATE)
@@ -1,9 +1,9 @@
 from fastapi.responses import JSONResponse
 import common.auth
-from common import auth
+from common import auth, conditional
 from data.models.user import User
 from services import categories_services
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 from common.exceptions import NotFoundException, BadRequestException, ForbiddenException
 from data.models.category import Category, CategoryChangeName, CategoryChangeNameID, CategoryCreate, CategoryResponse
 from typing import List
@@ -37,14 +37,32 @@ def get_categories(category_id: Optional[int] = Query(default=None),
 
 
 @router.get('/{id}', response_model=None)
-def get_category_by_id(category_id: int, current_user: User=Depends(common.auth.get_current_user)):
+def get_category_by_id(category_id: int, request: Request, response: Response,
+                       sort: Literal['newest', 'activity', 'replies'] = Query(default='newest'),
+                       after: Optional[int] = Query(default=None),
+                       before: Optional[int] = Query(default=None),
+                       page_size: int = Query(default=20, ge=1, le=100),
+                       current_user: User=Depends(common.auth.get_current_user)):
 
-    category = categories_services.get_by_id(category_id=category_id, current_user=current_user)
+    version = categories_services.category_version(category_id, current_user) if current_user else None
 
-    if not category:
+    if not version:
         raise NotFoundException(detail='Category not found')
-    
-    return category
+
+    page = categories_services.get_topics_page(category_id, sort=sort, after=after, before=before, limit=page_size)
+
+    etag = conditional.make_etag(version, current_user.id, current_user.is_admin, sort, page['topics'],
+                                 page['prev_cursor'], page['next_cursor'])
+
+    if conditional.is_fresh(request, etag):
+        return conditional.not_modified(etag)
+
+    conditional.set_etag(response, etag)
+
+    name, is_locked, is_private, _ = version
+
+    return {'Category': Category(id=category_id, name=name, is_locked=is_locked, is_private=is_private),
+            'Topics': page['topics'], 'prev_cursor': page['prev_cursor'], 'next_cursor': page['next_cursor']}
 
 
 @router.post('/', response_model=None)
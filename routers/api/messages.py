@@ -1,4 +1,5 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
 from data.models.message import MessageText
 from services import messages_services, users_services
 from common.auth import UserAuthDep
@@ -33,32 +34,41 @@ def send_message(receiver_id: int, message: MessageText, current_user: UserAuthD
 
 #WORKS
 @messages_router.get('/{receiver_id}')
-def get_messages(receiver_id: int, current_user: UserAuthDep):
+def get_messages(receiver_id: int, current_user: UserAuthDep,
+                 before_message_id: Optional[int] = Query(None, description="Only messages older than this id"),
+                 limit: int = Query(50, ge=1, le=200)):
     """
-    Get all messages between the current user and the user with the given receiver_id
+    Get messages between the current user and the user with the given receiver_id, a page at a time
     Parameters:
     receiver_id: int
     current_user: UserAuthDep
+    before_message_id: int - pass the oldest message_id received to load the page before it
+    limit: int
     Returns:
-    All messages between the current user and the user with the given receiver_id
+    Up to `limit` messages between the two users, oldest first
     """
     if not users_services.exists(receiver_id):
         raise HTTPException(status_code=404, detail='User does not exist')
     
-    messages = messages_services.get_conversation(current_user.id, receiver_id)
+    messages = messages_services.get_conversation(current_user.id, receiver_id, before_message_id, limit)
+
+    if before_message_id is None:
+        messages_services.mark_conversation_read(current_user.id, receiver_id)
+
     return messages or 'No messages found'
 
 #WORKS
 @messages_router.get('/convesations/all')
-def get_all_conversations(current_user: UserAuthDep):
+def get_all_conversations(current_user: UserAuthDep, limit: int = Query(50, ge=1, le=200)):
     """
-    Get all conversations of the current user
+    Get the conversations of the current user, most recent first
     Parameters:
     current_user: UserAuthDep
+    limit: int
     Returns:
-    All conversations of the current user
+    The conversations of the current user with the last message preview and unread count
     """
-    messages = messages_services.get_all_conversations(current_user.id)
+    messages = messages_services.get_all_conversations(current_user.id, limit)
     return messages or 'No messages found'
 
 
@@ -1,7 +1,8 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from services import topics_services
 from typing import Optional, List
 from common.auth import UserAuthDep
+from common import conditional
 from data.models.topic import TopicCreate, TopicBestReplyUpdate, TopicResponse
 from services.topics_services import fetch_all_topics, verify_topic_owner
 
@@ -53,15 +54,41 @@ def get_topics(
 
 #WORKS
 @topics_router.get('/{topic_id}')
-def get_topic_by_id(topic_id: int):
+def get_topic_by_id(topic_id: int, request: Request, response: Response, after: Optional[int] = Query(None),
+                    before: Optional[int] = Query(None), around: Optional[int] = Query(None),
+                    page_size: int = Query(20, ge=1, le=100)):
     """
     GET /topics/{topic_id}
     Fetches a single topic by its ID.
+    Parameters:
+    - `after` / `before` (int): Reply ID to page forward / back from, as returned in `next_cursor` / `prev_cursor`.
+    - `around` (int): Reply ID to center the page on, e.g. the best reply.
+    - `page_size` (int): Replies per page.
     Returns:
-    - Topic details and a list of replies.
+    - Topic details and a page of replies with the cursors of the neighbouring pages.
+    - 304 Not Modified: The topic is unchanged since the ETag sent in If-None-Match.
     """
+    version = topics_services.topic_version(topic_id)
+
+    if not version:
+        raise HTTPException(
+            status_code=404,
+            detail='Topic does not exist'
+        )
+
+    replies_for_topic = topics_services.fetch_replies_page(topic_id, after=after, before=before, around=around,
+                                                           limit=page_size)
+
+    # Which page of replies is shown depends on the paging parameters, not only on the topic's version
+    etag = conditional.make_etag(version, after, before, around, page_size,
+                                 replies_for_topic['prev_cursor'], replies_for_topic['next_cursor'])
+
+    if conditional.is_fresh(request, etag):
+        return conditional.not_modified(etag)
+
+    conditional.set_etag(response, etag)
+
     topic = topics_services.fetch_topic_by_id(topic_id)
-    replies_for_topic = topics_services.fetch_replies_for_topic(topic_id)
 
     if not topic:
         raise HTTPException(
@@ -69,7 +96,7 @@ def get_topic_by_id(topic_id: int):
             detail='Topic does not exist'
         )
     
-    if not replies_for_topic:
+    if not replies_for_topic['replies']:
         return []
     
     return topic, replies_for_topic
@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Body, Depends
 from fastapi.security import OAuth2PasswordRequestForm
-from common.exceptions import BadRequestException
-from data.models.user import User, UserLogin, UserResponse, TokenResponse
+from starlette.concurrency import run_in_threadpool
+from common import hashing
+from common.exceptions import BadRequestException, UnauthorizedException
+from data.models.user import RefreshRequest, User, UserLogin, UserResponse, TokenResponse
 import common.auth as auth
 from services import users_services
 from common.auth import oauth2_scheme
@@ -11,13 +13,12 @@ users_router = APIRouter(prefix='/api/users', tags=['Users'])
 
 
 @users_router.post('/register',  response_model= UserResponse)
-def register_user (user: UserLogin):
-    if users_services.get_user(user.username):
+async def register_user (user: UserLogin):
+    if await run_in_threadpool(users_services.get_user, user.username):
         return BadRequestException('User already exists') 
 
-    hashed_password =  auth.get_password_hash(user.password) 
-    user.password = hashed_password
-    user_id = users_services.create_user(user)
+    user.password = await hashing.hash_password_async(user.password)
+    user_id = await run_in_threadpool(users_services.create_user, user)
     if user_id:
         user.id = user_id
         return user
@@ -26,15 +27,23 @@ def register_user (user: UserLogin):
 
 
 @users_router.post('/login', response_model= TokenResponse)
-def login_user(data: OAuth2PasswordRequestForm = Depends()):
-    user = auth.authenticate_user(data.username, data.password)
+async def login_user(data: OAuth2PasswordRequestForm = Depends()):
+    user = await auth.authenticate_user_async(data.username, data.password)
     if not user:
         return BadRequestException('Invalid username or password')
-    is_admin = user.is_admin
-    id = user.id
-    access_token = auth.create_access_token(data={'sub': user.username, 'is_admin': is_admin, "id": id})
+    access_token, refresh_token = auth.create_token_pair(user.username, user.is_admin, user.id)
 
-    return TokenResponse(access_token=access_token, token_type='bearer')
+    return TokenResponse(access_token=access_token, refresh_token=refresh_token, token_type='bearer')
+
+
+@users_router.post('/refresh', response_model= TokenResponse)
+def refresh_tokens(data: RefreshRequest):
+    tokens = auth.rotate_refresh_token(data.refresh_token)
+    if not tokens:
+        raise UnauthorizedException('Invalid or expired refresh token')
+    access_token, refresh_token = tokens
+
+    return TokenResponse(access_token=access_token, refresh_token=refresh_token, token_type='bearer')
 
 
 @users_router.get('/me', response_model= UserResponse)
@@ -43,9 +52,11 @@ def get_current_user(user: User = Depends(auth.get_current_user)):
 
 
 @users_router.post('/logout')
-def lougout_user(token: str = Depends(oauth2_scheme)):
+def lougout_user(token: str = Depends(oauth2_scheme), data: RefreshRequest | None = Body(None)):
     auth.verify_token(token)
     auth.token_blacklist.add(token)
+    if data:
+        auth.token_blacklist.add(data.refresh_token)
     return 'Logged out successfully'
 
 
@@ -1,12 +1,13 @@
 import math
 from fastapi.responses import JSONResponse, RedirectResponse
 import common.auth
+from common import conditional
 from common.template_config import CustomJinja2Templates
 from data.models.user import User
 from services import categories_services, users_services
 from fastapi import APIRouter, Depends, Request
 from common.exceptions import BadRequestException
-from data.models.category import CategoryChangeName, CategoryChangeNameID, CategoryCreate
+from data.models.category import Category, CategoryChangeName, CategoryChangeNameID, CategoryCreate
 from fastapi import Query
 from typing import Literal, Optional
 
@@ -53,33 +54,42 @@ def get_categories(category_id: Optional[int] = Query(default=None),
 
 
 @router.get('/{category_id}', response_model=None)
-def get_category_by_id(category_id: int, request: Request = None):
+def get_category_by_id(category_id: int, request: Request = None,
+                       sort: Literal['newest', 'activity', 'replies'] = Query(default='newest'),
+                       after: Optional[int] = Query(default=None),
+                       before: Optional[int] = Query(default=None),
+                       page_size: int = Query(default=20, ge=1, le=100)):
 
     current_user = common.auth.get_current_user(request.cookies.get('token'))
 
-    per_page = 10
-
     if not current_user:
         return templates.TemplateResponse(name='categories.html', context={'error': 'You need to login to view this page'}, request=request)
 
+    version = categories_services.category_version(category_id, current_user)
 
-    category_data = categories_services.get_by_id(category_id=category_id, current_user=current_user)
+    if version is None:
+        if categories_services.get_info(category_id) is None:
+            return templates.TemplateResponse(name='categories.html', context={'error': 'Category not found'}, request=request)
 
-    if category_data is None:
-        return templates.TemplateResponse(name='categories.html', context={'error': 'Category not found'}, request=request)
+        return templates.TemplateResponse(name='categories.html', context={'error': 'Not authorised to see this category'}, request=request)
 
-    topics = category_data['Topics']
+    page = categories_services.get_topics_page(category_id, sort=sort, after=after, before=before, limit=page_size)
 
-    category = category_data['Category']
+    # The page links depend on the cursors and page size as well as on the topics shown
+    etag = conditional.make_etag(version, current_user.id, current_user.is_admin, sort, page_size, page['topics'],
+                                 page['prev_cursor'], page['next_cursor'])
 
-    if category.is_private and not current_user.is_admin: 
-        if not users_services.check_user_access_level(user_id=current_user.id, category_id=category_id) > 0 :
-            return templates.TemplateResponse(name='categories.html', context={'error': 'Not authorised to see this category'}, request=request)
+    if conditional.is_fresh(request, etag):
+        return conditional.not_modified(etag)
 
-    if not category:
-        return templates.TemplateResponse(name='categories.html', context={'error': 'Category not found'}, request=request)
-    
-    return templates.TemplateResponse(name='single-category.html', context={'category': category, 'topics': topics, 'per_page': per_page}, request=request)
+    name, is_locked, is_private, _ = version
+    category = Category(id=category_id, name=name, is_locked=is_locked, is_private=is_private)
+
+    response = templates.TemplateResponse(name='single-category.html', context={'category': category, 'topics': page['topics'],
+                                                                                'prev_cursor': page['prev_cursor'], 'next_cursor': page['next_cursor'],
+                                                                                'sort': sort, 'page_size': page_size}, request=request)
+
+    return conditional.set_etag(response, etag)
 
 
 @router.post('/create', response_model=None)
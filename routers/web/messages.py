@@ -1,12 +1,14 @@
 
-from dataclasses import dataclass
-from datetime import datetime
-import json
-import uuid
+import time
 from fastapi import APIRouter, Request, WebSocket, WebSocketDisconnect
 from fastapi.responses import HTMLResponse
+from starlette.concurrency import run_in_threadpool
 from common.template_config import CustomJinja2Templates
-from services import messages_services
+from services import messages_services, users_services
+from common.connections import manager
+from common.chat_backplane import backplane
+from common.presence import presence
+from common import ws_protocol
 import common.auth
 
 
@@ -15,57 +17,99 @@ router = APIRouter(prefix='/messages', tags=['Messages'])
 templates = CustomJinja2Templates(directory="templates")
 
 
-@dataclass
-class ConnectionManager:
-  def __init__(self) -> None:
-    self.active_connections: dict = {}
+def as_int(value) -> int | None:
+  """
+  A number sent by a client, such as a user or message id, None if it is not one.
+  """
+  if isinstance(value, bool):
+    return None
 
-  async def connect(self, websocket: WebSocket):
-    await websocket.accept()
-    id = str(uuid.uuid4())
-    self.active_connections[id] = websocket
+  try:
+    return int(value)
+  except (TypeError, ValueError):
+    return None
+
+
+def send_error(websocket: WebSocket, error: str):
+  manager.send_message(websocket, {"type": "error", "error": error})
+
+
+def deliver(sender_id: int, receiver_id: int, username: str, message: str):
+  """
+  Sends a direct message to the open sockets of its sender and receiver only,
+  on whichever worker they are connected to.
+  """
+  sent_at = int(time.time())
+
+  # One event per side of the conversation, encoded once per protocol when it is fanned out
+  def event(is_me: bool):
+    return {"type": "message", "isMe": is_me, "from": sender_id, "username": username, "data": message, "at": sent_at}
+
+  deliveries = [(sender_id, event(True))]
+
+  if receiver_id != sender_id:
+    deliveries.append((receiver_id, event(False)))
+
+  backplane.send(deliveries)
+
+
+# Most messages a client may ask for in one history request
+HISTORY_PAGE_LIMIT = 200
+
+
+async def send_history(websocket: WebSocket, user_id: int, request: dict):
+  """
+  Sends the socket one page of its conversation with `request['with']`, older than
+  `request['before_message_id']` when given, so the client can load history on scroll.
+  """
+  before = request.get('before_message_id')
+  other_user_id = as_int(request.get('with'))
+  before_message_id = None if before is None else as_int(before)
+  limit = as_int(request.get('limit', 50))
+
+  if other_user_id is None or limit is None or (before is not None and before_message_id is None):
+    send_error(websocket, "history needs a user id in 'with', and numbers for 'before_message_id' and 'limit'")
+    return
+
+  limit = max(1, min(limit, HISTORY_PAGE_LIMIT))
 
-    await self.send_message(websocket, json.dumps({"isMe": True, "data": "Have joined!!", "username": "You", "time": datetime.now().strftime('%H:%M:%S')}))
+  messages = await run_in_threadpool(messages_services.get_conversation, user_id, other_user_id,
+                                     before_message_id, limit)
 
-  async def send_message(self, ws: WebSocket, message: str):
-    await ws.send_text(message)
+  if not before_message_id:
+    await run_in_threadpool(messages_services.mark_conversation_read, user_id, other_user_id)
 
-  def find_connection_id(self, websocket: WebSocket):
-    websocket_list = list(self.active_connections.values())
-    id_list = list(self.active_connections.keys())
+  manager.send_message(websocket, {
+    "type": "history",
+    "with": other_user_id,
+    "has_more": len(messages) == limit,
+    "messages": [{"message_id": message.message_id, "data": message.text, "isMe": message.sender_id == user_id}
+                 for message in messages]
+  })
 
-    pos = websocket_list.index(websocket)
-    return id_list[pos]
 
-  async def broadcast(self, webSocket: WebSocket, data: str):
-    decoded_data = json.loads(data)
-    timestamp = datetime.now().strftime('%H:%M:%S') 
+def push_presence(came_online: set[int], went_offline: set[int]):
+  """
+  Tells every socket on this worker who came online or went offline since the last update.
+  """
+  manager.fan_out(list(manager.active_connections.values()),
+                  {"type": "presence", "online": sorted(came_online), "offline": sorted(went_offline)})
 
-    username = decoded_data.get('username')
-    message = decoded_data.get('message')
 
-    if not message or not username:
-        print("Invalid message data, skipping broadcast:", decoded_data)
-        return
+presence.subscribe(push_presence)
 
-    for connection in self.active_connections.values():
-        is_me = (connection == webSocket)
-        
-        await connection.send_text(json.dumps({
-            "isMe": is_me,
-            "data": message,
-            "username": username,
-            "time": timestamp
-        }))
 
-  def disconnect(self, websocket: WebSocket):
-    id = self.find_connection_id(websocket)
-    del self.active_connections[id]
+def send_presence(websocket: WebSocket, request: dict):
+  users = request.get('users', [])
 
-    return id
+  if not isinstance(users, list):
+    send_error(websocket, "users must be a list of user ids")
+    return
 
+  user_ids = {as_int(user_id) for user_id in users[:500]} - {None}
+  online = presence.is_online(user_ids)
 
-manager = ConnectionManager()
+  manager.send_message(websocket, {"type": "presence", "online": sorted(online), "offline": sorted(user_ids - online)})
 
 
 @router.get("/", response_class=HTMLResponse)
@@ -80,20 +124,63 @@ def get_room(request: Request):
 
 @router.websocket("/message")
 async def websocket_endpoint(websocket: WebSocket):
-  # Accept the connection from the client.
-  await manager.connect(websocket)
+  current_user = await run_in_threadpool(common.auth.get_current_user, websocket.cookies.get('token'))
+
+  if not current_user:
+    await websocket.close(code=1008)
+    return
+
+  # Clients offering the msgpack subprotocol get compact binary frames, everyone else JSON
+  codec, subprotocol = ws_protocol.negotiate(websocket.scope.get('subprotocols', []))
+
+  # Accept the connection from the client, unless this worker is full or shutting down.
+  if not await manager.connect(websocket, current_user.id, codec, subprotocol):
+    return
+
+  manager.send_message(websocket, {"type": "joined", "user_id": current_user.id, "at": int(time.time())})
 
   try:
     while True:
-      # Recieves message from the client
-      data = await websocket.receive_text()
-      message_data = json.loads(data)
-      if "sender_id" not in message_data or "receiver_id" not in message_data:
-            await websocket.send_text(json.dumps({"error": "sender_id and receiver_id are required"}))
-            continue
-      
-      messages_services.create_message(message_data['message'], message_data['sender_id'], message_data['receiver_id'])
-      await websocket.send_text(json.dumps({"status": "success", "message": message_data['message']}))
-      await manager.broadcast(websocket, data)
+      # Recieves message from the client, a frame that cannot be read gets an error, not a closed socket
+      try:
+        message_data = await ws_protocol.receive(websocket, codec)
+      except (TypeError, ValueError):
+        send_error(websocket, "malformed frame")
+        continue
+
+      manager.touch(websocket)
+
+      if not isinstance(message_data, dict):
+        send_error(websocket, "frames must be objects")
+        continue
+
+      if message_data.get('type') == 'pong':
+        continue
+
+      if message_data.get('type') == 'history':
+        await send_history(websocket, current_user.id, message_data)
+        continue
+
+      if message_data.get('type') == 'presence':
+        send_presence(websocket, message_data)
+        continue
+
+      # The sender is whoever owns the socket, not what the client claims
+      receiver_id = as_int(message_data.get('receiver_id'))
+
+      if receiver_id is None or not message_data.get('message') or not isinstance(message_data['message'], str):
+        send_error(websocket, "receiver_id and message are required")
+        continue
+
+      # Checked before queueing, a message the database would reject must not reach the write-behind queue
+      if not await run_in_threadpool(users_services.get_user_display, receiver_id):
+        send_error(websocket, "receiver does not exist")
+        continue
+
+      messages_services.queue_message(message_data['message'], current_user.id, receiver_id)
+      manager.send_message(websocket, {"status": "success", "message": message_data['message']})
+      deliver(current_user.id, receiver_id, current_user.username, message_data['message'])
   except WebSocketDisconnect:
-        await manager.disconnect(websocket)
+    pass
+  finally:
+    await manager.disconnect(websocket)
@@ -1,12 +1,15 @@
 import re
 from fastapi import APIRouter, Body, HTTPException, Query, Request, Depends
-from fastapi.responses import RedirectResponse, JSONResponse
+from fastapi.responses import RedirectResponse, JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 # from data.models.category import Category
 from data.models.reply import ReplyCreateWeb
 from services import categories_services, replies_services, topics_services, users_services
 from typing import Optional
 import common.auth
+from common import conditional
 from common.exceptions import BadRequestException, ForbiddenException
+from common.topic_events import topic_events
 from data.models.topic import TopicCreate
 from services.topics_services import fetch_all_topics, verify_topic_owner
 from common.template_config import CustomJinja2Templates
@@ -82,11 +85,16 @@ def get_topics(
 @router.get('/{topic_id}', response_model=None)
 def get_topic_replies(
     request: Request,
-    topic_id: int
+    topic_id: int,
+    after: Optional[int] = Query(None),
+    before: Optional[int] = Query(None),
+    around: Optional[int] = Query(None),
+    page_size: int = Query(20, ge=1, le=100)
 ):
     """
     GET /topics/{topic_id}
-    Fetches the details of a specific topic including its replies.
+    Fetches the details of a specific topic including one page of its replies.
+    `after`/`before` page forward and back from a reply, `around` jumps to a reply.
     """
     current_user = common.auth.get_current_user(request.cookies.get('token'))
 
@@ -97,25 +105,81 @@ def get_topic_replies(
         )
 
     token = request.cookies.get('token')
+
+    version = topics_services.topic_version(topic_id, current_user.id)
+
+    if not version:
+        raise HTTPException(status_code=404, detail='Topic not found')
+
+    page = topics_services.fetch_replies_page(topic_id, after=after, before=before, around=around, limit=page_size)
+
+    # Which page of replies is shown depends on the paging parameters, not only on the topic's version
+    etag = conditional.make_etag(version, current_user.id, current_user.is_admin, after, before, around, page_size,
+                                 page['prev_cursor'], page['next_cursor'])
+
+    if conditional.is_fresh(request, etag):
+        return conditional.not_modified(etag)
     
     topic = topics_services.fetch_topic_by_id(topic_id)
 
     if not topic:
         raise HTTPException(status_code=404, detail='Topic not found')
-    
-    replies = topics_services.fetch_replies_for_topic(topic_id)
 
-    return templates.TemplateResponse(
+    response = templates.StreamingTemplateResponse(
+        request,
         name='single-topic.html',
         context={
             'topic': topic, 
-            'replies': replies, 
+            'replies': page['replies'], 
+            'prev_cursor': page['prev_cursor'],
+            'next_cursor': page['next_cursor'],
+            'page_size': page_size,
             'current_user': current_user, 
             'token': token, 
-            'request': request
+            'request': request,
+            'last_event_id': topic_events.cursor(topic_id)
         },
     )
 
+    return conditional.set_etag(response, etag)
+
+
+@router.get('/{topic_id}/events', response_model=None)
+async def get_topic_events(
+    request: Request,
+    topic_id: int,
+    last_event_id: Optional[int] = Query(None)
+):
+    """
+    GET /topics/{topic_id}/events
+    Streams new, edited and deleted replies and vote changes as Server-Sent Events.
+    A reconnecting client sends Last-Event-ID and gets only what it missed; the page
+    passes `last_event_id` on the first connect, so nothing between render and connect is lost.
+    """
+    current_user = await run_in_threadpool(common.auth.get_current_user, request.cookies.get('token'))
+
+    if not current_user:
+        raise HTTPException(status_code=401, detail='You must be logged in to view topics.')
+
+    version = await run_in_threadpool(topics_services.topic_version, topic_id, current_user.id)
+
+    # Private categories are only visible with access to them, as in the category list
+    if not version or (version[6] and not version[7] and not current_user.is_admin):
+        raise HTTPException(status_code=404, detail='Topic not found')
+
+    resume_from = request.headers.get('last-event-id', '')
+    resuming = resume_from.isdigit()
+
+    subscription, missed = topic_events.subscribe(topic_id, int(resume_from) if resuming else last_event_id)
+
+    # The page was rendered from the database, so on the first connect an unknown
+    # cursor means nothing to replay rather than a gap
+    if missed is None and not resuming:
+        missed = []
+
+    return StreamingResponse(topic_events.stream(subscription, missed), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 #WORKS
 @router.post('/create', response_model=None)
 def create_topic(new_topic: TopicCreate = Depends(topics_services.topic_create_form), request: Request = None):
@@ -177,7 +241,7 @@ async def update_topic_best_reply(
             context={'request': request, 'message': 'User not authorised'}
         )
 
-    topic = topics_services.fetch_topic_by_id(topic_id)
+    topic = await topics_services.fetch_topic_by_id.async_call(topic_id)
     if not topic:
         return templates.TemplateResponse(
             name='error.html',
@@ -190,7 +254,7 @@ async def update_topic_best_reply(
             context={'request': request, 'message': 'User not authorised'}
         )
 
-    topic_replies = topics_services.fetch_replies_for_topic(topic_id)
+    topic_replies = await topics_services.fetch_replies_for_topic.async_call(topic_id)
     if not topic_replies:
         return templates.TemplateResponse(
             name='topics.html',
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, Form, Query, Request
 from fastapi.responses import JSONResponse, RedirectResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from common import auth
+from starlette.concurrency import run_in_threadpool
+from common import auth, hashing
 from services import categories_services, users_services
 from common.template_config import CustomJinja2Templates
 from data.models.user import UserRegistration
@@ -79,21 +80,21 @@ def serve_register (request: Request):
 
 
 @router.post('/register', response_model=None)
-def register_user(request: Request = None, register: UserRegistration = Depends(users_services.get_registration)):
-    if users_services.get_user(register.username):
+async def register_user(request: Request = None, register: UserRegistration = Depends(users_services.get_registration)):
+    if await run_in_threadpool(users_services.get_user, register.username):
         return templates.TemplateResponse(name="register.html", request=request, context={'error': 'User already exists'})
 
-    if users_services.email_exists(register.email):
+    if await run_in_threadpool(users_services.email_exists, register.email):
         return templates.TemplateResponse(name="register.html", request=request, context={'error': 'Email already exists'})
 
     if register.password != register.confirm_password:
         return templates.TemplateResponse(name="register.html", request=request, context={'error': 'Passwords do not match'})
     
-    hashed_password = auth.get_password_hash(register.password) 
-    register.password = hashed_password
-    user_id = users_services.create_user(register)
+    # Awaits the hashing pool instead of blocking a threadpool worker on bcrypt
+    register.password = await hashing.hash_password_async(register.password)
+    user_id = await run_in_threadpool(users_services.create_user, register)
     response = RedirectResponse(url='/', status_code=302)
-    response.set_cookie('token', auth.create_access_token(data={'sub': register.username, 'is_admin': False, "id": user_id}))
+    auth.set_auth_cookies(response, *auth.create_token_pair(register.username, False, user_id))
     return response
     
 
@@ -103,27 +104,37 @@ def serve_login(request: Request):
 
 
 @router.post('/login', response_model=None)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), request: Request = None):
-    user = auth.authenticate_user(form_data.username, form_data.password)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), request: Request = None):
+    user = await auth.authenticate_user_async(form_data.username, form_data.password)
 
     if not user:
         return templates.TemplateResponse(name="login.html", request=request, context={'error': 'Invalid username or password'})
     
-    is_admin = user.is_admin
-    id = user.id
-
-    access_token = auth.create_access_token(data={'sub': user.username, 'is_admin': is_admin, "id": id})
     response = RedirectResponse(url='/', status_code=302)
-    response.set_cookie('token', access_token)
+    auth.set_auth_cookies(response, *auth.create_token_pair(user.username, user.is_admin, user.id))
+    return response
+
+
+@router.post('/refresh', response_model=None)
+def refresh(request: Request):
+    tokens = auth.rotate_refresh_token(request.cookies.get('refresh_token'))
+
+    if not tokens:
+        response = JSONResponse(content={'message': 'Invalid or expired refresh token'}, status_code=401)
+        auth.delete_auth_cookies(response)
+        return response
+
+    response = JSONResponse(content={'message': 'Tokens refreshed'}, status_code=200)
+    auth.set_auth_cookies(response, *tokens)
     return response
 
 
 @router.post('/logout')
 def logout(request: Request = None):
-    token = request.cookies.get('token')
-    auth.token_blacklist.add(token)
+    auth.token_blacklist.add(request.cookies.get('token'))
+    auth.token_blacklist.add(request.cookies.get('refresh_token'))
     response = RedirectResponse(url='/', status_code=302)
-    response.delete_cookie('token')
+    auth.delete_auth_cookies(response)
     return response
 
 
@@ -228,7 +239,9 @@ async def update_profile(
         )
 
     try:
-        users_services.update_user_profile(
+        # Runs off the event loop, the service waits on the password hashing pool and the database
+        await run_in_threadpool(
+            users_services.update_user_profile,
             user_id=current_user.id,
             email=email,
             first_name=first_name,
@@ -1,10 +1,13 @@
 from fastapi import Form
-from data.database import read_query, insert_query, update_query
+from data.database import read_query, insert_query, update_query, transaction
 from data.models.category import Category, CategoryChangeName, CategoryChangeNameID, CategoryCreate, CategoryResponse, CategoryResponseAdmin
 from typing import List
 from common.exceptions import ConflictException, ForbiddenException, NotFoundException, BadRequestException
 from data.models.topic import TopicCategoryResponseAdmin
 from data.models.user import User
+from common.query_cache import invalidate
+from common.shared_directory import CategoryInfo, directory
+from common.single_flight import coalesce
 
 
 def get_categories(current_user: User, 
@@ -28,7 +31,7 @@ def get_categories(current_user: User,
         a list of CategoryResponse objects if multiple results are found, or None if no results are found.
     """
     
-    query = '''SELECT c.category_id, c.name, c.is_locked, c.is_private FROM categories c ''' if current_user.is_admin else '''SELECT c.category_id, c.name FROM categories c'''
+    query = '''SELECT c.category_id, c.name, c.is_locked, c.is_private, c.topic_count, c.reply_count FROM categories c ''' if current_user.is_admin else '''SELECT c.category_id, c.name, c.topic_count, c.reply_count FROM categories c'''
     params = []
 
     if not current_user.is_admin:
@@ -88,6 +91,7 @@ def create(category: CategoryCreate) -> Category | None:
     
     generated_id = insert_query('''INSERT INTO categories (name, is_locked, is_private) VALUES (?, ?, ?)''',
                                  (category.name, category.is_locked, category.is_private))
+    invalidate(f'categories:{generated_id}')
 
     return Category(id=generated_id, name=category.name, is_locked=category.is_locked, is_private=category.is_private) if generated_id else None
     
@@ -126,27 +130,38 @@ def delete(category_id: int, delete_topics: bool = False) ->  str | None:
     if not exists(category_id=category_id):
         raise NotFoundException(detail='Category does not exist')
     
-    # Fist delete the category from users_categories_permission table
-    update_query('''DELETE FROM users_categories_permissions WHERE category_id = ?''', (category_id,))
-
     topics = has_topics(category_id)
 
     delete_from_replies = None
     delete_from_topics = None
-    
-    if delete_topics and topics: # If delete topics was selected, check if any exist and then delete them
 
-        remove_best_replies = update_query('''UPDATE topics SET best_reply_id = NULL WHERE category_id = ?''', (category_id,))
+    # Everything goes in one transaction, so no reply or topic is left counted in a deleted category
+    with transaction() as cursor:
 
-        delete_from_replies = update_query('''DELETE FROM replies
-                        WHERE topic_id IN (SELECT t.topic_id 
-                        FROM topics t 
-                        WHERE t.category_id = ?)''', (category_id,))
-        
-        delete_from_topics = update_query('''DELETE FROM topics WHERE category_id = ?''', (category_id,))
+        # Fist delete the category from users_categories_permission table
+        cursor.execute('''DELETE FROM users_categories_permissions WHERE category_id = ?''', (category_id,))
+
+        if delete_topics and topics: # If delete topics was selected, check if any exist and then delete them
+
+            cursor.execute('''UPDATE topics SET best_reply_id = NULL WHERE category_id = ?''', (category_id,))
+
+            cursor.execute('''DELETE FROM replies
+                            WHERE topic_id IN (SELECT t.topic_id 
+                            FROM topics t 
+                            WHERE t.category_id = ?)''', (category_id,))
+            delete_from_replies = True
 
-    # Finally delete the category itself
-    deleted = update_query('''DELETE FROM categories WHERE category_id = ?''', (category_id,))
+            cursor.execute('''DELETE FROM topics WHERE category_id = ?''', (category_id,))
+            delete_from_topics = True
+
+        # Finally delete the category itself
+        cursor.execute('''DELETE FROM categories WHERE category_id = ?''', (category_id,))
+        deleted = cursor.rowcount
+
+    invalidate('permissions')
+    invalidate(f'categories:{category_id}')
+    if delete_from_topics:
+        invalidate('topics', 'replies', 'votes')
 
     if not deleted:
         return None
@@ -200,6 +215,7 @@ def update_name(old_category: CategoryChangeNameID, new_category: CategoryChange
         params.append(old_category.name)
 
     updated = update_query(query, tuple(params))
+    invalidate('categories')
 
     merged = CategoryResponse(id=get_id(new_category.name), name=new_category.name or old_category.name)
 
@@ -252,6 +268,7 @@ def lock_unlock(category_id: int) -> str | None:
     if is_locked(category_id): # If the category is already locked, unlock it
 
         unlock_category = update_query('''UPDATE categories SET is_locked = ? WHERE category_id = ?''', (False, category_id))
+        invalidate(f'categories:{category_id}')
 
         if not unlock_category:
             return 'unlock failed'
@@ -260,6 +277,7 @@ def lock_unlock(category_id: int) -> str | None:
 
     else: # Otherwise, lock it
         lock_category = update_query('''UPDATE categories SET is_locked = ? WHERE category_id = ?''', (True, category_id))
+        invalidate(f'categories:{category_id}')
 
         if not lock_category:
             return 'lock failed'
@@ -306,6 +324,7 @@ def privatise_unprivatise(category_id: int) -> str | None:
     if is_private(category_id): # If the category is already private, make it public
             
             make_public = update_query('''UPDATE categories SET is_private = ? WHERE category_id = ?''', (False, category_id))
+            invalidate(f'categories:{category_id}')
     
             if not make_public:
                 return 'made public failed'
@@ -315,6 +334,7 @@ def privatise_unprivatise(category_id: int) -> str | None:
     else: # Otherwise, make it private
     
         make_private = update_query('''UPDATE categories SET is_private = ? WHERE category_id = ?''', (True, category_id))
+        invalidate(f'categories:{category_id}')
     
         if not make_private:
             return 'made private failed'
@@ -322,6 +342,42 @@ def privatise_unprivatise(category_id: int) -> str | None:
         return 'made private'
     
 
+def get_info(category_id: int) -> CategoryInfo | None:
+
+    category = directory.category(category_id)
+
+    if category:
+        return category
+
+    data = read_query('''SELECT category_id, name, is_locked, is_private FROM categories WHERE category_id = ? LIMIT 1''', (category_id,))
+
+    return CategoryInfo(data[0][0], data[0][1], bool(data[0][2]), bool(data[0][3])) if data else None
+
+
+def category_version(category_id: int, current_user: User) -> tuple | None:
+    """
+    Cheap summary of the category page: the category's state and the viewer's permission
+    on it. Returns None if the category does not exist or the viewer may not see it, so
+    callers fall back to the full lookup. The topics shown are part of the page, not of
+    this summary, since only one page of them is read.
+    """
+    data = read_query('''SELECT c.name, c.is_locked, c.is_private,
+                            (SELECT p.write_access FROM users_categories_permissions p
+                             WHERE p.user_id = ? AND p.category_id = c.category_id)
+                         FROM categories c
+                         WHERE c.category_id = ?''', (current_user.id, category_id))
+
+    if not data:
+        return None
+
+    _, _, is_private, write_access, *_ = data[0]
+
+    if is_private and not current_user.is_admin and not write_access:
+        return None
+
+    return tuple(data[0])
+
+
 def get_by_id(category_id: int, current_user: User):
 
     if not exists(category_id):
@@ -339,8 +395,80 @@ def get_by_id(category_id: int, current_user: User):
     
     return {'Category': Category.from_query_result(*category[0] if category else None), 
         'Topics': [TopicCategoryResponseAdmin.from_query(*obj) for obj in topics] if topics else None}
-        
-        
+
+
+TOPIC_COLUMNS = ('t.topic_id, t.title, t.user_id, t.is_locked, t.best_reply_id, t.category_id, t.reply_count, '
+                 't.last_activity_at, t.last_reply_id')
+
+# Sort name -> the column topics are ordered by before topic_id, newest first.
+# Each has an index (category_id, column, topic_id), see the topics table.
+TOPIC_SORTS = {'newest': None, 'activity': 'last_activity_at', 'replies': 'reply_count'}
+
+
+def _seek_topics(category_id: int, sort: str, cursor: int | None, limit: int,
+                 backwards: bool = False) -> list[TopicCategoryResponseAdmin]:
+    """
+    Up to `limit` topics of the category next to the `cursor` topic in `sort` order,
+    nearest first, read as one range of the sort's index.
+    """
+    column = TOPIC_SORTS[sort]
+    direction = 'ASC' if backwards else 'DESC'
+    order = f't.{column} {direction}, t.topic_id {direction}' if column else f't.topic_id {direction}'
+
+    if cursor is None:
+        data = read_query(f'''SELECT {TOPIC_COLUMNS}
+                            FROM topics t
+                            WHERE t.category_id = ?
+                            ORDER BY {order}
+                            LIMIT ?''', (category_id, limit))
+    else:
+        op = '>' if backwards else '<'
+        seek = (f't.{column} {op} c.{column} OR (t.{column} = c.{column} AND t.topic_id {op} c.topic_id)'
+                if column else f't.topic_id {op} c.topic_id')
+        data = read_query(f'''SELECT {TOPIC_COLUMNS}
+                            FROM topics t
+                            JOIN topics c ON c.topic_id = ? AND c.category_id = t.category_id
+                            WHERE t.category_id = ? AND ({seek})
+                            ORDER BY {order}
+                            LIMIT ?''', (cursor, category_id, limit))
+
+    return [TopicCategoryResponseAdmin.from_query(*row) for row in data]
+
+
+@coalesce
+def get_topics_page(category_id: int, sort: str = 'newest', after: int = None, before: int = None,
+                    limit: int = 20) -> dict:
+    """
+    Fetches one page of a category's topics by seeking from a topic instead of counting
+    an offset, so every page costs the same however many topics the category has.
+
+    Args:
+        category_id (int): The category whose topics to list.
+        sort (str, optional): 'newest', 'activity' (last reply first) or 'replies' (most replies first).
+        after (int, optional): The last topic of the page the client has, to get the next page.
+        before (int, optional): The first topic of the page the client has, to get the previous page.
+        limit (int, optional): Topics per page. Defaults to 20.
+
+    Returns:
+        dict: The topics, and the cursors of the previous and next pages (None at either end).
+    """
+    # One extra row only tells whether there is another page
+    if before is not None:
+        topics = _seek_topics(category_id, sort, before, limit + 1, backwards=True)
+        has_prev, has_next = len(topics) > limit, True
+        topics = topics[:limit][::-1]
+    else:
+        topics = _seek_topics(category_id, sort, after, limit + 1)
+        has_prev, has_next = after is not None, len(topics) > limit
+        topics = topics[:limit]
+
+    return {
+        'topics': topics,
+        'prev_cursor': topics[0].topic_id if has_prev and topics else None,
+        'next_cursor': topics[-1].topic_id if has_next and topics else None
+    }
+
+
 
 def grant_read_access(user_id: int, category_id: int, write_access: bool, admin_user: User) -> bool:
     if not admin_user.is_admin:
@@ -351,11 +479,14 @@ def grant_read_access(user_id: int, category_id: int, write_access: bool, admin_
         raise NotFoundException(detail='Category not found or not private')
     
     existing_access = read_query("SELECT * FROM users_categories_permissions WHERE user_id = ? AND category_id = ?", (user_id, category_id))
+
     if existing_access:
         update_query("UPDATE users_categories_permissions SET write_access = ? WHERE user_id = ? AND category_id = ?", (write_access, user_id, category_id))
+        invalidate(f'permissions:{user_id}')
         return {'message': 'Access updated'}
     else:
         insert_query("INSERT INTO users_categories_permissions (user_id, category_id, write_access) VALUES (?, ?, ?)", (user_id, category_id, write_access))
+        invalidate(f'permissions:{user_id}')
         return {'message': 'Access granted'}
     
 
@@ -385,12 +516,15 @@ def grant_write_access(user_id: int, category_id: int, admin_user: User) -> bool
     if not category_data:
         raise NotFoundException(detail='Category not found or is not private')
     existing_access = read_query("SELECT * FROM users_categories_permissions WHERE user_id = ? AND category_id = ?", (user_id, category_id)) 
+
     if existing_access:
         update_query("UPDATE users_categories_permissions SET write_access = ? WHERE user_id = ? AND category_id = ?", (True, user_id, category_id))
+        invalidate(f'permissions:{user_id}')
         return {'message': 'Write access updated'}
     
     else:
         insert_query("INSERT INTO users_categories_permissions (user_id, category_id, write_access) VALUES (?, ?, ?)", (user_id, category_id, True))
+        invalidate(f'permissions:{user_id}')
         return {'message': 'Write access granted'}
     
 
@@ -432,6 +566,7 @@ def revoke_access(user_id: int, category_id: int, admin_user: User) -> bool:
         raise NotFoundException(detail='User does not have access to this category')
     
     update_query("DELETE FROM users_categories_permissions WHERE user_id = ? AND category_id = ?", (user_id, category_id))
+    invalidate(f'permissions:{user_id}')
     return {'message': 'Access revoked'}
 
 
@@ -1,7 +1,8 @@
-from data.models.message import Message
-from data.models.user import UserInfo
-from data.database import read_query, insert_query, update_query
+from data.models.message import ConversationSummary, Message
+from data.database import read_query, transaction, update_query, update_many_in_transaction
 from common.auth import UserAuthDep
+from common.write_behind import WriteBehindQueue
+from config import MESSAGE_BATCH_SIZE, MESSAGE_FLUSH_MS, MESSAGE_JOURNAL_DIR, MESSAGE_MAX_ATTEMPTS
 from fastapi import HTTPException
 
 
@@ -17,58 +18,157 @@ def exists(message_id: int):
     return any(read_query('''SELECT * FROM messages WHERE message_id = ?''', (message_id,)))
 
 
+PREVIEW_LENGTH = 100
+
+INSERT_MESSAGE = '''INSERT INTO messages (text, sender_id, receiver_id) VALUES (?, ?, ?)'''
+UPSERT_CONVERSATION = '''INSERT INTO conversations (user_id, other_user_id, last_message_id, last_sender_id,
+                                                    last_message_preview, last_activity, unread_count)
+                           VALUES (?, ?, (SELECT MAX(message_id) FROM messages WHERE conversation_key = ?), ?, ?, NOW(), ?)
+                           ON DUPLICATE KEY UPDATE
+                             last_message_id = VALUES(last_message_id),
+                             last_sender_id = VALUES(last_sender_id),
+                             last_message_preview = VALUES(last_message_preview),
+                             last_activity = VALUES(last_activity),
+                             unread_count = unread_count + VALUES(unread_count)'''
+
+
 #WORKS
 def create_message(message_text: str, sender_id: int, receiver_id: int):
     """
-    Create a new message in the database
+    Create a new message in the database and update both participants' inbox rows
+    Parameters:
+    message_text: str
+    sender_id: int
+    receiver_id: int
+    Returns:
+    the id of the new message
+    """
+    row = (message_text, sender_id, receiver_id)
+
+    with transaction() as cursor:
+        cursor.execute(INSERT_MESSAGE, row)
+        message_id = cursor.lastrowid
+        cursor.executemany(UPSERT_CONVERSATION, conversation_updates([row]))
+
+    return message_id
+
+
+def conversation_updates(rows: list[tuple]) -> list[tuple]:
+    """
+    Folds a batch of (text, sender_id, receiver_id) rows into one inbox update per
+    participant: the latest message's sender and preview, and how many of the batch's
+    messages the participant has not read (those they received). A message to oneself
+    only updates the sender's row and is never unread.
+    """
+    updates = {}
+
+    for text, sender_id, receiver_id in rows:
+        participants = ((sender_id, receiver_id, 0),)
+        if receiver_id != sender_id:
+            participants += ((receiver_id, sender_id, 1),)
+
+        for user_id, other_user_id, unread in participants:
+            previous = updates.get((user_id, other_user_id))
+            updates[(user_id, other_user_id)] = (sender_id, text[:PREVIEW_LENGTH], (previous[2] if previous else 0) + unread)
+
+    return [(user_id, other_user_id, conversation_key(user_id, other_user_id), last_sender_id, preview, unread)
+            for (user_id, other_user_id), (last_sender_id, preview, unread) in updates.items()]
+
+
+def insert_messages(rows: list[tuple]):
+    """
+    Insert a batch of (text, sender_id, receiver_id) rows and update the inbox rows of
+    everyone involved, in one transaction
+    """
+    update_many_in_transaction([
+        (INSERT_MESSAGE, rows),
+        (UPSERT_CONVERSATION, conversation_updates(rows))
+    ])
+
+    return len(rows)
+
+
+message_queue = WriteBehindQueue(insert_messages, journal_dir=MESSAGE_JOURNAL_DIR, batch_size=MESSAGE_BATCH_SIZE,
+                                 flush_seconds=MESSAGE_FLUSH_MS / 1000, max_attempts=MESSAGE_MAX_ATTEMPTS)
+
+
+def queue_message(message_text: str, sender_id: int, receiver_id: int):
+    """
+    Queue a chat message for a batched insert, without waiting on the database.
+    The message is journaled before this returns, so it survives a worker crash
     Parameters:
     message_text: str
     sender_id: int
     receiver_id: int
     """
-    return insert_query('''INSERT INTO messages (text, sender_id, receiver_id) VALUES (?, ?, ?)''', (message_text, sender_id, receiver_id))
+    message_queue.put((message_text, sender_id, receiver_id))
+
+
+def conversation_key(user_id: int, other_user_id: int) -> int:
+    """
+    Canonical id of the conversation between two users, same as the messages.conversation_key column
+    """
+    low, high = sorted((user_id, other_user_id))
+    return low * 4294967296 + high
 
 
 #WORKS
-def get_conversation(user_id: int, receiver_id: int):
+def get_conversation(user_id: int, receiver_id: int, before_message_id: int = None, limit: int = 50):
     """
-    Get all messages between two users
+    Get one page of messages between two users, oldest first
     Parameters:
     user_id: int
     receiver_id: int
+    before_message_id: int - only messages older than this one, for loading earlier pages
+    limit: int - page size
     Returns:
-    all messages between the two users
+    up to `limit` messages immediately before `before_message_id` (or the latest ones)
     """
-    data = read_query('''SELECT * FROM messages WHERE (sender_id = ? AND receiver_id = ?) 
-                         OR (sender_id = ? AND receiver_id = ?)
-                         ORDER BY message_id ASC''',
-    (user_id, receiver_id, receiver_id, user_id))
+    sql = '''SELECT message_id, text, sender_id, receiver_id FROM messages WHERE conversation_key = ?'''
+    params = [conversation_key(user_id, receiver_id)]
 
-    return [Message.from_query(row) for row in data]
+    if before_message_id:
+        sql += ''' AND message_id < ?'''
+        params.append(before_message_id)
+
+    sql += ''' ORDER BY message_id DESC LIMIT ?'''
+    params.append(limit)
+
+    data = read_query(sql, tuple(params))
+
+    return [Message.from_query(row) for row in reversed(data)]
 
 
 #WORKS
-def get_all_conversations(user_id: int):
+def get_all_conversations(user_id: int, limit: int = 50):
     """
-    Get all conversations for a user
+    Get the inbox of a user, most recent conversation first
     Parameters:
     user_id: int
+    limit: int
     Returns:
-    all users that the user has exchanged messages with
-    """
-    data = read_query('''SELECT u.username, u.email, u.first_name, u.last_name
-                      FROM users u
-                      JOIN messages m
-                      ON u.user_id = m.receiver_id
-                      WHERE m.sender_id = ?
-                      UNION
-                      SELECT u.username, u.email, u.first_name, u.last_name
-                      FROM users u
-                      JOIN messages m
-                      ON u.user_id = m.sender_id
-                      WHERE m.receiver_id = ?''', (user_id, user_id))
+    the user's conversations with the other participant, a preview of the last message and the unread count
+    """
+    data = read_query('''SELECT c.other_user_id, u.username, c.last_message_id, c.last_sender_id,
+                             c.last_message_preview, c.last_activity, c.unread_count
+                      FROM conversations c
+                      JOIN users u ON u.user_id = c.other_user_id
+                      WHERE c.user_id = ?
+                      ORDER BY c.last_activity DESC, c.last_message_id DESC
+                      LIMIT ?''', (user_id, limit))
     
-    return [UserInfo.from_query_result(*row) for row in data]
+    return [ConversationSummary.from_query(*row) for row in data]
+
+
+def mark_conversation_read(user_id: int, other_user_id: int):
+    """
+    Reset the unread count of the user's side of a conversation
+    Parameters:
+    user_id: int
+    other_user_id: int
+    """
+    update_query('''UPDATE conversations SET unread_count = 0
+                    WHERE user_id = ? AND other_user_id = ? AND unread_count > 0''', (user_id, other_user_id))
 
 
 #WORKS
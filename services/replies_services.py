@@ -1,9 +1,11 @@
 from datetime import datetime
 from fastapi import Form
-from data.database import read_query, insert_query, update_query
+from data.database import read_query, insert_query, update_query, transaction
 from data.models.reply import Reply, ReplyCreate, ReplyCreateWeb, ReplyResponse
 from typing import List
 from common.exceptions import ForbiddenException, NotFoundException
+from common.query_cache import cached, invalidate
+from common.topic_events import topic_events
 from data.models.user import User
 
 
@@ -109,8 +111,23 @@ def create(reply: ReplyCreate, current_user: User) -> Reply | None:
     
     user_id = current_user.id
     
-    generated_id = insert_query('''INSERT INTO replies (text, user_id, topic_id) VALUES (?, ?, ?)''',
-                                (reply.text, user_id, reply.topic_id))
+    # The reply and the counters of its topic and category are written together
+    with transaction() as cursor:
+        cursor.execute('''INSERT INTO replies (text, user_id, topic_id) VALUES (?, ?, ?)''',
+                       (reply.text, user_id, reply.topic_id))
+        generated_id = cursor.lastrowid
+
+        cursor.execute('''UPDATE topics SET reply_count = reply_count + 1, last_reply_id = ?, last_activity_at = NOW(),
+                              version = version + 1
+                          WHERE topic_id = ?''', (generated_id, reply.topic_id))
+        cursor.execute('''UPDATE categories SET reply_count = reply_count + 1
+                          WHERE category_id = (SELECT category_id FROM topics WHERE topic_id = ?)''', (reply.topic_id,))
+
+    invalidate(f'replies:{generated_id}', f'topics:{reply.topic_id}')
+
+    if generated_id:
+        topic_events.publish(reply.topic_id, 'reply', {'reply_id': generated_id, 'user_id': user_id,
+                                                       'username': current_user.username, 'text': reply.text})
 
     return Reply(id=generated_id, text=reply.text, user_id=user_id, topic_id=reply.topic_id) if generated_id else None
 
@@ -147,8 +164,18 @@ def edit_text(old_reply: ReplyResponse, new_reply: ReplyResponse, current_user:
 
     merged = ReplyResponse(id=old_reply.id, text = new_reply.text or old_reply.text)
 
-    edited = update_query('''UPDATE replies SET text = ?, edited = ?
-                       WHERE reply_id = ?''', (merged.text, True, old_reply.id))
+    with transaction() as cursor:
+        cursor.execute('''UPDATE replies SET text = ?, edited = ?
+                          WHERE reply_id = ?''', (merged.text, True, old_reply.id))
+        edited = cursor.rowcount
+
+        cursor.execute('''UPDATE topics SET version = version + 1
+                          WHERE topic_id = (SELECT topic_id FROM replies WHERE reply_id = ?)''', (old_reply.id,))
+
+    invalidate(f'replies:{old_reply.id}')
+
+    if edited:
+        topic_events.publish(topic_of(old_reply.id), 'reply_edited', {'reply_id': old_reply.id, 'text': merged.text})
     
     return merged if (merged and edited) else None
 
@@ -187,11 +214,39 @@ def delete(reply_id: int, current_user: User) -> str | None:
         if current_user.username != reply_username[0][0]:
             raise ForbiddenException(detail='You are not allowed to delete this reply')
     
-    deleted = update_query('''DELETE FROM replies WHERE reply_id = ?''', (reply_id,))
+    topic_id = topic_of(reply_id)
+
+    with transaction() as cursor:
+        cursor.execute('''DELETE FROM replies WHERE reply_id = ?''', (reply_id,))
+        deleted = cursor.rowcount
+
+        if deleted:
+            # Activity falls back to the newest remaining reply; with none left it keeps its value,
+            # topics do not record their own creation time
+            cursor.execute('''UPDATE topics SET reply_count = GREATEST(reply_count - 1, 0),
+                                  last_reply_id = (SELECT MAX(r.reply_id) FROM replies r WHERE r.topic_id = ?),
+                                  last_activity_at = COALESCE((SELECT MAX(r.created) FROM replies r WHERE r.topic_id = ?),
+                                                              last_activity_at),
+                                  version = version + 1
+                              WHERE topic_id = ?''', (topic_id, topic_id, topic_id))
+            cursor.execute('''UPDATE categories SET reply_count = GREATEST(reply_count - 1, 0)
+                              WHERE category_id = (SELECT category_id FROM topics WHERE topic_id = ?)''', (topic_id,))
+
+    invalidate(f'replies:{reply_id}', f'votes:{reply_id}', f'topics:{topic_id}')
+
+    if deleted:
+        topic_events.publish(topic_id, 'reply_deleted', {'reply_id': reply_id})
     
     return 'reply deleted' if deleted else None
 
 
+def topic_of(reply_id: int) -> int | None:
+
+    topic = read_query('''SELECT topic_id FROM replies WHERE reply_id = ? LIMIT 1''', (reply_id,))
+
+    return topic[0][0] if topic else None
+
+
 def fetch_text(reply_id: int) -> str:
 
     reply_text_row = read_query('''SELECT text FROM replies WHERE reply_id = ? LIMIT 1''', (reply_id,))
@@ -199,6 +254,7 @@ def fetch_text(reply_id: int) -> str:
     return str(reply_text_row[0][0])
 
 
+@cached('replies:{reply_id}')
 def get_reply_by_id(reply_id: int) -> Reply | None:
 
     reply = read_query('''SELECT reply_id, text, user_id, topic_id, created, edited FROM replies WHERE reply_id = ? LIMIT 1''', (reply_id,))
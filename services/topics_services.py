@@ -3,7 +3,9 @@ from fastapi import Form, HTTPException
 from pydantic import ValidationError
 from data.models.reply import Reply
 from data.models.topic import TopicResponse, TopicCreate
-from data.database import read_query, update_query, insert_query
+from data.database import read_query, update_query, insert_query, transaction
+from common.single_flight import coalesce
+from common.query_cache import cached, invalidate
 import logging
 
 from data.models.user import User
@@ -46,7 +48,7 @@ def fetch_all_topics(
     params, filters = [], []
     sql = (
         '''SELECT DISTINCT t.topic_id, t.title, t.user_id, u.username, t.is_locked, 
-           t.best_reply_id, t.category_id, c.name
+           t.best_reply_id, t.category_id, c.name, t.reply_count, t.last_reply_id, t.last_activity_at
         FROM topics t
         JOIN users u ON t.user_id = u.user_id
         JOIN categories c ON t.category_id = c.category_id
@@ -102,12 +104,15 @@ def fetch_all_topics(
 
 
 #WORKS
+@cached('topics:{topic_id}', 'users', 'categories')
+@coalesce
 def fetch_topic_by_id(topic_id: int) -> TopicResponse | None:
     '''
     Fetches a topic by its ID and returns a TopicResponse object with all the replies.
     '''
     data = read_query(
-        '''SELECT t.topic_id, t.title, t.user_id, u.username, t.is_locked, t.best_reply_id, t.category_id, c.name
+        '''SELECT t.topic_id, t.title, t.user_id, u.username, t.is_locked, t.best_reply_id, t.category_id, c.name,
+                t.reply_count, t.last_reply_id, t.last_activity_at
          FROM topics t
          JOIN users u ON t.user_id = u.user_id
          JOIN categories c ON t.category_id = c.category_id 
@@ -117,6 +122,28 @@ def fetch_topic_by_id(topic_id: int) -> TopicResponse | None:
     return next((TopicResponse.from_query(*row) for row in data), None)
 
 
+def topic_version(topic_id: int, user_id: int = None) -> tuple | None:
+    """
+    Cheap summary of everything the topic page shows: the topic row, its category's
+    state, the viewer's permission on the category, and the topic's version, which
+    every write to the topic, its replies or their votes increments. Changes whenever
+    the rendered page could change, at the cost of two primary key lookups.
+    Returns None if the topic does not exist.
+    """
+    data = read_query(
+        '''SELECT t.title, t.is_locked, t.best_reply_id, t.category_id, c.name, c.is_locked, c.is_private,
+               (SELECT p.write_access FROM users_categories_permissions p
+                WHERE p.user_id = ? AND p.category_id = t.category_id),
+               t.version
+        FROM topics t
+        JOIN categories c ON c.category_id = t.category_id
+        WHERE t.topic_id = ?''',
+        (user_id, topic_id)
+    )
+
+    return tuple(data[0]) if data else None
+
+
 #WORKS
 def create_new_topic(topic: TopicCreate, user_id: int):
     """
@@ -132,24 +159,37 @@ def create_new_topic(topic: TopicCreate, user_id: int):
     if not existing_category:
         raise HTTPException(status_code=404, detail="Category does not exist")
 
-    try:        
-        topic_id = insert_query(
-            '''INSERT INTO topics(title, user_id, is_locked, best_reply_id, category_id) 
-               VALUES(?,?,?,?,?)''',
-            (topic.title, user_id, 0, None, topic.category_id)
-        )
-        
-        if not topic_id:
-            raise HTTPException(status_code=500, detail="Topic creation failed")
-
-        reply_id = insert_query(
-            '''INSERT INTO replies(text, user_id, topic_id, edited) 
-               VALUES(?,?,?,?)''',
-            (topic.text, user_id, topic_id, 0)
-        )
-
-        if not reply_id:
-            raise HTTPException(status_code=500, detail="First reply creation failed")
+    try:
+        # The topic, its first reply and the category's counters are written together
+        with transaction() as cursor:
+            cursor.execute(
+                '''INSERT INTO topics(title, user_id, is_locked, best_reply_id, category_id) 
+                   VALUES(?,?,?,?,?)''',
+                (topic.title, user_id, 0, None, topic.category_id)
+            )
+            topic_id = cursor.lastrowid
+
+            if not topic_id:
+                raise HTTPException(status_code=500, detail="Topic creation failed")
+
+            cursor.execute(
+                '''INSERT INTO replies(text, user_id, topic_id, edited) 
+                   VALUES(?,?,?,?)''',
+                (topic.text, user_id, topic_id, 0)
+            )
+            reply_id = cursor.lastrowid
+
+            if not reply_id:
+                raise HTTPException(status_code=500, detail="First reply creation failed")
+
+            cursor.execute('''UPDATE topics SET reply_count = 1, last_reply_id = ? WHERE topic_id = ?''', (reply_id, topic_id))
+            cursor.execute(
+                '''UPDATE categories SET topic_count = topic_count + 1, reply_count = reply_count + 1
+                   WHERE category_id = ?''',
+                (topic.category_id,)
+            )
+
+        invalidate(f'topics:{topic_id}', f'replies:{reply_id}')
 
         return {
             "topic_id": topic_id,
@@ -166,7 +206,8 @@ def update_topic_title(topic_id: int, new_title: str):
     """
     Updates the title of a topic.
     """
-    update_query('''UPDATE topics SET title = ? WHERE topic_id = ?''', (new_title, topic_id))
+    update_query('''UPDATE topics SET title = ?, version = version + 1 WHERE topic_id = ?''', (new_title, topic_id))
+    invalidate(f'topics:{topic_id}')
 
     return f"Topic {topic_id} title updated to {new_title}"
 
@@ -176,24 +217,106 @@ def update_best_reply_for_topic(topic_id: int, reply_id: int):
     """
     Updates the best reply for a topic.
     """
-    update_query('''UPDATE topics SET best_reply_id = ? WHERE topic_id = ?''', (reply_id, topic_id))
+    update_query('''UPDATE topics SET best_reply_id = ?, version = version + 1 WHERE topic_id = ?''', (reply_id, topic_id))
+    invalidate(f'topics:{topic_id}')
 
     return f"Best reply for topic {topic_id} updated to {reply_id}"
 
 
+REPLY_COLUMNS = 'r.reply_id, r.text, r.user_id, r.topic_id, r.created, r.edited'
+
+
 #WORKS
+@coalesce
 def fetch_replies_for_topic(topic_id: int):
     """
-    Fetches all replies for a specific topic.
+    Fetches all replies for a specific topic, oldest first.
+    Pages use fetch_replies_page, this reads the whole thread.
     """
     data = read_query(
-        '''SELECT r.reply_id, r.text, r.user_id, r.topic_id, r.created, r.edited
+        f'''SELECT {REPLY_COLUMNS}
         FROM replies r
-        WHERE r.topic_id = ?''',
+        WHERE r.topic_id = ?
+        ORDER BY r.created, r.reply_id''',
         (topic_id,)
     )
     
     return [Reply.from_query_result(*row) for row in data]
+
+
+def _seek_replies(topic_id: int, cursor: int | None, limit: int, backwards: bool = False,
+                  inclusive: bool = False) -> list[Reply]:
+    """
+    Up to `limit` replies next to the `cursor` reply in (created, reply_id) order, nearest
+    first, read as one range of the (topic_id, created, reply_id) index.
+    """
+    direction = 'DESC' if backwards else 'ASC'
+
+    if cursor is None:
+        data = read_query(
+            f'''SELECT {REPLY_COLUMNS}
+            FROM replies r
+            WHERE r.topic_id = ?
+            ORDER BY r.created {direction}, r.reply_id {direction}
+            LIMIT ?''',
+            (topic_id, limit)
+        )
+    else:
+        op = '<' if backwards else '>'
+        data = read_query(
+            f'''SELECT {REPLY_COLUMNS}
+            FROM replies r
+            JOIN replies c ON c.reply_id = ? AND c.topic_id = r.topic_id
+            WHERE r.topic_id = ?
+            AND (r.created {op} c.created OR (r.created = c.created AND r.reply_id {op}{'=' if inclusive else ''} c.reply_id))
+            ORDER BY r.created {direction}, r.reply_id {direction}
+            LIMIT ?''',
+            (cursor, topic_id, limit)
+        )
+
+    return [Reply.from_query_result(*row) for row in data]
+
+
+def _replies_page(older: list[Reply], older_limit: int, newer: list[Reply], newer_limit: int,
+                  has_prev: bool = False, has_next: bool = False) -> dict:
+    # Each side was read with one extra row, which only tells whether there is more
+    has_prev = has_prev or len(older) > older_limit
+    has_next = has_next or len(newer) > newer_limit
+    replies = older[:older_limit][::-1] + newer[:newer_limit]
+
+    return {
+        'replies': replies,
+        'prev_cursor': replies[0].id if has_prev and replies else None,
+        'next_cursor': replies[-1].id if has_next and replies else None
+    }
+
+
+#WORKS
+@coalesce
+def fetch_replies_page(topic_id: int, after: int = None, before: int = None, around: int = None,
+                       limit: int = 20) -> dict:
+    """
+    Fetches one page of a topic's replies, oldest first, by seeking from a reply instead
+    of counting an offset, so every page costs the same however long the thread grows.
+    Parameters:
+    - after / before: the reply at the edge of the page the client has (next / previous page)
+    - around: a reply to center the page on, e.g. to jump to the best reply
+    - limit: replies per page
+    Returns:
+    - dict: replies, and the cursors of the previous and next pages (None at either end)
+    """
+    if around is not None:
+        newer = _seek_replies(topic_id, around, limit - limit // 2 + 1, inclusive=True)
+
+        # Not a reply of this topic, show the first page
+        if newer and newer[0].id == around:
+            older = _seek_replies(topic_id, around, limit // 2 + 1, backwards=True)
+            return _replies_page(older, limit // 2, newer, limit - limit // 2)
+
+    if before is not None:
+        return _replies_page(_seek_replies(topic_id, before, limit + 1, backwards=True), limit, [], 0, has_next=True)
+
+    return _replies_page([], 0, _seek_replies(topic_id, after, limit + 1), limit, has_prev=after is not None)
 # korekcii gore.
 
 #WORKS
@@ -219,8 +342,9 @@ def lock_or_unlock_topic(topic_id: int, lock_status: bool):
     """
     Locks or unlocks a topic based on the provided status.
     """
-    update_query('''UPDATE topics SET is_locked = ? WHERE topic_id = ?''',
+    update_query('''UPDATE topics SET is_locked = ?, version = version + 1 WHERE topic_id = ?''',
                  (lock_status, topic_id))
+    invalidate(f'topics:{topic_id}')
 
 
 #WORKS
@@ -252,20 +376,39 @@ def delete_topic(topic_id: int):
     First removes best_reply reference, then deletes replies, then the topic.
     """
     try:
-        update_query(
-            '''UPDATE topics SET best_reply_id = NULL WHERE topic_id = ?''', 
-            (topic_id,)
-        )
-
-        update_query(
-            '''DELETE FROM replies WHERE topic_id = ?''', 
-            (topic_id,)
-        )
-
-        update_query(
-            '''DELETE FROM topics WHERE topic_id = ?''', 
-            (topic_id,)
-        )
+        with transaction() as cursor:
+            # Read under lock so a reply added meanwhile is not left out of the category's count
+            cursor.execute(
+                '''SELECT category_id, reply_count FROM topics WHERE topic_id = ? FOR UPDATE''', 
+                (topic_id,)
+            )
+            topic = cursor.fetchone()
+
+            cursor.execute(
+                '''UPDATE topics SET best_reply_id = NULL WHERE topic_id = ?''', 
+                (topic_id,)
+            )
+
+            cursor.execute(
+                '''DELETE FROM replies WHERE topic_id = ?''', 
+                (topic_id,)
+            )
+
+            cursor.execute(
+                '''DELETE FROM topics WHERE topic_id = ?''', 
+                (topic_id,)
+            )
+
+            if topic:
+                category_id, reply_count = topic
+                cursor.execute(
+                    '''UPDATE categories SET topic_count = GREATEST(topic_count - 1, 0),
+                                             reply_count = GREATEST(reply_count - ?, 0)
+                       WHERE category_id = ?''',
+                    (reply_count, category_id)
+                )
+
+        invalidate(f'topics:{topic_id}', 'replies', 'votes')
 
         return f"Topic {topic_id} deleted successfully"
     except Exception as e:
@@ -283,4 +426,5 @@ def topic_create_form(title: str = Form(...), text: str = Form(...), category_id
 
 def remove_best_reply(reply_id: int):
 
-    update_query('''UPDATE topics SET best_reply_id = NULL WHERE best_reply_id = ?''', (reply_id,))
\ No newline at end of file
+    update_query('''UPDATE topics SET best_reply_id = NULL, version = version + 1 WHERE best_reply_id = ?''', (reply_id,))
+    invalidate('topics')
\ No newline at end of file
@@ -4,15 +4,20 @@ from data.models.user import User, UserRegistration, UserResponse, UserSearch
 from services import replies_services
 from data.database import read_query, insert_query, update_query
 from data.models.vote import Vote
+from common.query_cache import cached, invalidate
+from common.shared_directory import UserDisplay, directory
 import common.auth
 from mariadb import IntegrityError
 
 
 def create_user(user: User) -> int:
-    return insert_query(
+    user_id = insert_query(
         'INSERT INTO users (username, password, email, first_name, last_name) VALUES (?, ?, ?, ?, ?)',
         (user.username, user.password, user.email, user.first_name, user.last_name)
     )
+    invalidate(f'users:{user_id}')
+
+    return user_id
 
 
 def get_user(username: str) -> UserResponse:
@@ -39,6 +44,7 @@ def get_user(username: str) -> UserResponse:
     
     return UserResponse(**user_dict)
 
+@cached('users:{user_id}')
 def get_user_by_id(user_id: int) -> User | None:
     """Get user by ID with all fields including bio"""
     data = read_query(
@@ -66,6 +72,11 @@ def get_user_by_id(user_id: int) -> User | None:
     return User(**user_dict)
 
 
+def get_user_display(user_id: int) -> UserDisplay | User | None:
+    """Username and display name from the shared directory, falls back to the database for users it does not know yet"""
+    return directory.user(user_id) or get_user_by_id(user_id)
+
+
 def get_users():
     data = read_query('SELECT * FROM users')
     return [UserResponse.from_query_result(row) for row in data]
@@ -131,7 +142,10 @@ def get_users_by_username(username: str, is_privileged: bool = False):
 
 
 def delete_user(user_id: int):
-    return insert_query('DELETE FROM users WHERE user_id = ?', (user_id,))
+    deleted = insert_query('DELETE FROM users WHERE user_id = ?', (user_id,))
+    invalidate(f'users:{user_id}')
+
+    return deleted
 
 
 def check_user_access_level(user_id: int, category_id: int) -> int:
@@ -145,9 +159,13 @@ def update_user_permissions(user_id: int, category_id: int, access_level: int):
     has_entry = read_query('SELECT * FROM users_categories_permissions WHERE user_id = ? AND category_id = ? LIMIT 1', (user_id, category_id))
 
     if not has_entry:
-        return insert_query('INSERT INTO users_categories_permissions (user_id, category_id, write_access) VALUES (?, ?, ?)', (user_id, category_id, access_level))
+        result = insert_query('INSERT INTO users_categories_permissions (user_id, category_id, write_access) VALUES (?, ?, ?)', (user_id, category_id, access_level))
+    else:
+        result = insert_query('UPDATE users_categories_permissions SET write_access = ? WHERE user_id = ? AND category_id = ?', (access_level, user_id, category_id))
 
-    return insert_query('UPDATE users_categories_permissions SET write_access = ? WHERE user_id = ? AND category_id = ?', (access_level, user_id, category_id))
+    # After the write, so a read racing it cannot cache the old permissions
+    invalidate(f'permissions:{user_id}')
+    return result
 
 
 def update_user_profile(user_id: int, email: str, first_name: str, last_name: str, bio: str = None, new_password: str = None, confirm_password: str = None):
@@ -173,5 +191,6 @@ def update_user_profile(user_id: int, email: str, first_name: str, last_name: st
                    WHERE user_id = ?''',
                 (email, first_name, last_name, bio, user_id)
             )
+        invalidate(f'users:{user_id}')
     except IntegrityError:
         raise ValueError("Email address already in use")
\ No newline at end of file
@@ -1,6 +1,8 @@
 from common.exceptions import NotFoundException
-from data.database import read_query, update_query
+from data.database import read_query, transaction
 from data.models.user import User
+from common.query_cache import cached, invalidate
+from common.topic_events import topic_events
 from services import replies_services, users_services
 
 
@@ -32,28 +34,42 @@ def vote(reply_id: int, type: bool, current_user: User) -> str | None:
     current_vote = users_services.has_voted(reply_id=reply_id, user_id=current_user.id)
     response = None
 
-    if current_vote: # Check if the there is a vote already and:
-        
-        if current_vote.type == type: # if it's the same type, delete it
-            deleted_vote = update_query('''DELETE FROM votes WHERE user_id = ? AND reply_id = ?''', (current_user.id, reply_id))
+    # The vote and the version of the reply's topic change together
+    with transaction() as cursor:
+
+        if current_vote: # Check if the there is a vote already and:
             
-            if deleted_vote:
-                response = 'vote deleted'
+            if current_vote.type == type: # if it's the same type, delete it
+                cursor.execute('''DELETE FROM votes WHERE user_id = ? AND reply_id = ?''', (current_user.id, reply_id))
+                
+                if cursor.rowcount:
+                    response = 'vote deleted'
+            
+            else: # change it, if it's a different type
+                cursor.execute('''UPDATE votes SET type = ? WHERE user_id = ? AND reply_id = ?''', (type, current_user.id, reply_id))
+                if cursor.rowcount:
+                    response = 'upvoted' if type else 'downvoted'
         
-        else: # change it, if it's a different type
-            changed_vote = update_query('''UPDATE votes SET type = ? WHERE user_id = ? AND reply_id = ?''', (type, current_user.id, reply_id))
-            if changed_vote:
+        else: # Otherwise create a new vote
+            cursor.execute('''INSERT INTO votes (user_id, reply_id, type) VALUES(?, ?, ?)''', (current_user.id, reply_id, type))
+           
+            if cursor.rowcount:
                 response = 'upvoted' if type else 'downvoted'
-    
-    else: # Otherwise create a new vote
-        vote = update_query('''INSERT INTO votes (user_id, reply_id, type) VALUES(?, ?, ?)''', (current_user.id, reply_id, type))
-       
-        if vote:
-            response = 'upvoted' if type else 'downvoted'
+
+        if response:
+            cursor.execute('''UPDATE topics SET version = version + 1
+                              WHERE topic_id = (SELECT topic_id FROM replies WHERE reply_id = ?)''', (reply_id,))
+
+    invalidate(f'votes:{reply_id}')
+
+    if response:
+        topic_events.publish(replies_services.topic_of(reply_id), 'votes',
+                             {'reply_id': reply_id, 'votes': get_votes(reply_id) or 0})
         
     return response
 
 
+@cached('votes:{reply_id}')
 def get_votes(reply_id: int):
     
     votes = read_query('''SELECT CAST(SUM(CASE WHEN type = 0 THEN -1 ELSE type END) AS INT)  FROM votes WHERE reply_id = ?''', (reply_id,))
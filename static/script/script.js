@@ -1,5 +1,12 @@
 let socket;
 let isJoining = false;
+let oldestMessageId = null;
+let hasMoreHistory = true;
+let loadingHistory = false;
+const onlineUsers = new Set();
+
+// Set receiver_id for testing; this should be dynamically set in a real app
+const receiverId = 2; // Replace with actual receiver ID
 
 function initializeWebSocket() {
   if (socket && (socket.readyState === WebSocket.OPEN || socket.readyState === WebSocket.CONNECTING)) {
@@ -10,11 +17,35 @@ function initializeWebSocket() {
 
   socket.onopen = function () {
     console.log('WebSocket connection established.');
+    oldestMessageId = null;
+    hasMoreHistory = true;
+    requestHistory();
+    socket.send(JSON.stringify({ type: 'presence', users: [receiverId] }));
   };
 
   socket.onmessage = function (event) {
     const data = JSON.parse(event.data);
 
+    if (data.type === 'ping') {
+      socket.send(JSON.stringify({ type: 'pong' }));
+      return;
+    }
+
+    if (data.type === 'history') {
+      showHistory(data);
+      return;
+    }
+
+    if (data.type === 'presence') {
+      showPresence(data);
+      return;
+    }
+
+    if (data.type === 'error') {
+      console.warn("Chat request failed:", data.error);
+      return;
+    }
+
     if (!data.username || !data.data || !data.time) {
       console.warn("Incomplete message data received, skipping:", data);
       return;
@@ -45,6 +76,51 @@ function initializeWebSocket() {
   };
 }
 
+// Presence changes arrive for every user, at most once a second
+function showPresence(data) {
+  data.online.forEach(userId => onlineUsers.add(userId));
+  data.offline.forEach(userId => onlineUsers.delete(userId));
+  $('#receiver-status').text(onlineUsers.has(receiverId) ? 'Online' : 'Offline');
+}
+
+function requestHistory() {
+  if (loadingHistory || !hasMoreHistory || !socket || socket.readyState !== WebSocket.OPEN) {
+    return;
+  }
+
+  loadingHistory = true;
+  socket.send(JSON.stringify({ type: 'history', with: receiverId, before_message_id: oldestMessageId, limit: 50 }));
+}
+
+function showHistory(data) {
+  const chat = $('#chat')[0];
+  const previousHeight = chat.scrollHeight;
+  const isFirstPage = oldestMessageId === null;
+
+  const items = data.messages.map(function (message) {
+    const msgClass = message.isMe ? 'user-message' : 'other-message';
+    const sender = message.isMe ? 'You' : 'Them';
+    return $('<li>').addClass('clearfix').append($('<div>').addClass(msgClass).text(`${sender}: ${message.data}`));
+  });
+  $('#messages').prepend(items);
+
+  if (data.messages.length) {
+    oldestMessageId = data.messages[0].message_id;
+  }
+  hasMoreHistory = data.has_more;
+  loadingHistory = false;
+
+  // Keep the view where it was while older messages appear above it
+  chat.scrollTop = isFirstPage ? chat.scrollHeight : chat.scrollHeight - previousHeight;
+}
+
+// Load older messages when scrolled to the top
+$('#chat').on('scroll', function () {
+  if (this.scrollTop === 0) {
+    requestHistory();
+  }
+});
+
 function showJoinModal() {
   $('#username-form').show();
   $('#chat').hide();
@@ -84,15 +160,10 @@ function sendMessage() {
   const message = $('#message').val().trim();
   const username = $('#usernameInput').val().trim();
   
-  // Set sender_id and receiver_id for testing; these should be dynamically set in a real app
-  const senderId = 1;  // Replace with actual sender ID
-  const receiverId = 2; // Replace with actual receiver ID
-  
   if (message && username && socket.readyState === WebSocket.OPEN) {
     socket.send(JSON.stringify({
       "message": message,
       "username": username,
-      "sender_id": senderId,
       "receiver_id": receiverId
     }));
     $('#message').val(''); // Clear the input after sending
@@ -0,0 +1,27 @@
+import asyncio
+
+
+class FakeWebSocket:
+    """
+    WebSocket stand-in that records the frames sent to it; `delay` makes it a slow client.
+    """
+
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.sent = []
+        self.close_code = None
+        self.subprotocol = None
+
+    async def accept(self, subprotocol: str | None = None):
+        self.subprotocol = subprotocol
+
+    async def send_text(self, text: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.sent.append(text)
+
+    async def send_bytes(self, data: bytes):
+        await self.send_text(data)
+
+    async def close(self, code: int = 1000):
+        self.close_code = code
@@ -1,9 +1,10 @@
+import asyncio
 from datetime import datetime, timedelta
 import unittest
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
-from common.auth import authenticate_user, create_access_token, get_current_admin_user, get_current_user, verify_password, get_password_hash, verify_token, token_blacklist
+from common.auth import authenticate_user, authenticate_user_async, create_access_token, get_current_admin_user, get_current_user, verify_password, get_password_hash, verify_token, token_blacklist
 from common.exceptions import ForbiddenException, UnauthorizedException
 from config import ALGORITHM, SECRET_KEY
 from jose import jwt
@@ -103,6 +104,45 @@ class TestAuth(unittest.TestCase):
 
         self.assertIsNone(result)
 
+    @patch('common.auth.read_query')
+    @patch('common.auth.hashing.verify_password_async', new_callable=AsyncMock)
+    def test_authenticate_user_async_awaitsTheHashingPool(self, mock_verify_password_async, mock_read_query):
+        mock_read_query.return_value = [(1, 'testuser', '$2b$12$hash', 'test@example.com', 'First', 'Last', False)]
+        mock_verify_password_async.return_value = False
+
+        result = asyncio.run(authenticate_user_async('testuser', 'password'))
+
+        self.assertIsNone(result)
+        mock_verify_password_async.assert_awaited_once_with('password', '$2b$12$hash')
+
+    @patch('common.auth.invalidate')
+    @patch('common.auth.update_query')
+    @patch('common.auth.get_password_hash', return_value='$2b$12$rehashed')
+    @patch('common.auth.verify_password', return_value=True)
+    @patch('common.auth.read_query')
+    def test_authenticate_user_outdatedHash_isRehashed(self, mock_read_query, mock_verify_password, mock_get_password_hash,
+                                                       mock_update_query, mock_invalidate):
+        mock_read_query.return_value = [(1, 'testuser', '$2b$04$oldhash', 'test@example.com', 'First', 'Last', False)]
+
+        with patch('common.auth.UserResponse'), patch('common.hashing.BCRYPT_ROUNDS', 12):
+            authenticate_user('testuser', 'password')
+
+        mock_update_query.assert_called_once_with('UPDATE users SET password = ? WHERE user_id = ?', ('$2b$12$rehashed', 1))
+        mock_invalidate.assert_called_once_with('users:1')
+
+
+    @patch('common.auth.update_query')
+    @patch('common.auth.verify_password', return_value=True)
+    @patch('common.auth.read_query')
+    def test_authenticate_user_currentHash_isKept(self, mock_read_query, mock_verify_password, mock_update_query):
+        mock_read_query.return_value = [(1, 'testuser', '$2b$12$hash', 'test@example.com', 'First', 'Last', False)]
+
+        with patch('common.auth.UserResponse'), patch('common.hashing.BCRYPT_ROUNDS', 12):
+            authenticate_user('testuser', 'password')
+
+        mock_update_query.assert_not_called()
+
+
     @patch('common.auth.verify_token')
     def test_get_current_user_no_username(self, mock_verify_token):
         mock_verify_token.return_value = {'sub': None}
@@ -0,0 +1,48 @@
+import queue
+import tempfile
+import unittest
+from unittest.mock import patch
+from common.broadcast import FRAGMENT_SIZE, UnixBroadcast
+
+
+class TestUnixBroadcast(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.sender, self.receiver = UnixBroadcast(directory), UnixBroadcast(directory)
+        self.received = queue.Queue()
+
+        self.sender.start(lambda data: None)
+        self.receiver.start(self.received.put)
+        self.addCleanup(self.sender.stop)
+        self.addCleanup(self.receiver.stop)
+
+
+    def test_send_smallMessage_arrivesInOneDatagram(self):
+        self.sender.send(b'{"tags": ["users:1"]}')
+
+        self.assertEqual(self.received.get(timeout=2), b'{"tags": ["users:1"]}')
+
+
+    def test_send_messageLargerThanADatagram_isReassembled(self):
+        data = bytes(range(256)) * (FRAGMENT_SIZE // 100)
+
+        self.sender.send(data)
+
+        self.assertEqual(self.received.get(timeout=2), data)
+
+
+    def test_reassemble_dropsIncompleteMessagesAfterTimeout(self):
+        partial = {}
+        stale, _ = UnixBroadcast._fragments(b'x' * (FRAGMENT_SIZE + 1))
+        fresh, _ = UnixBroadcast._fragments(b'y' * (FRAGMENT_SIZE + 1))
+
+        UnixBroadcast._reassemble(partial, stale)
+        with patch('common.broadcast.FRAGMENT_TIMEOUT', -1):
+            UnixBroadcast._reassemble(partial, fresh)
+
+        self.assertEqual(list(partial), [fresh[:16]])
+
+
+    def test_reassemble_malformedDatagram_isDropped(self):
+        self.assertIsNone(UnixBroadcast._reassemble({}, b'{}'))
@@ -82,22 +82,24 @@ class TestCategoryServices(TestCase):
         with self.assertRaises(NotFoundException):
             categories_services.delete(1)
 
-    @patch('services.categories_services.update_query', autospec=True)
+    @patch('services.categories_services.transaction')
     @patch('services.categories_services.exists', autospec=True)
-    def testDelete_CategoryExistsNoTopics_ReturnsResponse(self, mock_exists, mock_update_query):
+    @patch('services.categories_services.has_topics', autospec=True)
+    def testDelete_CategoryExistsNoTopics_ReturnsResponse(self, mock_has_topics, mock_exists, mock_transaction):
         mock_exists.return_value = True
-        mock_update_query.return_value = 1
+        mock_has_topics.return_value = False
+        mock_transaction.return_value.__enter__.return_value.rowcount = 1
         result = categories_services.delete(1)
         excepted = 'only category deleted'
         self.assertEqual(result, excepted)
 
-    @patch('services.categories_services.update_query', autospec=True)
+    @patch('services.categories_services.transaction')
     @patch('services.categories_services.exists', autospec=True)
     @patch('services.categories_services.has_topics', autospec=True)
-    def testDelete_CategoryExistsWithTopics_ReturnsResponse(self, mock_has_topics, mock_exists, mock_update_query):
+    def testDelete_CategoryExistsWithTopics_ReturnsResponse(self, mock_has_topics, mock_exists, mock_transaction):
         mock_exists.return_value = True
         mock_has_topics.return_value = True
-        mock_update_query.return_value = 2
+        mock_transaction.return_value.__enter__.return_value.rowcount = 1
         result = categories_services.delete(1, True)
         excepted = 'everything deleted'
         self.assertEqual(result, excepted)
@@ -258,4 +260,44 @@ class TestCategoryServices(TestCase):
                     'Topics': [TopicCategoryResponseAdmin(topic_id=1, title='Hello', user_id=1, is_locked=False, best_reply_id=1, category_id=1)]}
         self.assertEqual(result, expected)
 
-    
\ No newline at end of file
+    
+    @patch('services.categories_services.read_query', autospec=True)
+    def testGetTopicsPage_FirstPage_ReturnsNextCursor(self, mock_read_query):
+        mock_read_query.return_value = [(3, 'Three', 1, False, None, 1, 0, DATE), (2, 'Two', 1, False, None, 1, 4, DATE),
+                                        (1, 'One', 1, False, None, 1, 2, DATE)]
+        result = categories_services.get_topics_page(1, limit=2)
+        self.assertEqual([topic.topic_id for topic in result['topics']], [3, 2])
+        self.assertEqual((result['prev_cursor'], result['next_cursor']), (None, 2))
+        sql, params = mock_read_query.call_args[0]
+        self.assertIn('ORDER BY t.topic_id DESC', sql)
+        self.assertEqual(params, (1, 3))
+
+    @patch('services.categories_services.read_query', autospec=True)
+    def testGetTopicsPage_AfterCursor_SeeksBySortColumn(self, mock_read_query):
+        mock_read_query.return_value = [(1, 'One', 1, False, None, 1, 2, DATE)]
+        result = categories_services.get_topics_page(1, sort='replies', after=2, limit=2)
+        self.assertEqual([topic.reply_count for topic in result['topics']], [2])
+        self.assertEqual((result['prev_cursor'], result['next_cursor']), (1, None))
+        sql, params = mock_read_query.call_args[0]
+        self.assertIn('t.reply_count < c.reply_count', sql)
+        self.assertIn('ORDER BY t.reply_count DESC, t.topic_id DESC', sql)
+        self.assertEqual(params, (2, 1, 3))
+
+    @patch('services.categories_services.read_query', autospec=True)
+    def testGetTopicsPage_BeforeCursor_ReturnsPageInSortOrder(self, mock_read_query):
+        mock_read_query.return_value = [(4, 'Four', 1, False, None, 1, 0, DATE), (5, 'Five', 1, False, None, 1, 0, DATE),
+                                        (6, 'Six', 1, False, None, 1, 0, DATE)]
+        result = categories_services.get_topics_page(1, sort='activity', before=3, limit=2)
+        self.assertEqual([topic.topic_id for topic in result['topics']], [5, 4])
+        self.assertEqual((result['prev_cursor'], result['next_cursor']), (5, 4))
+        sql, _ = mock_read_query.call_args[0]
+        self.assertIn('ORDER BY t.last_activity_at ASC, t.topic_id ASC', sql)
+
+    @patch('services.categories_services.read_query', autospec=True)
+    def testGrantReadAccess_InvalidatesPermissionsAfterTheWrite(self, mock_read_query):
+        mock_read_query.side_effect = [[(1, 'Cars', 0, 1)], []]
+        calls = []
+        with patch('services.categories_services.insert_query', side_effect=lambda *args: calls.append('insert')), \
+             patch('services.categories_services.invalidate', side_effect=lambda *tags: calls.append(tags)):
+            categories_services.grant_read_access(2, 1, False, mock_user(1, 'admin', 'pass', 'admin@email.com', 'A', 'B', None, True, False))
+        self.assertEqual(calls, ['insert', ('permissions:2',)])
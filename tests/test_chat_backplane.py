@@ -0,0 +1,63 @@
+import asyncio
+import tempfile
+import unittest
+from common.broadcast import NullBroadcast, UnixBroadcast
+from common.chat_backplane import ChatBackplane
+from common.connections import ConnectionManager
+from tests.fakes import FakeWebSocket
+
+
+class TestChatBackplane(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.worker_a, self.worker_b = ConnectionManager(), ConnectionManager()
+        self.backplane_a = ChatBackplane(self.worker_a, UnixBroadcast(self.directory.name))
+        self.backplane_b = ChatBackplane(self.worker_b, UnixBroadcast(self.directory.name))
+        self.backplane_a.start()
+        self.backplane_b.start()
+
+
+    async def asyncTearDown(self):
+        self.backplane_a.stop()
+        self.backplane_b.stop()
+        self.directory.cleanup()
+
+
+    async def wait_for(self, websocket, count: int):
+        for _ in range(100):
+            if len(websocket.sent) >= count:
+                return
+            await asyncio.sleep(0.01)
+
+
+    async def test_send_reachesUserConnectedToAnotherWorker(self):
+        sender, receiver = FakeWebSocket(), FakeWebSocket()
+        await self.worker_a.connect(sender, 1)
+        await self.worker_b.connect(receiver, 2)
+
+        self.backplane_a.send([(1, 'mine'), (2, 'yours')])
+        await self.wait_for(receiver, 1)
+        await self.wait_for(sender, 1)
+
+        self.assertEqual(sender.sent, ['mine'])
+        self.assertEqual(receiver.sent, ['yours'])
+        self.assertEqual(self.backplane_b.received, 1)
+
+        await self.worker_a.disconnect(sender)
+        await self.worker_b.disconnect(receiver)
+
+
+    async def test_in_process_backplane_deliversLocally(self):
+        connections = ConnectionManager()
+        backplane = ChatBackplane(connections, NullBroadcast())
+        backplane.start()
+        websocket = FakeWebSocket()
+        await connections.connect(websocket, 5)
+
+        backplane.send([(5, 'hello')])
+        await self.wait_for(websocket, 1)
+
+        self.assertEqual(websocket.sent, ['hello'])
+        await connections.disconnect(websocket)
+        backplane.stop()
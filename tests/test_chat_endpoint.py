@@ -0,0 +1,74 @@
+import json
+import unittest
+from unittest.mock import patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from routers.web import messages
+from test_models import mock_user
+
+
+class TestChatEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        app = FastAPI()
+        app.include_router(messages.router)
+        self.client = TestClient(app)
+        self.user = mock_user(1, 'john', '12345', 'john@email.com', 'john', 'smith', None, False, False)
+
+        for patcher in (patch('common.auth.get_current_user', return_value=self.user),
+                        patch('routers.web.messages.users_services.get_user_display',
+                              side_effect=lambda user_id: user_id == 2 or None),
+                        patch('routers.web.messages.deliver')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        queue_patcher = patch('routers.web.messages.messages_services.queue_message')
+        self.queue_message = queue_patcher.start()
+        self.addCleanup(queue_patcher.stop)
+
+
+    def exchange(self, frames: list) -> list[dict]:
+        """
+        Sends each frame and returns the reply to it, after the welcome.
+        """
+        replies = []
+
+        with self.client.websocket_connect('/messages/message') as websocket:
+            websocket.receive_json()
+
+            for frame in frames:
+                websocket.send_text(frame if isinstance(frame, str) else json.dumps(frame))
+                replies.append(websocket.receive_json())
+
+        return replies
+
+
+    def test_malformed_frames_getErrors_andKeepTheSocketOpen(self):
+        replies = self.exchange(['not json', '[1, 2]', {'receiver_id': 'abc', 'message': 'hi'},
+                                 {'receiver_id': 2, 'message': 'hi'}])
+
+        self.assertEqual([reply.get('type') for reply in replies[:3]], ['error', 'error', 'error'])
+        self.assertEqual(replies[3], {'status': 'success', 'message': 'hi'})
+
+
+    def test_message_toUnknownReceiver_isNotQueued(self):
+        replies = self.exchange([{'receiver_id': 999, 'message': 'hi'}])
+
+        self.assertEqual(replies, [{'type': 'error', 'error': 'receiver does not exist'}])
+        self.queue_message.assert_not_called()
+
+
+    def test_history_withBadFields_getsError(self):
+        replies = self.exchange([{'type': 'history', 'with': 'adam'}, {'type': 'history', 'with': 2, 'limit': 'all'},
+                                 {'type': 'history', 'with': 2, 'before_message_id': [1]}])
+
+        self.assertEqual([reply['type'] for reply in replies], ['error', 'error', 'error'])
+
+
+    def test_history_limit_isCappedOnTheServer(self):
+        with patch('routers.web.messages.messages_services.get_conversation', return_value=[]) as get_conversation, \
+             patch('routers.web.messages.messages_services.mark_conversation_read'):
+            replies = self.exchange([{'type': 'history', 'with': 2, 'limit': 100000}])
+
+        self.assertEqual(replies[0]['type'], 'history')
+        self.assertEqual(get_conversation.call_args[0], (1, 2, None, messages.HISTORY_PAGE_LIMIT))
@@ -0,0 +1,125 @@
+import gzip
+import os
+import tempfile
+import unittest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+from common.middleware import CompressionMiddleware, choose_encoding
+from common.static_assets import PrecompressedStaticFiles, build, minify_css, minify_js
+
+
+def create_app():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get('/large')
+    def large():
+        return PlainTextResponse('reply ' * 100)
+
+    @app.get('/small')
+    def small():
+        return PlainTextResponse('reply')
+
+    @app.get('/stream')
+    def stream():
+        return StreamingResponse((chunk for chunk in (b'<p>one</p>', b'<p>two</p>')), media_type='text/html')
+
+    return app
+
+
+class TestCompressionMiddleware(unittest.TestCase):
+
+    def setUp(self):
+        self.client = TestClient(create_app())
+
+
+    def test_choose_encoding_respectsQuality(self):
+        self.assertEqual(choose_encoding('gzip, deflate'), 'gzip')
+        self.assertIsNone(choose_encoding('gzip;q=0'))
+        self.assertIsNone(choose_encoding(''))
+
+
+    def test_large_response_isGzipped(self):
+        response = self.client.get('/large', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['content-encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['vary'])
+        self.assertEqual(response.text, 'reply ' * 100)
+
+
+    def test_small_response_isNotCompressed(self):
+        response = self.client.get('/small', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('content-encoding', response.headers)
+        self.assertEqual(response.text, 'reply')
+
+
+    def test_streamed_response_isCompressedChunkByChunk(self):
+        response = self.client.get('/stream', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['content-encoding'], 'gzip')
+        self.assertEqual(response.text, '<p>one</p><p>two</p>')
+
+
+class TestStaticAssets(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.static_dir = self.directory.name
+        for folder, name, content in (('css', 'styles.css', 'body {\n  color: red;\n}\n/* note */\n'),
+                                      ('script', 'script.js', 'function f() {\n  // comment\n  return 1;\n}\n')):
+            os.makedirs(os.path.join(self.static_dir, folder))
+            with open(os.path.join(self.static_dir, folder, name), 'w') as file:
+                file.write(content)
+
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+
+    def test_minify_css_removesCommentsAndWhitespace(self):
+        self.assertEqual(minify_css('a , b {\n  color: red;\n}\n/* x */'), 'a,b{color:red}')
+
+
+    def test_minify_css_keepsDescendantSpaceBeforePseudoClass(self):
+        self.assertEqual(minify_css('a :hover { color : red }\n@media (max-width: 600px) { p { margin: 0 } }'),
+                         'a :hover{color:red}@media (max-width: 600px){p{margin:0}}')
+
+
+    def test_minify_js_keepsTemplateLiteralLines(self):
+        source = 'if (a) {\n    // note\n    const s = `line\n    kept`;\n}\n'
+        self.assertEqual(minify_js(source), 'if (a) {\nconst s = `line\n    kept`;\n}\n')
+
+
+    def test_build_writesFingerprintedAndGzippedFiles(self):
+        manifest = build(self.static_dir)
+        target = manifest['css/styles.css']
+
+        self.assertRegex(target, r'^dist/css/styles\.[0-9a-f]{12}\.css$')
+        with open(os.path.join(self.static_dir, target + '.gz'), 'rb') as file:
+            self.assertEqual(gzip.decompress(file.read()), b'body{color:red}')
+
+
+    def test_static_files_servePrecompressedImmutableAsset(self):
+        manifest = build(self.static_dir)
+        app = FastAPI()
+        app.mount('/static', PrecompressedStaticFiles(directory=self.static_dir), name='static')
+        client = TestClient(app)
+
+        response = client.get(f'/static/{manifest["css/styles.css"]}', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['content-encoding'], 'gzip')
+        self.assertTrue(response.headers['content-type'].startswith('text/css'))
+        self.assertIn('immutable', response.headers['cache-control'])
+        self.assertEqual(response.text, 'body{color:red}')
+
+        response = client.get('/static/css/styles.css')
+        self.assertNotIn('immutable', response.headers['cache-control'])
+
+
+    def test_static_files_refusedEncoding_servesIdentity(self):
+        manifest = build(self.static_dir)
+        app = FastAPI()
+        app.mount('/static', PrecompressedStaticFiles(directory=self.static_dir), name='static')
+        client = TestClient(app)
+
+        response = client.get(f'/static/{manifest["css/styles.css"]}', headers={'Accept-Encoding': 'gzip;q=0, identity'})
+        self.assertNotIn('content-encoding', response.headers)
+        self.assertEqual(response.text, 'body{color:red}')
@@ -0,0 +1,81 @@
+import unittest
+from unittest.mock import patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import common.auth
+from data.models.user import User
+from routers.api import categories, topics
+from common.conditional import etag_matches, make_etag, not_modified
+from services import categories_services
+
+
+class TestConditional(unittest.TestCase):
+
+    def test_make_etag_isStable_andChangesWithParts(self):
+        self.assertEqual(make_etag((1, 'title'), 5), make_etag((1, 'title'), 5))
+        self.assertNotEqual(make_etag((1, 'title'), 5), make_etag((1, 'title'), 6))
+        self.assertTrue(make_etag('x').startswith('W/"'))
+
+
+    def test_etag_matches_usesWeakComparison(self):
+        etag = make_etag('topic')
+        self.assertTrue(etag_matches(etag, etag))
+        self.assertTrue(etag_matches(etag[2:], etag))
+        self.assertTrue(etag_matches(f'W/"other", {etag}', etag))
+        self.assertTrue(etag_matches('*', etag))
+
+
+    def test_etag_matches_returnsFalse_whenMissingOrDifferent(self):
+        etag = make_etag('topic')
+        self.assertFalse(etag_matches(None, etag))
+        self.assertFalse(etag_matches(make_etag('other'), etag))
+
+
+    def test_not_modified_returns304WithValidator(self):
+        response = not_modified('W/"abc"')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], 'W/"abc"')
+        self.assertEqual(response.headers['Cache-Control'], 'private, no-cache')
+
+
+    def test_category_version_returnsNone_whenPrivateWithoutAccess(self):
+        user = User(id=2, username='viewer', password='Password1!', email='viewer@mail.com', is_admin=False)
+        with patch('services.categories_services.read_query') as mock_read_query:
+            mock_read_query.return_value = [('Cars', 0, 1, None, 3, 7, 12345)]
+            self.assertIsNone(categories_services.category_version(1, user))
+
+            mock_read_query.return_value = [('Cars', 0, 1, 1, 3, 7, 12345)]
+            self.assertEqual(categories_services.category_version(1, user), ('Cars', 0, 1, 1, 3, 7, 12345))
+
+
+    def test_category_page_etag_changesWithCursors(self):
+        app = FastAPI()
+        app.include_router(categories.router)
+        app.dependency_overrides[common.auth.get_current_user] = lambda: User(id=2, username='viewer', password='Password1!',
+                                                                               email='viewer@mail.com', is_admin=False)
+        client = TestClient(app)
+        pages = [{'topics': [], 'prev_cursor': None, 'next_cursor': None},
+                 {'topics': [], 'prev_cursor': None, 'next_cursor': 40}]
+
+        with patch('routers.api.categories.categories_services.category_version', return_value=('Cars', 0, 0, None)), \
+             patch('routers.api.categories.categories_services.get_topics_page', side_effect=pages):
+            etags = [client.get('/api/categories/1', params={'category_id': 1}).headers['etag'] for _ in pages]
+
+        self.assertNotEqual(etags[0], etags[1])
+
+
+    def test_topic_page_etag_changesWithPagingParameters(self):
+        app = FastAPI()
+        app.include_router(topics.topics_router)
+        client = TestClient(app)
+        page = {'replies': [], 'prev_cursor': None, 'next_cursor': None}
+
+        with patch('routers.api.topics.topics_services.topic_version', return_value=('Title', 0, None, 1, 3)), \
+             patch('routers.api.topics.topics_services.fetch_replies_page', return_value=page), \
+             patch('routers.api.topics.topics_services.fetch_topic_by_id', return_value={'id': 1}):
+            first = client.get('/api/topics/1')
+            etag = first.headers['etag']
+            second = client.get('/api/topics/1', params={'after': 20}, headers={'If-None-Match': etag})
+
+        self.assertNotEqual(second.status_code, 304)
+        self.assertNotEqual(second.headers['etag'], etag)
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import unittest
+from common.connections import (CLOSE_GOING_AWAY, CLOSE_REPLACED, CLOSE_TRY_AGAIN, DISCONNECT, PING,
+                                ConnectionManager)
+from tests.fakes import FakeWebSocket
+
+
+class TestConnectionManager(unittest.IsolatedAsyncioTestCase):
+
+    async def test_fan_out_isNotHeldUpBySlowClient(self):
+        manager = ConnectionManager(queue_size=10)
+        slow, fast = FakeWebSocket(delay=10), FakeWebSocket()
+        await manager.connect(slow, 1)
+        await manager.connect(fast, 2)
+
+        delivered = manager.fan_out(manager.active_connections.values(), 'hello')
+        await asyncio.sleep(0.01)
+
+        self.assertEqual(delivered, 2)
+        self.assertEqual(fast.sent, ['hello'])
+        self.assertEqual(slow.sent, [])
+
+        await manager.disconnect(slow)
+        await manager.disconnect(fast)
+
+
+    async def test_full_queue_dropsOldest(self):
+        manager = ConnectionManager(queue_size=2)
+        websocket = FakeWebSocket(delay=10)
+        connection = await manager.connect(websocket, 1)
+        await asyncio.sleep(0)
+
+        manager.send_message(websocket, '1')
+        await asyncio.sleep(0)  # the writer takes '1' and blocks on the slow client
+        for message in ('2', '3', '4'):
+            manager.send_message(websocket, message)
+
+        self.assertEqual(connection.dropped, 1)
+        self.assertEqual([connection.queue.get_nowait() for _ in range(2)], ['3', '4'])
+
+        await manager.disconnect(websocket)
+
+
+    async def test_full_queue_disconnectsClient_withDisconnectPolicy(self):
+        manager = ConnectionManager(queue_size=1, overflow_policy=DISCONNECT)
+        websocket = FakeWebSocket(delay=10)
+        await manager.connect(websocket, 1)
+        await asyncio.sleep(0)
+
+        self.assertTrue(manager.send_message(websocket, '1'))
+        await asyncio.sleep(0)
+        self.assertTrue(manager.send_message(websocket, '2'))
+        self.assertFalse(manager.send_message(websocket, '3'))
+        await asyncio.sleep(0)
+
+        self.assertEqual(websocket.close_code, CLOSE_TRY_AGAIN)
+        self.assertFalse(manager.send_message(websocket, '4'))
+
+        await manager.disconnect(websocket)
+
+
+    async def test_disconnect_removesConnection(self):
+        manager = ConnectionManager()
+        websocket = FakeWebSocket()
+        connection = await manager.connect(websocket, 1)
+
+        self.assertEqual(await manager.disconnect(websocket), connection.id)
+        self.assertEqual(manager.stats()['connections'], 0)
+        self.assertIsNone(await manager.disconnect(websocket))
+
+
+    async def test_send_to_user_reachesOnlyThatUsersSockets(self):
+        manager = ConnectionManager()
+        first_tab, second_tab, other_user = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+        await manager.connect(first_tab, 1)
+        await manager.connect(second_tab, 1)
+        await manager.connect(other_user, 2)
+
+        self.assertEqual(manager.send_to_user(1, 'hi'), 2)
+        self.assertEqual(manager.send_to_user(3, 'nobody'), 0)
+        await asyncio.sleep(0.01)
+
+        self.assertEqual(first_tab.sent, ['hi'])
+        self.assertEqual(second_tab.sent, ['hi'])
+        self.assertEqual(other_user.sent, [])
+
+        await manager.disconnect(first_tab)
+        self.assertEqual(len(manager.connections_for(1)), 1)
+        await manager.disconnect(second_tab)
+        self.assertNotIn(1, manager.user_connections)
+        await manager.disconnect(other_user)
+
+
+    async def test_connect_replacesOldestSocket_whenUserIsOverLimit(self):
+        manager = ConnectionManager(max_per_user=1)
+        old_tab, new_tab = FakeWebSocket(), FakeWebSocket()
+        await manager.connect(old_tab, 1)
+        await manager.connect(new_tab, 1)
+
+        self.assertEqual(old_tab.close_code, CLOSE_REPLACED)
+        self.assertEqual([connection.websocket for connection in manager.connections_for(1)], [new_tab])
+
+        await manager.disconnect(new_tab)
+
+
+    async def test_connect_refusesSocket_whenWorkerIsFull(self):
+        manager = ConnectionManager(max_connections=1)
+        first, second = FakeWebSocket(), FakeWebSocket()
+
+        self.assertIsNotNone(await manager.connect(first, 1))
+        self.assertIsNone(await manager.connect(second, 2))
+        self.assertEqual(second.close_code, CLOSE_TRY_AGAIN)
+
+        await manager.disconnect(first)
+
+
+    async def test_check_liveness_pingsActive_andReapsIdleSockets(self):
+        manager = ConnectionManager(idle_seconds=60)
+        active, idle = FakeWebSocket(), FakeWebSocket()
+        await manager.connect(active, 1)
+        idle_connection = await manager.connect(idle, 2)
+        idle_connection.last_seen -= 120
+
+        await manager.check_liveness()
+        await asyncio.sleep(0.01)
+
+        self.assertEqual(active.sent, [json.dumps(PING)])
+        self.assertEqual(idle.close_code, CLOSE_GOING_AWAY)
+        self.assertEqual(manager.stats()['reaped'], 1)
+
+        await manager.disconnect(active)
+
+
+    async def test_drain_sendsQueuedMessages_thenClosesEverySocket(self):
+        manager = ConnectionManager()
+        websocket = FakeWebSocket()
+        await manager.connect(websocket, 1)
+        manager.send_message(websocket, 'bye')
+
+        await manager.drain(timeout=1)
+
+        self.assertEqual(websocket.sent, ['bye'])
+        self.assertEqual(websocket.close_code, CLOSE_GOING_AWAY)
+        self.assertEqual(manager.stats()['connections'], 0)
+        self.assertIsNone(await manager.connect(FakeWebSocket(), 2))
@@ -0,0 +1,55 @@
+import threading
+import unittest
+from concurrent.futures import Future
+from unittest.mock import MagicMock, patch
+from common import hashing
+from common.exceptions import ServiceUnavailableException
+
+
+class TestHashingPool(unittest.TestCase):
+
+    def setUp(self):
+        self.executor = MagicMock()
+        self.executor.submit.side_effect = lambda *args: Future()
+
+        for patcher in (patch('common.hashing._get_executor', return_value=self.executor),
+                        patch('common.hashing._slots', threading.BoundedSemaphore(2))):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+    def test_submit_beyondQueueDepth_isRejected(self):
+        hashing._submit(hashing._hash, 'one')
+        hashing._submit(hashing._hash, 'two')
+
+        with self.assertRaises(ServiceUnavailableException):
+            hashing._submit(hashing._hash, 'three')
+
+        self.assertEqual(self.executor.submit.call_count, 2)
+
+
+    def test_finishedJob_freesItsSlot(self):
+        first = hashing._submit(hashing._hash, 'one')
+        hashing._submit(hashing._hash, 'two')
+
+        first.set_result('hash')
+
+        self.assertIsInstance(hashing._submit(hashing._hash, 'three'), Future)
+
+
+    def test_failedSubmit_freesItsSlot(self):
+        self.executor.submit.side_effect = RuntimeError('pool is shut down')
+
+        for _ in range(3):
+            with self.assertRaises(RuntimeError):
+                hashing._submit(hashing._hash, 'one')
+
+
+class TestNeedsRehash(unittest.TestCase):
+
+    @patch('common.hashing.BCRYPT_ROUNDS', 12)
+    def test_needs_rehash(self):
+        self.assertTrue(hashing.needs_rehash('$2b$10$' + 'a' * 53))
+        self.assertFalse(hashing.needs_rehash('$2b$12$' + 'a' * 53))
+        self.assertFalse(hashing.needs_rehash('$argon2id$v=19$m=65536,t=3,p=4$hash'))
+        self.assertFalse(hashing.needs_rehash(None))
@@ -0,0 +1,135 @@
+import io
+import json
+import socket
+import tempfile
+import threading
+import unittest
+from common import query_cache
+from common.broadcast import UnixBroadcast
+from common.invalidation_bus import InvalidationBus
+from common.resp import RespClient, RespError, encode_command, read_reply
+
+
+class LoopbackTransport:
+    """
+    Hands every sent message to the receivers of all buses sharing it, the sender included.
+    """
+
+    def __init__(self):
+        self.receivers = []
+
+    def start(self, on_message):
+        self.receivers.append(on_message)
+
+    def send(self, data: bytes):
+        for receiver in self.receivers:
+            receiver(data)
+
+    def stop(self):
+        pass
+
+
+class TestResp(unittest.TestCase):
+
+    def test_encode_command_framesEveryArgumentAsBulkString(self):
+        self.assertEqual(encode_command('SET', 'key', b'\x00\r\n', 5),
+                         b'*4\r\n$3\r\nSET\r\n$3\r\nkey\r\n$3\r\n\x00\r\n\r\n$1\r\n5\r\n')
+
+
+    def test_read_reply_parsesEachType(self):
+        replies = io.BytesIO(b'+OK\r\n:42\r\n$5\r\nhe\r\nl\r\n$-1\r\n*2\r\n$1\r\na\r\n*1\r\n:1\r\n*-1\r\n')
+
+        self.assertEqual([read_reply(replies) for _ in range(6)], ['OK', 42, b'he\r\nl', None, [b'a', [1]], None])
+
+
+    def test_read_reply_raisesServerErrors(self):
+        with self.assertRaises(RespError):
+            read_reply(io.BytesIO(b'-ERR unknown command\r\n'))
+
+        with self.assertRaises(ConnectionError):
+            read_reply(io.BytesIO(b''))
+
+
+    def test_execute_roundTrip(self):
+        server = socket.create_server(('127.0.0.1', 0))
+        self.addCleanup(server.close)
+
+        def echo():
+            conn, _ = server.accept()
+            with conn, conn.makefile('rb') as file:
+                for _ in range(2):
+                    conn.sendall(encode_command(*read_reply(file)))
+
+        threading.Thread(target=echo, daemon=True).start()
+        client = RespClient(f'redis://127.0.0.1:{server.getsockname()[1]}/0')
+        self.addCleanup(client.close)
+
+        self.assertEqual(client.execute('ECHO', 'hello'), [b'ECHO', b'hello'])
+        self.assertEqual(client.execute('SET', 'key', b'\x00\xff'), [b'SET', b'key', b'\x00\xff'])
+
+
+class TestInvalidationBus(unittest.TestCase):
+
+    def setUp(self):
+        transport = LoopbackTransport()
+        self.publisher = InvalidationBus(transport)
+        self.receiver = InvalidationBus(transport)
+        self.publisher.start()
+        self.receiver.start()
+
+
+    def test_publish_runsHandlersOfOtherWorkersOnly(self):
+        published, received = [], []
+        self.publisher.subscribe(published.append)
+        self.receiver.subscribe(received.append)
+
+        self.publisher.publish(('users:1', 'topics'))
+
+        self.assertEqual(received, [['users:1', 'topics']])
+        self.assertEqual(published, [])
+        self.assertEqual((self.publisher.published, self.receiver.received), (1, 1))
+
+
+    def test_received_tags_dropCachedEntries_andRunOnInvalidateCallbacks(self):
+        tags = []
+        query_cache.on_invalidate(tags.append)
+        self.addCleanup(query_cache._listeners.remove, tags.append)
+        self.receiver.subscribe(query_cache._invalidate_local)
+        query_cache.query_cache.put('bus user 1', 'john', ('users:1',), query_cache.query_cache.generation(('users:1',)))
+
+        self.publisher.publish(['users:1'])
+
+        self.assertEqual(query_cache.query_cache.get('bus user 1'), (False, None))
+        self.assertEqual(tags, [['users:1']])
+
+
+    def test_gapInSequence_runsLostHandlers_andFlushesTheCache(self):
+        lost, tags = [], []
+        self.receiver.on_lost(lambda: lost.append(True))
+        self.receiver.on_lost(query_cache._flush_local)
+        query_cache.on_invalidate(tags.append)
+        self.addCleanup(query_cache._listeners.remove, tags.append)
+        query_cache.query_cache.put('bus user 2', 'adam', ('users:2',), query_cache.query_cache.generation(('users:2',)))
+
+        for sequence in (1, 2, 4):
+            self.receiver._receive(json.dumps({'origin': 'other', 'sequence': sequence, 'tags': ['topics:1']}).encode())
+
+        self.assertEqual(lost, [True])
+        self.assertEqual(self.receiver.lost, 1)
+        self.assertIn(None, tags)
+        self.assertEqual(query_cache.query_cache.get('bus user 2'), (False, None))
+
+
+    def test_unix_transport_deliversToOtherWorkers(self):
+        directory = tempfile.mkdtemp()
+        publisher, receiver = InvalidationBus(UnixBroadcast(directory)), InvalidationBus(UnixBroadcast(directory))
+        delivered = threading.Event()
+        receiver.subscribe(lambda tags: delivered.set())
+
+        for bus in (publisher, receiver):
+            bus.start()
+            self.addCleanup(bus.stop)
+
+        publisher.publish(['categories:1'])
+
+        self.assertTrue(delivered.wait(2))
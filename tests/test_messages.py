@@ -0,0 +1,77 @@
+from datetime import datetime
+from unittest import TestCase
+from unittest.mock import patch
+from services import messages_services
+
+
+class TestMessagesServices(TestCase):
+
+    def test_conversation_key_isSameForBothDirections(self):
+        self.assertEqual(messages_services.conversation_key(1, 2), messages_services.conversation_key(2, 1))
+        self.assertNotEqual(messages_services.conversation_key(1, 2), messages_services.conversation_key(1, 3))
+
+    @patch('services.messages_services.read_query')
+    def test_get_conversation_returnsPageOldestFirst(self, mock_read_query):
+        mock_read_query.return_value = [(12, 'newer', 2, 1), (11, 'older', 1, 2)]
+
+        messages = messages_services.get_conversation(1, 2, limit=2)
+
+        self.assertEqual([message.message_id for message in messages], [11, 12])
+        sql, params = mock_read_query.call_args[0]
+        self.assertNotIn('message_id < ?', sql)
+        self.assertEqual(params, (messages_services.conversation_key(1, 2), 2))
+
+    @patch('services.messages_services.read_query')
+    def test_get_conversation_usesCursor_whenBeforeMessageIdGiven(self, mock_read_query):
+        mock_read_query.return_value = []
+
+        self.assertEqual(messages_services.get_conversation(2, 1, before_message_id=11, limit=20), [])
+
+        sql, params = mock_read_query.call_args[0]
+        self.assertIn('message_id < ?', sql)
+        self.assertEqual(params, (messages_services.conversation_key(1, 2), 11, 20))
+
+    def test_conversation_updates_countsUnreadForReceiverOnly(self):
+        updates = messages_services.conversation_updates([('hi', 1, 2), ('how are you', 1, 2), ('fine', 2, 1)])
+        by_user = {(user_id, other_user_id): (last_sender_id, preview, unread)
+                   for user_id, other_user_id, _, last_sender_id, preview, unread in updates}
+
+        self.assertEqual(by_user[(1, 2)], (2, 'fine', 1))
+        self.assertEqual(by_user[(2, 1)], (2, 'fine', 2))
+
+    def test_conversation_updates_messageToSelf_isNotUnread(self):
+        updates = messages_services.conversation_updates([('note to self', 1, 1)])
+
+        self.assertEqual([(user_id, other_user_id, unread) for user_id, other_user_id, _, _, _, unread in updates], [(1, 1, 0)])
+
+    @patch('services.messages_services.transaction')
+    def test_create_message_returnsNewMessageId(self, mock_transaction):
+        cursor = mock_transaction.return_value.__enter__.return_value
+        cursor.lastrowid = 42
+
+        self.assertEqual(messages_services.create_message('hi', 1, 2), 42)
+        self.assertIn('INSERT INTO messages', cursor.execute.call_args[0][0])
+        self.assertEqual(len(cursor.executemany.call_args[0][1]), 2)
+
+    def test_conversation_updates_truncatesPreview(self):
+        (*_, preview, _), _ = messages_services.conversation_updates([('x' * 500, 1, 2)])
+        self.assertEqual(len(preview), messages_services.PREVIEW_LENGTH)
+
+    @patch('services.messages_services.update_many_in_transaction')
+    def test_insert_messages_writesMessagesAndInboxTogether(self, mock_transaction):
+        self.assertEqual(messages_services.insert_messages([('hi', 1, 2)]), 1)
+
+        (messages_sql, messages_rows), (inbox_sql, inbox_rows) = mock_transaction.call_args[0][0]
+        self.assertIn('INSERT INTO messages', messages_sql)
+        self.assertEqual(messages_rows, [('hi', 1, 2)])
+        self.assertIn('INSERT INTO conversations', inbox_sql)
+        self.assertEqual(len(inbox_rows), 2)
+
+    @patch('services.messages_services.read_query')
+    def test_get_all_conversations_returnsSummaries(self, mock_read_query):
+        mock_read_query.return_value = [(2, 'adam', 12, 2, 'see you', datetime(2024, 10, 28, 10, 30), 3)]
+
+        inbox = messages_services.get_all_conversations(1)
+
+        self.assertEqual(inbox[0].username, 'adam')
+        self.assertEqual(inbox[0].unread_count, 3)
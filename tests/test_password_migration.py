@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from common import password_migration
+
+
+HASHED = '$2b$12$' + 'a' * 53
+
+
+class TestPasswordMigration(unittest.TestCase):
+
+    def setUp(self):
+        self.checkpoint = os.path.join(tempfile.mkdtemp(), 'migration.checkpoint')
+        self.users = [(1, HASHED), (2, 'plain2'), (3, 'plain3'), (4, HASHED), (5, 'plain5')]
+
+        for patcher in (patch('common.password_migration.ProcessPoolExecutor', ThreadPoolExecutor),
+                        patch('common.password_migration._hash', side_effect=lambda password: f'hashed-{password}'),
+                        patch('common.password_migration.read_query', side_effect=self.read_users)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        update_patcher = patch('common.password_migration.update_many')
+        self.update_many = update_patcher.start()
+        self.addCleanup(update_patcher.stop)
+
+        invalidate_patcher = patch('common.password_migration.invalidate')
+        self.invalidate = invalidate_patcher.start()
+        self.addCleanup(invalidate_patcher.stop)
+
+
+    def read_users(self, sql, params):
+        last_user_id, limit = params
+        return [row for row in self.users if row[0] > last_user_id][:limit]
+
+
+    def test_migrate_updatesEachBatch_withOneStatement(self):
+        migrated = password_migration.migrate_passwords(batch_size=3, workers=1, checkpoint=self.checkpoint)
+
+        self.assertEqual(migrated, 3)
+        self.assertEqual(self.update_many.call_count, 2)
+        self.assertEqual(self.update_many.call_args_list[0][0],
+                         ('UPDATE users SET password = ? WHERE user_id = ?', [('hashed-plain2', 2), ('hashed-plain3', 3)]))
+        self.invalidate.assert_any_call('users:2', 'users:3')
+        self.invalidate.assert_any_call('users:5')
+
+
+    def test_migrate_resumesAfterCheckpoint(self):
+        password_migration.save_checkpoint(self.checkpoint, 3, 2)
+
+        migrated = password_migration.migrate_passwords(batch_size=3, workers=1, checkpoint=self.checkpoint)
+
+        self.assertEqual(migrated, 1)
+        self.update_many.assert_called_once_with('UPDATE users SET password = ? WHERE user_id = ?', [('hashed-plain5', 5)])
+        self.assertEqual(password_migration.load_checkpoint(self.checkpoint), 5)
+
+
+    def test_migrate_restart_ignoresCheckpoint(self):
+        password_migration.save_checkpoint(self.checkpoint, 5, 3)
+
+        migrated = password_migration.migrate_passwords(batch_size=3, workers=1, checkpoint=self.checkpoint, restart=True)
+
+        self.assertEqual(migrated, 3)
@@ -0,0 +1,100 @@
+import asyncio
+import json
+import time
+import unittest
+from common.broadcast import NullBroadcast
+from common.connections import ConnectionManager
+from common.presence import PresenceRegistry
+from tests.fakes import FakeWebSocket
+
+
+class RecordingBroadcast(NullBroadcast):
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, data: bytes):
+        self.sent.append(json.loads(data))
+
+
+class TestPresenceRegistry(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.connections = ConnectionManager()
+        self.transport = RecordingBroadcast()
+        self.presence = PresenceRegistry(self.connections, self.transport, ttl_seconds=30, interval_seconds=10)
+        self.changes = []
+        self.presence.subscribe(lambda online, offline: self.changes.append((online, offline)))
+        self.presence.start()
+
+
+    async def asyncTearDown(self):
+        self.presence.stop()
+
+
+    async def test_connected_user_isOnline_untilDisconnected(self):
+        websocket = FakeWebSocket()
+        await self.connections.connect(websocket, 1)
+        self.presence.tick()
+
+        self.assertEqual(self.presence.is_online([1, 2]), {1})
+
+        await self.connections.disconnect(websocket)
+        self.presence.tick()
+
+        self.assertEqual(self.presence.is_online([1, 2]), set())
+        self.assertEqual(self.changes, [({1}, set()), (set(), {1})])
+
+
+    async def test_changes_areCoalescedIntoOneUpdatePerTick(self):
+        websockets = [FakeWebSocket() for _ in range(3)]
+        for user_id, websocket in enumerate(websockets, start=1):
+            await self.connections.connect(websocket, user_id)
+        await self.connections.disconnect(websockets[2])
+
+        self.presence.tick()
+        self.presence.tick()
+
+        self.assertEqual(self.changes, [({1, 2}, set())])
+
+        for websocket in websockets[:2]:
+            await self.connections.disconnect(websocket)
+
+
+    async def test_silent_socket_expiresAfterTtl(self):
+        websocket = FakeWebSocket()
+        connection = await self.connections.connect(websocket, 1)
+        connection.last_seen = time.monotonic() - 31
+        self.presence.tick()
+
+        self.assertEqual(self.presence.is_online([1]), set())
+
+        self.connections.touch(websocket)
+        self.presence.tick()
+
+        self.assertEqual(self.presence.is_online([1]), {1})
+        await self.connections.disconnect(websocket)
+
+
+    async def test_other_workers_users_expireUnlessReannounced(self):
+        self.presence._apply({'origin': 'other', 'online': [7, 8], 'offline': []})
+        self.presence.tick()
+        self.assertEqual(self.presence.is_online([7, 8, 9]), {7, 8})
+
+        self.presence._apply({'origin': 'other', 'online': [], 'offline': [8]})
+        self.presence._remote['other'][7] = time.monotonic() - 1
+        self.presence.tick()
+
+        self.assertEqual(self.presence.is_online([7, 8]), set())
+
+
+    async def test_local_changes_areAnnounced(self):
+        websocket = FakeWebSocket()
+        await self.connections.connect(websocket, 3)
+        self.presence.tick()
+        await self.connections.disconnect(websocket)
+        self.presence.tick()
+        await asyncio.sleep(0.01)
+
+        self.assertEqual([(message['online'], message['offline']) for message in self.transport.sent],
+                         [([3], []), ([], [3])])
@@ -0,0 +1,69 @@
+import time
+import unittest
+from unittest.mock import patch
+from common.query_cache import QueryCache
+
+
+class TestQueryCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = QueryCache(max_entries=2, max_bytes=1024 * 1024, ttl_seconds=30)
+
+
+    def put(self, key, value, *tags):
+        self.cache.put(key, value, tags, self.cache.generation(tags))
+
+
+    def test_get_returns_cached_value(self):
+        self.put('reply 1', 'text', 'replies:1')
+        self.assertEqual(self.cache.get('reply 1'), (True, 'text'))
+        self.assertEqual(self.cache.get('reply 2'), (False, None))
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+
+    def test_row_invalidation_drops_row_and_table_tagged_entries(self):
+        self.put('reply 1', 'text', 'replies:1')
+        self.put('topic 1', 'topic', 'topics:1', 'replies')
+        self.cache.invalidate('replies:1')
+        self.assertEqual(self.cache.stats()['entries'], 0)
+
+
+    def test_table_invalidation_drops_all_rows(self):
+        self.put('reply 1', 'text', 'replies:1')
+        self.put('reply 2', 'text', 'replies:2')
+        self.cache.invalidate('replies')
+        self.assertEqual(self.cache.stats()['entries'], 0)
+
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.put('reply 1', 'one', 'replies:1')
+        self.put('reply 2', 'two', 'replies:2')
+        self.cache.get('reply 1')
+        self.put('reply 3', 'three', 'replies:3')
+        self.assertEqual(self.cache.get('reply 2'), (False, None))
+        self.assertEqual(self.cache.get('reply 1'), (True, 'one'))
+
+
+    def test_read_racing_a_write_is_not_stored(self):
+        generation = self.cache.generation(('replies:1',))
+        self.cache.invalidate('replies:1')
+        self.cache.put('reply 1', 'stale', ('replies:1',), generation)
+        self.assertEqual(self.cache.get('reply 1'), (False, None))
+
+
+    def test_entry_expires_after_ttl(self):
+        self.put('reply 1', 'text', 'replies:1')
+
+        with patch('common.query_cache.time.monotonic', return_value=time.monotonic() + 31):
+            self.assertEqual(self.cache.get('reply 1'), (False, None))
+
+        self.assertEqual(self.cache.stats()['expirations'], 1)
+        self.assertEqual(self.cache.stats()['entries'], 0)
+
+
+    def test_zero_ttl_disables_expiry(self):
+        cache = QueryCache(max_entries=2, max_bytes=1024 * 1024, ttl_seconds=0)
+        cache.put('reply 1', 'text', ('replies:1',), cache.generation(('replies:1',)))
+
+        with patch('common.query_cache.time.monotonic', return_value=time.monotonic() + 10 ** 6):
+            self.assertEqual(cache.get('reply 1'), (True, 'text'))
@@ -49,10 +49,10 @@ class TestReplyServices(TestCase):
            replies_services.create(self.testreply1, self.testuser1)
 
     @patch('services.replies_services.read_query')
-    @patch('services.replies_services.insert_query')
-    def testCreate_ReturnsReply(self, mock_insert_query, mock_read_query):
+    @patch('services.replies_services.transaction')
+    def testCreate_ReturnsReply(self, mock_transaction, mock_read_query):
         mock_read_query.return_value = [(1,)]
-        mock_insert_query.return_value = 1
+        mock_transaction.return_value.__enter__.return_value.lastrowid = 1
         reply_instance = Reply(text='This is another reply', user_id=10, topic_id=1, created=DATE, edited=False)
         result = replies_services.create(reply=reply_instance, current_user=self.testuser1)
         expected = Reply(id=1, text='This is another reply', user_id=1, topic_id=1, created=DATE, edited=False)
@@ -74,9 +74,11 @@ class TestReplyServices(TestCase):
 
     @patch('services.replies_services.exists')
     @patch('services.replies_services.read_query')
-    def testEditText_ReturnsReply(self, mock_read_query, mock_exists):
+    @patch('services.replies_services.transaction')
+    def testEditText_ReturnsReply(self, mock_transaction, mock_read_query, mock_exists):
         mock_exists.return_value = True
         mock_read_query.return_value = [('john',)]
+        mock_transaction.return_value.__enter__.return_value.rowcount = 1
         reply_instance = Reply(text='New Text', user_id=1, topic_id=1, created=DATE, edited=False)
         result = replies_services.edit_text(self.testreply1, reply_instance, self.testuser1)
         expected = ReplyResponse(id=1, text='New Text')
@@ -110,21 +112,21 @@ class TestReplyServices(TestCase):
 
     @patch('services.replies_services.exists')
     @patch('services.replies_services.read_query')
-    @patch('services.replies_services.update_query')
-    def testDelete_ReturnsDeleted(self, mock_update_query, mock_read_query, mock_exists):
+    @patch('services.replies_services.transaction')
+    def testDelete_ReturnsDeleted(self, mock_transaction, mock_read_query, mock_exists):
         mock_exists.return_value = True
         mock_read_query.return_value = [('john',)]
-        mock_update_query.return_value = 1
+        mock_transaction.return_value.__enter__.return_value.rowcount = 1
         result = replies_services.delete(1, self.testuser1)
         self.assertEqual(result, 'reply deleted')
 
     @patch('services.replies_services.exists')
     @patch('services.replies_services.read_query')
-    @patch('services.replies_services.update_query')
-    def testDelete_Admin_ReturnsDeleted(self, mock_update_query, mock_read_query, mock_exists):
+    @patch('services.replies_services.transaction')
+    def testDelete_Admin_ReturnsDeleted(self, mock_transaction, mock_read_query, mock_exists):
         mock_exists.return_value = True
         mock_read_query.return_value = [('john',)]
-        mock_update_query.return_value = 1
+        mock_transaction.return_value.__enter__.return_value.rowcount = 1
         result = replies_services.delete(1, self.testadmin1)
         self.assertEqual(result, 'reply deleted')
 
@@ -132,4 +134,44 @@ class TestReplyServices(TestCase):
     def testFetchText_ReturnsText(self, mock_read_query):
         mock_read_query.return_value = [('This is a reply',)]
         result = replies_services.fetch_text(1)
-        self.assertEqual(result, 'This is a reply')
\ No newline at end of file
+        self.assertEqual(result, 'This is a reply')
+
+    @patch('services.replies_services.read_query')
+    @patch('services.replies_services.transaction')
+    def testCreate_UpdatesTopicAndCategoryCountersInSameTransaction(self, mock_transaction, mock_read_query):
+        mock_read_query.return_value = [(1,)]
+        cursor = mock_transaction.return_value.__enter__.return_value
+        cursor.lastrowid = 7
+        replies_services.create(Reply(text='Another reply', user_id=1, topic_id=3), self.testuser1)
+        (insert_sql, _), (topic_sql, topic_params), (category_sql, category_params) = [call.args for call in cursor.execute.call_args_list]
+        self.assertIn('INSERT INTO replies', insert_sql)
+        self.assertIn('reply_count = reply_count + 1', topic_sql)
+        self.assertEqual(topic_params, (7, 3))
+        self.assertIn('UPDATE categories', category_sql)
+        self.assertEqual(category_params, (3,))
+
+    @patch('services.replies_services.exists')
+    @patch('services.replies_services.read_query')
+    @patch('services.replies_services.transaction')
+    def testDelete_NothingDeleted_LeavesCountersAlone(self, mock_transaction, mock_read_query, mock_exists):
+        mock_exists.return_value = True
+        mock_read_query.return_value = [('john',)]
+        cursor = mock_transaction.return_value.__enter__.return_value
+        cursor.rowcount = 0
+        self.assertIsNone(replies_services.delete(1, self.testuser1))
+        self.assertEqual(cursor.execute.call_count, 1)
+
+    @patch('services.replies_services.topic_of')
+    @patch('services.replies_services.exists')
+    @patch('services.replies_services.read_query')
+    @patch('services.replies_services.transaction')
+    def testDelete_RecomputesTopicActivityInSameTransaction(self, mock_transaction, mock_read_query, mock_exists, mock_topic_of):
+        mock_exists.return_value = True
+        mock_read_query.return_value = [('john',)]
+        mock_topic_of.return_value = 3
+        cursor = mock_transaction.return_value.__enter__.return_value
+        cursor.rowcount = 1
+        replies_services.delete(1, self.testuser1)
+        _, (topic_sql, topic_params), _ = [call.args for call in cursor.execute.call_args_list]
+        self.assertIn('last_activity_at = COALESCE((SELECT MAX(r.created) FROM replies r WHERE r.topic_id = ?)', topic_sql)
+        self.assertEqual(topic_params, (3, 3, 3))
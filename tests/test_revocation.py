@@ -0,0 +1,86 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+from common.exceptions import ServiceUnavailableException
+from common.revocation import BloomFilter, MemoryRevocationBackend, RevocationStore, SqliteRevocationBackend
+
+
+class TestRevocationStore(unittest.TestCase):
+
+    def test_bloom_filter_contains_added_digest(self):
+        bloom = BloomFilter()
+        digest = RevocationStore.digest('token')
+        bloom.add(digest)
+        self.assertIn(digest, bloom)
+        self.assertNotIn(RevocationStore.digest('other_token'), bloom)
+
+
+    def test_add_marks_token_revoked(self):
+        store = RevocationStore(MemoryRevocationBackend(), default_ttl=60)
+        store.add('token')
+        self.assertIn('token', store)
+        self.assertNotIn('other_token', store)
+
+
+    def test_expired_token_is_forgotten(self):
+        backend = MemoryRevocationBackend()
+        store = RevocationStore(backend, default_ttl=60, sync_seconds=0)
+        store.add('token', expires_at=time.time() - 1)
+        self.assertNotIn('token', store)
+        self.assertEqual(backend.entries, {})
+
+
+    def test_empty_token_is_ignored(self):
+        store = RevocationStore(MemoryRevocationBackend(), default_ttl=60)
+        store.add(None)
+        self.assertNotIn(None, store)
+
+
+    def test_sqlite_backend_shared_between_stores(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'revoked.sqlite3')
+            first_worker = RevocationStore(SqliteRevocationBackend(path), default_ttl=60, sync_seconds=0)
+            second_worker = RevocationStore(SqliteRevocationBackend(path), default_ttl=60, sync_seconds=0)
+
+            first_worker.add('token')
+
+            self.assertIn('token', second_worker)
+
+
+    def test_started_store_syncs_in_background_not_on_lookup(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'revoked.sqlite3')
+            first_worker = RevocationStore(SqliteRevocationBackend(path), default_ttl=60, sync_seconds=0.01)
+            second_worker = RevocationStore(SqliteRevocationBackend(path), default_ttl=60, sync_seconds=0.01)
+            second_worker.start()
+            self.addCleanup(second_worker.stop)
+
+            first_worker.add('token')
+            deadline = time.time() + 2
+            while 'token' not in second_worker and time.time() < deadline:
+                time.sleep(0.01)
+
+            self.assertIn('token', second_worker)
+            with patch.object(second_worker, 'sync') as sync:
+                self.assertNotIn('other_token', second_worker)
+            sync.assert_not_called()
+
+
+    def test_backend_error_fails_closed(self):
+        backend = MemoryRevocationBackend()
+        store = RevocationStore(backend, default_ttl=60)
+        store.add('token')
+
+        with patch.object(backend, 'contains', side_effect=ConnectionError('Connection closed by server')):
+            with self.assertRaises(ServiceUnavailableException):
+                'token' in store
+
+
+    def test_sqlite_backend_creates_its_directory(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'data', 'revoked.sqlite3')
+            RevocationStore(SqliteRevocationBackend(path), default_ttl=60).add('token')
+
+            self.assertTrue(os.path.exists(path))
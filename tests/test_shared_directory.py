@@ -0,0 +1,55 @@
+import mmap
+import os
+import tempfile
+import unittest
+from common.shared_directory import CategoryInfo, DirectoryView, UserDisplay, encode
+
+
+USERS = [
+    (3, 'speedy', 'Speedy Gonzales'),
+    (1, 'admin', 'admin'),
+    (2, 'carlover', 'Car Lover'),
+]
+CATEGORIES = [
+    (6, 'Club Meetings', 0, 1),
+    (1, 'Uncategorized', 0, 0),
+]
+
+
+class TestSharedDirectory(unittest.TestCase):
+
+    def setUp(self):
+        self.view = DirectoryView(encode(USERS, CATEGORIES))
+
+
+    def test_user_lookup_by_id(self):
+        self.assertEqual(self.view.user(3), UserDisplay(3, 'speedy', 'Speedy Gonzales'))
+        self.assertIsNone(self.view.user(4))
+
+
+    def test_user_id_lookup_by_username(self):
+        self.assertEqual(self.view.user_id('carlover'), 2)
+        self.assertIsNone(self.view.user_id('nobody'))
+
+
+    def test_category_lookup(self):
+        self.assertEqual(self.view.category(6), CategoryInfo(6, 'Club Meetings', False, True))
+        self.assertIsNone(self.view.category(2))
+
+
+    def test_reads_from_memory_mapped_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'directory.bin')
+            with open(path, 'wb') as file:
+                file.write(encode(USERS, CATEGORIES))
+
+            with open(path, 'rb') as file:
+                view = DirectoryView(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+            self.assertEqual(view.user(1).username, 'admin')
+
+
+    def test_empty_directory(self):
+        view = DirectoryView(encode([], []))
+        self.assertIsNone(view.user(1))
+        self.assertIsNone(view.user_id('admin'))
@@ -0,0 +1,66 @@
+import asyncio
+import threading
+import time
+import unittest
+from common.single_flight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_concurrent_calls_share_one_execution(self):
+        group = SingleFlight()
+        executions = []
+
+        def slow_read(topic_id):
+            executions.append(topic_id)
+            time.sleep(0.1)
+            return f'topic {topic_id}'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(group.do(('topic', 1), slow_read, 1))) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(executions, [1])
+        self.assertEqual(results, ['topic 1'] * 10)
+        self.assertEqual(group.stats()['coalesced'], 9)
+
+
+    def test_sequential_calls_execute_again(self):
+        group = SingleFlight()
+        group.do('key', lambda: 1)
+        group.do('key', lambda: 1)
+
+        self.assertEqual(group.stats()['executions'], 2)
+
+
+    def test_exception_is_raised_for_every_caller(self):
+        group = SingleFlight()
+
+        def failing_read():
+            raise ValueError('db down')
+
+        with self.assertRaises(ValueError):
+            group.do('key', failing_read)
+
+        self.assertEqual(group.stats()['in_flight'], 0)
+
+
+    def test_async_callers_share_one_execution(self):
+        group = SingleFlight()
+        executions = []
+
+        def slow_read():
+            executions.append(1)
+            time.sleep(0.1)
+            return 'replies'
+
+        async def run():
+            return await asyncio.gather(*(group.do_async('key', slow_read) for _ in range(5)))
+
+        results = asyncio.run(run())
+
+        self.assertEqual(results, ['replies'] * 5)
+        self.assertEqual(len(executions), 1)
@@ -0,0 +1,40 @@
+import os
+import tempfile
+import unittest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from common.template_config import CustomJinja2Templates
+
+
+class TestStreamingTemplateResponse(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.directory.name, 'thread.html'), 'w') as file:
+            file.write('<h1>{{ title }}</h1>{% for reply in replies %}<p>{{ reply }}</p>{% endfor %}')
+
+        self.templates = CustomJinja2Templates(directory=self.directory.name)
+
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+
+    def test_chunks_groupsPartsUpToChunkSize(self):
+        chunks = list(CustomJinja2Templates._chunks(iter(['ab', 'cd', 'ef', 'g']), chunk_size=4))
+        self.assertEqual(chunks, ['abcd', 'efg'])
+
+
+    def test_streaming_response_rendersWholeTemplate(self):
+        app = FastAPI()
+
+        @app.get('/thread')
+        def thread(request: Request):
+            return self.templates.StreamingTemplateResponse(
+                request, name='thread.html', context={'title': 'Engines', 'replies': range(500)}, chunk_size=64)
+
+        response = TestClient(app).get('/thread')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers['content-type'].startswith('text/html'))
+        self.assertEqual(response.text, '<h1>Engines</h1>' + ''.join(f'<p>{i}</p>' for i in range(500)))
@@ -0,0 +1,57 @@
+import time
+import unittest
+from common import auth
+from common.revocation import MemoryRevocationBackend, RevocationStore
+from common.token_cache import VerifiedTokenCache
+
+
+class TestVerifiedTokenCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = VerifiedTokenCache(max_size=2)
+
+
+    def test_put_beyondMaxSize_evictsLeastRecentlyUsed(self):
+        self.cache.put(b'a', {'sub': 'a'})
+        self.cache.put(b'b', {'sub': 'b'})
+        self.cache.get(b'a')
+        self.cache.put(b'c', {'sub': 'c'})
+
+        self.assertIsNone(self.cache.get(b'b'))
+        self.assertEqual(self.cache.get(b'a'), {'sub': 'a'})
+        self.assertEqual(self.cache.get(b'c'), {'sub': 'c'})
+
+
+    def test_get_expiredPayload_isDropped(self):
+        self.cache.put(b'a', {'sub': 'a', 'exp': time.time() - 1})
+
+        self.assertIsNone(self.cache.get(b'a'))
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+
+    def test_zeroMaxSize_cachesNothing(self):
+        cache = VerifiedTokenCache(max_size=0)
+        cache.put(b'a', {'sub': 'a'})
+
+        self.assertIsNone(cache.get(b'a'))
+
+
+    def test_revoke_purgesTheCachedPayload(self):
+        store = RevocationStore(MemoryRevocationBackend(), default_ttl=60, sync_seconds=60)
+        store.on_revoke(self.cache.discard)
+        self.cache.put(store.digest('token'), {'sub': 'a'})
+
+        store.add('token')
+
+        self.assertIsNone(self.cache.get(store.digest('token')))
+
+
+    def test_verify_token_revokedAfterCaching_isRejected(self):
+        token = auth.create_access_token({'sub': 'cached-user'})
+        auth.verify_token(token)
+
+        auth.token_blacklist.add(token)
+
+        self.assertIsNone(auth.verified_token_cache.get(auth.token_blacklist.digest(token)))
+        with self.assertRaises(auth.ForbiddenException):
+            auth.verify_token(token)
@@ -0,0 +1,94 @@
+import unittest
+from datetime import timedelta
+from unittest.mock import patch
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from common import auth
+from common.middleware import TokenRefreshMiddleware
+from test_models import mock_user
+
+
+def create_app():
+    app = FastAPI()
+    app.add_middleware(TokenRefreshMiddleware)
+
+    @app.get('/page')
+    def page(request: Request):
+        return {'token': request.cookies.get('token')}
+
+    return app
+
+
+class TestRefreshTokenRotation(unittest.TestCase):
+
+    def setUp(self):
+        self.user = mock_user(1, 'john', '12345', 'john@email.com', 'john', 'smith', None, False, False)
+
+        get_user_patcher = patch('common.auth.get_user', return_value=self.user)
+        get_user_patcher.start()
+        self.addCleanup(get_user_patcher.stop)
+
+        _, self.refresh_token = auth.create_token_pair(self.user.username, False, self.user.id)
+
+
+    def test_rotate_returnsNewPair_andRevokesTheOldToken(self):
+        access_token, refresh_token = auth.rotate_refresh_token(self.refresh_token)
+
+        self.assertEqual(auth.verify_token(access_token)['sub'], 'john')
+        self.assertNotEqual(refresh_token, self.refresh_token)
+        self.assertIn(self.refresh_token, auth.token_blacklist)
+
+
+    def test_rotate_withinGraceWindow_returnsTheSamePair(self):
+        first = auth.rotate_refresh_token(self.refresh_token)
+
+        self.assertEqual(auth.rotate_refresh_token(self.refresh_token), first)
+
+
+    def test_rotate_reusedAfterGraceWindow_returnsNone(self):
+        with patch('common.auth.REFRESH_ROTATION_GRACE_SECONDS', 0):
+            self.assertIsNotNone(auth.rotate_refresh_token(self.refresh_token))
+
+            self.assertIsNone(auth.rotate_refresh_token(self.refresh_token))
+
+
+    def test_rotate_withAccessToken_returnsNone(self):
+        access_token = auth.create_access_token({'sub': 'john', 'is_admin': False, 'id': 1})
+
+        self.assertIsNone(auth.rotate_refresh_token(access_token))
+
+
+class TestTokenRefreshMiddleware(unittest.TestCase):
+
+    def setUp(self):
+        self.client = TestClient(create_app())
+        self.user = mock_user(1, 'john', '12345', 'john@email.com', 'john', 'smith', None, False, False)
+
+        get_user_patcher = patch('common.auth.get_user', return_value=self.user)
+        get_user_patcher.start()
+        self.addCleanup(get_user_patcher.stop)
+
+
+    def test_expiredAccessToken_isRenewed_andCookiesRewritten(self):
+        data = {'sub': 'john', 'is_admin': False, 'id': 1}
+        expired = auth.create_access_token(data, expires_delta=timedelta(minutes=-1))
+        refresh_token = auth.create_refresh_token(data)
+        self.client.cookies.update({'token': expired, 'refresh_token': refresh_token})
+
+        response = self.client.get('/page')
+
+        new_token = response.json()['token']
+        self.assertNotEqual(new_token, expired)
+        self.assertEqual(auth.verify_token(new_token)['sub'], 'john')
+        self.assertEqual(response.cookies.get('token'), new_token)
+        self.assertNotEqual(response.cookies.get('refresh_token'), refresh_token)
+
+
+    def test_validAccessToken_isPassedThrough(self):
+        token, refresh_token = auth.create_token_pair('john', False, 1)
+        self.client.cookies.update({'token': token, 'refresh_token': refresh_token})
+
+        response = self.client.get('/page')
+
+        self.assertEqual(response.json()['token'], token)
+        self.assertNotIn('set-cookie', response.headers)
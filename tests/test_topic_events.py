@@ -0,0 +1,103 @@
+import asyncio
+import json
+import unittest
+from common.broadcast import NullBroadcast
+from common.topic_events import RESET, TopicEvents, format_event
+
+
+class TestTopicEvents(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.events = TopicEvents(NullBroadcast(), buffer_size=3, queue_size=2)
+        self.events.start()
+
+
+    async def asyncTearDown(self):
+        self.events.stop()
+
+
+    def test_format_event_writesIdTypeAndData(self):
+        event = {'id': 5, 'topic_id': 1, 'type': 'votes', 'data': {'reply_id': 2, 'votes': 3}}
+
+        self.assertEqual(format_event(event), 'id: 5\nevent: votes\ndata: {"reply_id": 2, "votes": 3}\n\n')
+        self.assertNotIn('id:', format_event(RESET))
+
+
+    async def test_published_event_reachesSubscribersOfThatTopicOnly(self):
+        subscription, missed = self.events.subscribe(1)
+        other, _ = self.events.subscribe(2)
+
+        self.events.publish(1, 'reply_deleted', {'reply_id': 9})
+        await asyncio.sleep(0)
+
+        self.assertEqual(missed, [])
+        self.assertEqual(subscription.queue.get_nowait()['data'], {'reply_id': 9})
+        self.assertTrue(other.queue.empty())
+
+
+    async def test_subscribe_withLastEventId_returnsOnlyNewerEvents(self):
+        cursor = self.events.cursor(1)
+        self.events.publish(1, 'votes', {'reply_id': 1, 'votes': 1})
+        self.events.publish(1, 'votes', {'reply_id': 1, 'votes': 2})
+
+        _, missed = self.events.subscribe(1, cursor)
+        _, since_first = self.events.subscribe(1, missed[0]['id'])
+
+        self.assertEqual([event['data']['votes'] for event in missed], [1, 2])
+        self.assertEqual([event['data']['votes'] for event in since_first], [2])
+
+
+    async def test_subscribe_returnsNone_whenEventsWereDroppedFromBuffer(self):
+        cursor = self.events.cursor(1)
+        for votes in range(5):
+            self.events.publish(1, 'votes', {'reply_id': 1, 'votes': votes})
+
+        _, missed = self.events.subscribe(1, cursor)
+
+        self.assertIsNone(missed)
+
+
+    async def test_slow_subscriber_getsReset(self):
+        subscription, _ = self.events.subscribe(1)
+        for votes in range(3):
+            self.events.publish(1, 'votes', {'reply_id': 1, 'votes': votes})
+        await asyncio.sleep(0)
+
+        self.assertIs(subscription.queue.get_nowait(), RESET)
+        self.assertTrue(subscription.queue.empty())
+
+
+    async def test_stream_sendsMissedThenLiveEvents(self):
+        cursor = self.events.cursor(1)
+        self.events.publish(1, 'reply_deleted', {'reply_id': 1})
+        subscription, missed = self.events.subscribe(1, cursor)
+        stream = self.events.stream(subscription, missed)
+
+        self.assertEqual(await anext(stream), 'retry: 3000\n\n')
+        self.assertIn('"reply_id": 1', await anext(stream))
+
+        self.events.publish(1, 'reply_deleted', {'reply_id': 2})
+        self.assertIn('"reply_id": 2', await anext(stream))
+
+        await stream.aclose()
+        self.assertEqual(self.events._topics[1].subscribers, set())
+
+
+    async def test_stream_endsWithReset_whenMissedEventsAreUnknown(self):
+        subscription, _ = self.events.subscribe(1)
+
+        chunks = [chunk async for chunk in self.events.stream(subscription, None)]
+
+        self.assertEqual(chunks[-1], format_event(RESET))
+
+
+    async def test_events_fromOtherWorkers_areBufferedAndDelivered(self):
+        subscription, _ = self.events.subscribe(1)
+        event = {'id': self.events.cursor(1) + 1, 'topic_id': 1, 'type': 'reply_edited',
+                 'data': {'reply_id': 4, 'text': 'edited'}}
+
+        self.events._receive(json.dumps({'origin': 'other', 'event': event}).encode())
+        await asyncio.sleep(0)
+
+        self.assertEqual(subscription.queue.get_nowait(), event)
+        self.assertEqual(self.events.received, 1)
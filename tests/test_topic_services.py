@@ -1,7 +1,9 @@
+from datetime import datetime
 from unittest import TestCase
 from unittest.mock import patch
 from data.models.topic import TopicResponse, TopicCreate
 from services import topics_services as topics
+from common.query_cache import query_cache
 
 
 #TOPIC
@@ -28,6 +30,9 @@ def create_topic(topic_id, topic_title=TITLE, author=AUTHOR):
 
   
 class TopicsServices_Should(TestCase):
+
+    def setUp(self):
+        query_cache.clear()
    
     def test_getById_returnsTopicResponseObject_whenExists(self):
         with patch('services.topics_services.read_query') as mock_read_query:
@@ -90,9 +95,76 @@ class TopicsServices_Should(TestCase):
             result = topics.update_best_reply_for_topic(TOPIC_ID, best_reply_id)
             
             mock_update_query.assert_called_once_with(
-                '''UPDATE topics SET best_reply_id = ? WHERE topic_id = ?''',
+                '''UPDATE topics SET best_reply_id = ?, version = version + 1 WHERE topic_id = ?''',
                 (best_reply_id, TOPIC_ID)
             )
             
             self.assertEqual(expected, result)
-            
\ No newline at end of file
+            
+
+
+    def reply_row(self, reply_id):
+        return (reply_id, f'reply {reply_id}', USER_ID, TOPIC_ID, datetime(2024, 11, 1, 12, 0, reply_id), False)
+
+    def test_fetchRepliesPage_firstPage_hasNextCursorOnly(self):
+        with patch('services.topics_services.read_query') as mock_read_query:
+            mock_read_query.return_value = [self.reply_row(i) for i in (1, 2, 3)]
+
+            page = topics.fetch_replies_page(TOPIC_ID, limit=2)
+
+            self.assertEqual([reply.id for reply in page['replies']], [1, 2])
+            self.assertIsNone(page['prev_cursor'])
+            self.assertEqual(page['next_cursor'], 2)
+            sql, params = mock_read_query.call_args[0]
+            self.assertIn('ORDER BY r.created ASC, r.reply_id ASC', sql)
+            self.assertEqual(params, (TOPIC_ID, 3))
+
+    def test_fetchRepliesPage_before_returnsOlderRepliesOldestFirst(self):
+        with patch('services.topics_services.read_query') as mock_read_query:
+            mock_read_query.return_value = [self.reply_row(i) for i in (4, 3)]
+
+            page = topics.fetch_replies_page(TOPIC_ID, before=5, limit=2)
+
+            self.assertEqual([reply.id for reply in page['replies']], [3, 4])
+            self.assertIsNone(page['prev_cursor'])
+            self.assertEqual(page['next_cursor'], 4)
+            sql, params = mock_read_query.call_args[0]
+            self.assertIn('r.reply_id < c.reply_id', sql)
+            self.assertEqual(params, (5, TOPIC_ID, 3))
+
+    def test_fetchRepliesPage_around_centersPageOnReply(self):
+        with patch('services.topics_services.read_query') as mock_read_query:
+            mock_read_query.side_effect = [
+                [self.reply_row(i) for i in (5, 6, 7)],
+                [self.reply_row(i) for i in (4, 3, 2)]
+            ]
+
+            page = topics.fetch_replies_page(TOPIC_ID, around=5, limit=4)
+
+            self.assertEqual([reply.id for reply in page['replies']], [3, 4, 5, 6])
+            self.assertEqual(page['prev_cursor'], 3)
+            self.assertEqual(page['next_cursor'], 6)
+            self.assertIn('r.reply_id >= c.reply_id', mock_read_query.call_args_list[0][0][0])
+
+    def test_deleteTopic_takesItsRepliesOffTheCategoryInSameTransaction(self):
+        with patch('services.topics_services.transaction') as mock_transaction:
+            cursor = mock_transaction.return_value.__enter__.return_value
+            cursor.fetchone.return_value = (CATEGORY_ID, 4)
+
+            self.assertEqual(topics.delete_topic(TOPIC_ID), f"Topic {TOPIC_ID} deleted successfully")
+
+            sql, params = cursor.execute.call_args[0]
+            self.assertIn('UPDATE categories SET topic_count', sql)
+            self.assertEqual(params, (4, CATEGORY_ID))
+            self.assertIn('FOR UPDATE', cursor.execute.call_args_list[0][0][0])
+
+    def test_topicVersion_readsTheVersionColumn_insteadOfScanningReplies(self):
+        with patch('services.topics_services.read_query') as mock_read_query:
+            mock_read_query.return_value = [(TITLE, 0, None, CATEGORY_ID, CATEGORY_NAME, 0, 0, None, 12)]
+
+            self.assertEqual(topics.topic_version(TOPIC_ID, USER_ID)[-1], 12)
+
+            sql, params = mock_read_query.call_args[0]
+            self.assertIn('t.version', sql)
+            self.assertNotIn('FROM replies', sql)
+            self.assertEqual(params, (USER_ID, TOPIC_ID))
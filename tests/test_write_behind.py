@@ -0,0 +1,134 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from common.write_behind import WriteBehindQueue
+
+
+class TestWriteBehindQueue(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.batches = []
+
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+
+    def write(self, rows):
+        self.batches.append(list(rows))
+
+
+    def journal_files(self):
+        return [name for name in os.listdir(self.directory.name) if name.endswith('.journal')]
+
+
+    async def test_rows_areWrittenInOneBatch(self):
+        queue = WriteBehindQueue(self.write, self.directory.name, batch_size=100, flush_seconds=0.01)
+        queue.start()
+
+        for i in range(5):
+            queue.put(('text', i, 2))
+        await asyncio.sleep(0.05)
+
+        self.assertEqual(self.batches, [[('text', i, 2) for i in range(5)]])
+        await queue.stop()
+        self.assertEqual(self.journal_files(), [])
+
+
+    async def test_full_batch_isFlushedBeforeInterval(self):
+        queue = WriteBehindQueue(self.write, self.directory.name, batch_size=2, flush_seconds=10)
+        queue.start()
+
+        queue.put(('a', 1, 2))
+        queue.put(('b', 1, 2))
+        await asyncio.sleep(0.05)
+
+        self.assertEqual(self.batches, [[('a', 1, 2), ('b', 1, 2)]])
+        await queue.stop()
+
+
+    async def test_stop_flushesPendingRows(self):
+        queue = WriteBehindQueue(self.write, self.directory.name, batch_size=100, flush_seconds=10)
+        queue.start()
+
+        queue.put(('last', 1, 2))
+        await queue.stop()
+
+        self.assertEqual(self.batches, [[('last', 1, 2)]])
+
+
+    async def test_failed_write_isKeptInJournal_andRecoveredOnNextStart(self):
+        def failing_write(rows):
+            raise ConnectionError('database is down')
+
+        queue = WriteBehindQueue(failing_write, self.directory.name, batch_size=100, flush_seconds=10)
+        queue.start()
+        queue.put(('kept', 1, 2))
+        await queue.stop()
+
+        self.assertEqual(len(self.journal_files()), 1)
+
+        recovered = WriteBehindQueue(self.write, self.directory.name, batch_size=100, flush_seconds=0.01)
+        recovered.start()
+        await asyncio.sleep(0.05)
+        await recovered.stop()
+
+        self.assertEqual(self.batches, [[('kept', 1, 2)]])
+        self.assertEqual(self.journal_files(), [])
+
+
+    async def test_poison_row_isDeadLettered_andRowsBehindItAreWritten(self):
+        def write(rows):
+            if any(text == 'poison' for text, _, _ in rows):
+                raise ValueError('receiver does not exist')
+            self.write(rows)
+
+        queue = WriteBehindQueue(write, self.directory.name, batch_size=100, flush_seconds=0.01, retry_seconds=0.01)
+        queue.start()
+        queue.put(('poison', 1, 999))
+        queue.put(('good', 1, 2))
+        await asyncio.sleep(0.05)
+        await queue.stop()
+
+        self.assertEqual(self.batches, [[('good', 1, 2)]])
+        self.assertEqual(queue.stats()['dead_letters'], 1)
+        with open(os.path.join(self.directory.name, 'dead-letters.jsonl')) as file:
+            self.assertEqual(json.loads(file.readline())['row'], ['poison', 1, 999])
+        self.assertEqual(self.journal_files(), [])
+
+
+    async def test_poison_row_withNothingBehindIt_isDeadLetteredAfterMaxAttempts(self):
+        def write(rows):
+            raise ValueError('receiver does not exist')
+
+        queue = WriteBehindQueue(write, self.directory.name, batch_size=100, flush_seconds=0.01, retry_seconds=0.01,
+                                 max_attempts=3)
+        queue.start()
+        queue.put(('poison', 1, 999))
+        await asyncio.sleep(0.2)
+
+        self.assertEqual(queue.stats()['failures'], 3)
+        self.assertEqual(queue.stats()['dead_letters'], 1)
+        self.assertEqual(queue.stats()['pending'], 0)
+        self.assertEqual(self.journal_files(), [os.path.basename(queue._journal.path)])
+        await queue.stop()
+        self.assertEqual(self.journal_files(), [])
+
+
+    async def test_retries_keepAppendingToTheSameJournal(self):
+        def failing_write(rows):
+            raise ConnectionError('database is down')
+
+        queue = WriteBehindQueue(failing_write, self.directory.name, batch_size=100, flush_seconds=0.01,
+                                 retry_seconds=0.01)
+        queue.start()
+        queue.put(('kept', 1, 2))
+        await asyncio.sleep(0.1)
+
+        self.assertGreater(queue.stats()['failures'], 2)
+        self.assertEqual(len(self.journal_files()), 2)
+        self.assertEqual(queue.stats()['dead_letters'], 0)
+        await queue.stop()
@@ -0,0 +1,71 @@
+import asyncio
+import json
+import unittest
+from common import ws_protocol
+from common.connections import ConnectionManager
+from tests.fakes import FakeWebSocket
+
+
+MESSAGE = {'type': 'message', 'isMe': False, 'from': 7, 'username': 'adam', 'data': 'hello', 'at': 1730000000}
+
+
+class TestJsonCodec(unittest.TestCase):
+
+    def test_message_keepsOriginalShape(self):
+        decoded = json.loads(ws_protocol.JSON.encode(MESSAGE))
+
+        self.assertEqual(set(decoded), {'isMe', 'data', 'username', 'time'})
+        self.assertEqual(decoded['username'], 'adam')
+
+
+    def test_encoded_string_isSentAsItIs(self):
+        self.assertEqual(ws_protocol.JSON.encode('{"type": "ping"}'), '{"type": "ping"}')
+
+
+    def test_negotiate_fallsBackToJson(self):
+        self.assertEqual(ws_protocol.negotiate([]), (ws_protocol.JSON, None))
+        self.assertEqual(ws_protocol.negotiate(['chat.v9']), (ws_protocol.JSON, None))
+        self.assertEqual(ws_protocol.negotiate(['chat.v9', ws_protocol.JSON_PROTOCOL]),
+                         (ws_protocol.JSON, ws_protocol.JSON_PROTOCOL))
+
+
+@unittest.skipIf(ws_protocol.msgpack is None, 'msgpack is not installed')
+class TestMsgpackCodec(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.codec = ws_protocol.CODECS[ws_protocol.MSGPACK_PROTOCOL]
+
+
+    def test_message_carriesUserIdInsteadOfUsername(self):
+        encoded = self.codec.encode(MESSAGE)
+
+        self.assertIsInstance(encoded, bytes)
+        self.assertEqual(self.codec.decode(encoded), {'type': 'message', 'from': 7, 'data': 'hello', 'at': 1730000000})
+        self.assertLess(len(encoded), len(ws_protocol.JSON.encode(MESSAGE)))
+
+
+    def test_decode_rejectsTextFrames(self):
+        with self.assertRaises(ValueError):
+            self.codec.decode('{"type": "pong"}')
+
+
+    def test_negotiate_prefersFirstSupportedOffer(self):
+        self.assertEqual(ws_protocol.negotiate(['chat.v9', ws_protocol.MSGPACK_PROTOCOL, ws_protocol.JSON_PROTOCOL]),
+                         (self.codec, ws_protocol.MSGPACK_PROTOCOL))
+
+
+    async def test_fan_out_encodesForEachClientsProtocol(self):
+        manager = ConnectionManager()
+        browser, binary = FakeWebSocket(), FakeWebSocket()
+        await manager.connect(browser, 1)
+        await manager.connect(binary, 1, self.codec, ws_protocol.MSGPACK_PROTOCOL)
+
+        self.assertEqual(manager.send_to_user(1, MESSAGE), 2)
+        await asyncio.sleep(0.01)
+
+        self.assertEqual(binary.subprotocol, ws_protocol.MSGPACK_PROTOCOL)
+        self.assertEqual(json.loads(browser.sent[0])['username'], 'adam')
+        self.assertEqual(self.codec.decode(binary.sent[0])['from'], 7)
+
+        await manager.disconnect(browser)
+        await manager.disconnect(binary)